@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, Field
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class EnrollmentQuery(BaseModel):
+    """Look up enrollments by user, by course, or both."""
+
+    user: Optional[str] = Field(default=None, description="Full name (or part of it) of a user, e.g. 'Alice Johnson'.")
+    course: Optional[str] = Field(default=None, description="Title (or part of it) of the course, e.g. 'python'.")
+
+
+class EnrollmentView:
+    """An in-process, denormalized view of the learning platform's enrollments: every user with the courses they
+    are enrolled in and their progress, and for every course its students. It answers "which courses is X
+    taking, and how far along" without the `$unwind` + `$lookup` aggregate or a round trip to MongoDB.
+
+    Enrollments keep the course id; titles are resolved from a separate course map at lookup time, so renaming a
+    course is one update. The view is kept current by `maintain` in a background thread: from the change
+    streams of `users` and `courses` when the server has them (a replica set), otherwise by a full `refresh` every
+    `refresh_s` seconds. A view started before `fork()` is maintained by a thread of its own in the child."""
+
+    def __init__(self, db, max_rows: int = 50):
+        self.db = db
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._users: Dict[Any, Tuple[str, list]] = {}  # user _id -> (full_name, [(course_id, progress), ...])
+        self._by_name: Dict[str, Set[Any]] = {}  # lowercased full_name -> user _ids
+        self._titles: Dict[Any, str] = {}  # course _id -> title
+        self._students: Dict[Any, Set[Any]] = {}  # course _id -> user _ids
+        self.built_at: Optional[float] = None
+        self.following = False  # True while change streams keep the view current
+        self._maintained = None  # the arguments of `start`
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    # --- Maintenance ---------------------------------------------------------------------------------------------
+
+    def _rebuild(self) -> None:
+        start = time.perf_counter()
+        titles = {course["_id"]: course.get("title", "") for course in self.db.courses.find({}, {"title": 1})}
+        users, by_name, students = {}, {}, {}
+        for user in self.db.users.find({}, {"full_name": 1, "enrollments.course_id": 1, "enrollments.progress": 1}):
+            _index(user["_id"], _user_entry(user), users, by_name, students)
+        with self._lock:
+            self._users, self._by_name, self._titles, self._students = users, by_name, titles, students
+            self.built_at = time.time()
+        logger.info(f"Built the enrollment view: {len(users)} users, {len(titles)} courses "
+                    f"in {time.perf_counter() - start:.2f}s.")
+
+    def refresh(self) -> None:
+        """Rebuilds the whole view from two streamed finds and swaps it in."""
+        with self._build_lock:
+            self._rebuild()
+
+    def ensure_ready(self) -> None:
+        """Builds the view now unless it is built already (waiting for a build in progress)."""
+        if not self.ready:
+            with self._build_lock:
+                if not self.ready:
+                    self._rebuild()
+
+    def apply_change(self, change: dict) -> None:
+        """Applies one change stream event of `users` or `courses` (with `fullDocument` looked up on updates)."""
+        collection = change.get("ns", {}).get("coll")
+        key = change.get("documentKey", {}).get("_id")
+        document = change.get("fullDocument")
+        with self._lock:
+            if collection == "courses":
+                if document is None:
+                    self._titles.pop(key, None)
+                else:
+                    self._titles[key] = document.get("title", "")
+            elif collection == "users":
+                old = self._users.pop(key, None)
+                if old is not None:
+                    self._by_name.get(old[0].lower(), set()).discard(key)
+                    for course_id, _ in old[1]:
+                        self._students.get(course_id, set()).discard(key)
+                if document is not None:
+                    _index(key, _user_entry(document), self._users, self._by_name, self._students)
+
+    def _follow_changes(self) -> None:
+        pipeline = [{"$match": {"ns.coll": {"$in": ["users", "courses"]}}}]
+        # The stream is opened before the full build, so that changes made during the build are applied after it.
+        with self.db.watch(pipeline, full_document="updateLookup", max_await_time_ms=1000) as stream:
+            self.refresh()
+            self.following = True
+            logger.info("Following the users and courses change streams for the enrollment view.")
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    self.apply_change(change)
+
+    def maintain(self, refresh_s: float = 300, change_streams: bool = True) -> None:
+        """Keeps the view current until `stop()`: from change streams if possible, otherwise by periodic refreshes."""
+        while change_streams and not self._stop.is_set():
+            try:
+                self._follow_changes()
+            except Exception as e:
+                if not self.following:  # a standalone server (no change streams) or a stand-in database
+                    logger.info(f"Change streams unavailable ({e}); refreshing the enrollment view every "
+                                f"{refresh_s:g}s.")
+                    break
+                self.following = False
+                logger.warning(f"The enrollment change stream failed ({e}); reopening it.")
+                self._stop.wait(1)
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Could not refresh the enrollment view: {e}")
+            self._stop.wait(refresh_s)
+
+    def start(self, refresh_s: float = 300, change_streams: bool = True) -> "EnrollmentView":
+        if self._maintained is None:
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: ref() is not None and ref()._restart())
+        self._maintained = (refresh_s, change_streams)
+        threading.Thread(target=self.maintain, args=self._maintained, name="enrollment-view", daemon=True).start()
+        return self
+
+    def _restart(self) -> None:
+        # The maintenance thread does not survive fork(), and a lock it held would stay held in the child.
+        self._lock, self._build_lock = threading.Lock(), threading.Lock()
+        self.following = False
+        if not self._stop.is_set():
+            self._stop = threading.Event()
+            self.start(*self._maintained)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # --- Lookups -------------------------------------------------------------------------------------------------
+
+    def lookup(self, user: Optional[str] = None, course: Optional[str] = None) -> List[dict]:
+        """The enrollments of the users whose name matches `user` in the courses whose title matches `course`, as
+        {"full_name", "course_title", "progress"} rows sorted by name and title. A name or title matches exactly
+        (ignoring case) or, when nothing matches exactly, as a substring."""
+        self.ensure_ready()
+        with self._lock:
+            course_ids = _matching(self._titles, course) if course else None
+            if user:
+                user_ids = self._by_name.get(user.strip().lower()) or \
+                    {key for key, (name, _) in self._users.items() if user.strip().lower() in name.lower()}
+            else:
+                user_ids = set().union(*(self._students.get(course_id, set()) for course_id in course_ids or []))
+            rows = [{"full_name": self._users[user_id][0], "course_title": self._titles.get(course_id),
+                     "progress": progress}
+                    for user_id in user_ids
+                    for course_id, progress in self._users[user_id][1]
+                    if course_ids is None or course_id in course_ids]
+        return sorted(rows, key=lambda row: (row["full_name"], row["course_title"] or ""))
+
+    def render(self, user: Optional[str] = None, course: Optional[str] = None) -> str:
+        """`lookup` as the tool output: one JSON line per enrollment, at most `max_rows`."""
+        if not user and not course:
+            return "Give a user name, a course title, or both."
+        rows = self.lookup(user, course)
+        if not rows:
+            return "No enrollments found."
+        lines = [json.dumps(row, ensure_ascii=False, separators=(",", ":")) for row in rows[:self.max_rows]]
+        if len(rows) > self.max_rows:
+            lines.append(f"... {len(rows) - self.max_rows} more enrollments ({len(rows)} in all, "
+                         f"{len({row['full_name'] for row in rows})} users); narrow the user or the course.")
+        return "\n".join(lines)
+
+
+def _user_entry(user: dict) -> Tuple[str, list]:
+    enrollments = [(e.get("course_id"), e.get("progress")) for e in user.get("enrollments") or []
+                   if isinstance(e, dict)]
+    return user.get("full_name") or "", enrollments
+
+
+def _index(user_id, entry: Tuple[str, list], users: dict, by_name: dict, students: dict) -> None:
+    users[user_id] = entry
+    by_name.setdefault(entry[0].lower(), set()).add(user_id)
+    for course_id, _ in entry[1]:
+        students.setdefault(course_id, set()).add(user_id)
+
+
+def _matching(names: Dict[Any, str], text: str) -> Set[Any]:
+    text = text.strip().lower()
+    exact = {key for key, name in names.items() if (name or "").lower() == text}
+    return exact or {key for key, name in names.items() if text in (name or "").lower()}
+
+
+_view: Optional[EnrollmentView] = None
+_view_lock = threading.Lock()
+
+
+def get_enrollment_view(db) -> EnrollmentView:
+    """Returns the process-wide enrollment view of `db`, started (built and maintained in the background) from
+    the configuration on first use."""
+    global _view
+    if _view is None:
+        with _view_lock:
+            if _view is None:
+                _view = EnrollmentView(db, max_rows=config.ENROLLMENT_VIEW_MAX_ROWS)
+                _view.start(config.ENROLLMENT_VIEW_REFRESH_S, config.ENROLLMENT_VIEW_CHANGE_STREAMS)
+    return _view
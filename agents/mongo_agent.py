@@ -1,15 +1,111 @@
+import asyncio
 import logging
-import json
-from bson import json_util, ObjectId
+from typing import Optional
 from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain_core.prompts import MessagesPlaceholder, ChatPromptTemplate
 from langchain_openai import ChatOpenAI
-from pymongo import MongoClient
-from langchain.tools import tool
+from langchain.tools import StructuredTool
 import config
+from agents.enrollment_view import EnrollmentQuery, get_enrollment_view
+from agents.mongo_client import get_async_mongo_client, get_mongo_client
+from agents.mongo_indexes import advise_indexes_once
+from agents.mongo_query import InvalidQueryError, MongoQueryExecutor, MongoQuerySpec
+from utils.logging_config import agent_executor_options
+from utils.prompts import Example, PromptAssembler
 
 logger = logging.getLogger(__name__)
 
+COLLECTIONS = ["courses", "users"]
+
+
+SCHEMA_FRAGMENTS = {
+    "courses": """**`courses` collection structure:**
+{
+  "_id": "ObjectId",
+  "title": "string",
+  "instructor_name": "string",
+  "description": "string",
+  "lessons": [ { "title": "string", "content": "string" } ]
+}""",
+    "users": """**`users` collection structure:**
+{
+  "full_name": "string",
+  "email": "string",
+  "enrollments": [ { "course_id": "ObjectId", "progress": "number" } ]
+}
+Note: `enrollments.course_id` is a reference to the `_id` in the `courses` collection. To get course names for a user, you MUST use a `pipeline` with `$lookup`.""",
+}
+
+# Words that bring in a schema fragment even when no selected example uses it.
+SCHEMA_KEYWORDS = {
+    "courses": ["course", "lesson", "instructor", "teach", "title", "دوره", "درس", "مدرس"],
+    "users": ["user", "student", "enrol", "progress", "email", "کاربر", "دانشجو", "پیشرفت"],
+}
+
+_LOOKUP_EXAMPLE = Example(
+    "What courses is Alice Johnson enrolled in and what is her progress?",
+    'Question: "What courses is Alice Johnson enrolled in and what is her progress?"\n'
+    'Tool input: {"collection": "users", "pipeline": [{"$match": {"full_name": "Alice Johnson"}}, '
+    '{"$unwind": "$enrollments"}, {"$lookup": {"from": "courses", "localField": "enrollments.course_id", '
+    '"foreignField": "_id", "as": "course_details"}}, {"$unwind": "$course_details"}, {"$project": {"_id": 0, '
+    '"course_title": "$course_details.title", "progress": "$enrollments.progress"}}]}',
+    ("users", "courses"))
+
+EXAMPLES = [
+    Example("Who is the instructor for 'Machine Learning Fundamentals'?",
+            'Question: "Who is the instructor for \'Machine Learning Fundamentals\'?"\n'
+            'Tool input: {"collection": "courses", "filter": {"title": "Machine Learning Fundamentals"}, '
+            '"projection": {"_id": 0, "instructor_name": 1}}',
+            ("courses",)),
+    Example("What is the content of the third lesson in the Python course?",
+            'Question: "What is the content of the third lesson in the Python course?"\n'
+            'Tool input: {"collection": "courses", "filter": {"title": {"$regex": "python", "$options": "i"}}, '
+            '"projection": {"_id": 0, "lessons": {"$slice": [2, 1]}}, "limit": 1}',
+            ("courses",)),
+    _LOOKUP_EXAMPLE,
+    Example("How many users are on the platform?",
+            'Question: "How many users are on the platform?"\n'
+            'Tool input: {"collection": "users", "count_only": true}',
+            ("users",)),
+]
+
+# With the enrollment view, enrollment questions go to `user_enrollments` instead of a `$lookup` pipeline.
+ENROLLMENT_EXAMPLES = [
+    Example("What courses is Alice Johnson enrolled in and what is her progress?",
+            'Question: "What courses is Alice Johnson enrolled in and what is her progress?"\n'
+            'Tool input (user_enrollments): {"user": "Alice Johnson"}',
+            ("users", "courses")),
+    Example("Who is enrolled in the Python course?",
+            'Question: "Who is enrolled in the Python course?"\n'
+            'Tool input (user_enrollments): {"course": "python"}',
+            ("users", "courses")),
+]
+
+
+def create_prompt_assembler(enrollment_view: bool = False) -> PromptAssembler:
+    """Selects the schema fragments and examples of the Mongo agent's prompt for each question. With prompt
+    assembly disabled every example is sent, as before it."""
+    examples = list(EXAMPLES)
+    if enrollment_view:
+        if config.PROMPT_ASSEMBLY_ENABLED:  # it answers the first enrollment example's question the slow way
+            examples.remove(_LOOKUP_EXAMPLE)
+        examples += ENROLLMENT_EXAMPLES
+    return PromptAssembler(SCHEMA_FRAGMENTS, examples, SCHEMA_KEYWORDS, k=config.PROMPT_EXAMPLES,
+                           enabled=config.PROMPT_ASSEMBLY_ENABLED)
+
+
+def _create_executor(db) -> MongoQueryExecutor:
+    return MongoQueryExecutor(db, COLLECTIONS,
+                              default_limit=config.MONGO_DEFAULT_LIMIT,
+                              max_limit=config.MONGO_MAX_LIMIT,
+                              batch_size=config.MONGO_BATCH_SIZE,
+                              token_budget=config.MONGO_RESULT_TOKEN_BUDGET,
+                              max_field_chars=config.MONGO_MAX_FIELD_CHARS,
+                              max_pipeline_stages=config.MONGO_MAX_PIPELINE_STAGES,
+                              slow_query_ms=config.MONGO_SLOW_QUERY_MS,
+                              count_limit_factor=config.MONGO_COUNT_LIMIT_FACTOR,
+                              count_max_time_ms=config.MONGO_COUNT_MAX_TIME_MS)
+
 
 def create_mongo_agent(llm: ChatOpenAI) -> AgentExecutor:
     """This function creates and returns a specialized AgentExecutor for interacting with a MongoDB database
@@ -18,117 +114,121 @@ def create_mongo_agent(llm: ChatOpenAI) -> AgentExecutor:
     logger.info("Creating MongoDB agent executor...")
 
     try:
-        client = MongoClient(config.MONGO_URI)
-        db = client[config.MONGO_DB_NAME]
-        courses_collection = db["courses"]
-        users_collection = db["users"]
+        db = get_mongo_client()[config.MONGO_DB_NAME]
+        executor = _create_executor(db)
     except Exception as e:
         logger.error(f"Failed to connect to MongoDB: {e}", exc_info=True)
         raise
+    advise_indexes_once(db, config.MONGO_INDEX_ADVISOR)
 
-    @tool
-    def search_courses(query: str) -> str:
-        """
-        Use this tool ONLY for questions about course details like lessons, content, instructors, or descriptions.
-        The input must be a valid Python command string using methods like find or aggregate on the 'courses_collection' variable.
-        """
-
-        logger.info(f"Executing courses search with query: {query}")
+    async_client = get_async_mongo_client()
+    async_executor = _create_executor(async_client[config.MONGO_DB_NAME]) if async_client is not None else None
 
-        local_vars = {"courses_collection": courses_collection, "ObjectId": ObjectId}
+    def query_mongodb(**query) -> str:
+        spec = MongoQuerySpec(**query)
+        logger.info(f"Executing MongoDB query: {spec.model_dump(exclude_defaults=True)}")
         try:
-            result = eval(query, {"__builtins__": {}}, local_vars)
-            if isinstance(result, int): return str(result)
-            result_list = list(result)
-            if not result_list:
-                logger.warning(f"No courses found for query: {query}")
-                return "No courses found."
-            return json.dumps(result_list, default=json_util.default, ensure_ascii=False, indent=2)
+            return executor.run(spec)
+        except InvalidQueryError as e:
+            logger.warning(f"Rejected MongoDB query: {e}")
+            return f"Invalid query: {e}"
         except Exception as e:
-            logger.error(f"MongoDB course query failed: {e}", exc_info=True)
+            logger.error(f"MongoDB query failed: {e}", exc_info=True)
             return f"Query execution error: {str(e)}"
 
-    @tool
-    def search_users(query: str) -> str:
-        """
-        Use this tool ONLY for questions about users, their enrollments, or their progress in courses.
-        The input must be a valid Python command string using methods like find or aggregate on the 'users_collection' variable.
-        """
+    async def aquery_mongodb(**query) -> str:
+        if async_executor is None:
+            return await asyncio.to_thread(query_mongodb, **query)
 
-        logger.info(f"Executing users search with query: {query}")
-
-        local_vars = {"users_collection": users_collection, "ObjectId": ObjectId}
+        spec = MongoQuerySpec(**query)
+        logger.info(f"Executing MongoDB query (async): {spec.model_dump(exclude_defaults=True)}")
         try:
-            result = eval(query, {"__builtins__": {}}, local_vars)
-            if isinstance(result, int): return str(result)
-            result_list = list(result)
-            if not result_list:
-                logger.warning(f"No users found for query: {query}")
-                return "No users found."
-            return json.dumps(result_list, default=json_util.default, ensure_ascii=False, indent=2)
+            return await async_executor.arun(spec)
+        except InvalidQueryError as e:
+            logger.warning(f"Rejected MongoDB query: {e}")
+            return f"Invalid query: {e}"
         except Exception as e:
-            logger.error(f"MongoDB user query failed: {e}", exc_info=True)
+            logger.error(f"MongoDB query failed: {e}", exc_info=True)
             return f"Query execution error: {str(e)}"
 
-    tools = [search_courses, search_users]
+    tools = [
+        StructuredTool.from_function(
+            func=query_mongodb,
+            coroutine=aquery_mongodb,
+            name="query_mongodb",
+            description="Runs a read-only query against the 'courses' or 'users' collection of the learning "
+                        "platform. Use `filter`/`projection`/`sort` for a find, or `pipeline` for an aggregation "
+                        "(e.g. a `$lookup` from users to courses). Results are capped in size; ask for only the "
+                        "fields you need.",
+            args_schema=MongoQuerySpec,
+        ),
+    ]
+
+    view = get_enrollment_view(db) if config.ENROLLMENT_VIEW_ENABLED else None
+    if view is not None:
+        def user_enrollments(user: Optional[str] = None, course: Optional[str] = None) -> str:
+            logger.info(f"Looking up enrollments: user={user!r} course={course!r}")
+            try:
+                return view.render(user, course)
+            except Exception as e:
+                logger.error(f"Enrollment lookup failed: {e}", exc_info=True)
+                return f"Lookup error: {str(e)}"
+
+        async def auser_enrollments(user: Optional[str] = None, course: Optional[str] = None) -> str:
+            if not view.ready:  # the first lookup may have to build the view
+                return await asyncio.to_thread(user_enrollments, user, course)
+            return user_enrollments(user, course)
+
+        tools.append(StructuredTool.from_function(
+            func=user_enrollments,
+            coroutine=auser_enrollments,
+            name="user_enrollments",
+            description="Lists enrollments (full_name, course_title, progress) from a precomputed view: the courses "
+                        "of a user (`user`), the students of a course (`course`), or both. Names and titles match "
+                        "ignoring case, or as a part of the name. Much faster than a `$lookup` pipeline.",
+            args_schema=EnrollmentQuery,
+        ))
 
     SYSTEM_MESSAGE = """
-    You are a highly specialized MongoDB assistant. Your only goal is to answer user questions by generating a complete, runnable Python command string to be executed by a tool.
+    You are a highly specialized MongoDB assistant. Your only goal is to answer user questions by calling the `query_mongodb` tool with a structured query.
 
     **--- YOUR PRIMARY DIRECTIVE ---**
-    The input for your tools (`Action Input`) MUST be a Python string that starts with `users_collection.` or `courses_collection.`.
-    NEVER output just a JSON object. ALWAYS output the full command.
-    Correct format: `users_collection.find({{'full_name': 'Alice Johnson'}})`
-    Incorrect format: `{{'full_name': 'Alice Johnson'}}`
-
-    **--- AVAILABLE TOOLS and DATA ---**
-    You have two tools:
-    1. `search_courses`: Use for questions about courses, lessons, instructors, or descriptions. Queries MUST start with `courses_collection.`.
-    2. `search_users`: Use for questions about users, their enrollments, or progress. Queries MUST start with `users_collection.`.
-
-    **`courses` collection structure:**
-    {{
-      "_id": "ObjectId",
-      "title": "string",
-      "instructor_name": "string",
-      "description": "string",
-      "lessons": [ {{ "title": "string", "content": "string" }} ]
-    }}
-
-    **`users` collection structure:**
-    {{
-      "full_name": "string",
-      "email": "string",
-      "enrollments": [ {{ "course_id": "ObjectId", "progress": "number" }} ]
-    }}
-    Note: `enrollments.course_id` is a reference to the `_id` in the `courses` collection. To get course names for a user, you MUST use an `aggregate` query with `$lookup`.
+    The tool input is a JSON query spec, NOT Python code: `collection` ("courses" or "users") plus either
+    `filter` / `projection` / `sort` / `limit` for a find, or `pipeline` for an aggregation.
+    Always use a `projection` (or a `$project` stage) that returns only the fields needed to answer; never return full lesson contents unless asked.
+    Use `count_only: true` when the question is "how many".
+    ObjectIds are written as {{"$oid": "..."}}.
+    """
 
-    **--- EXAMPLES ---**
-    Question: "Who is the instructor for 'Machine Learning Fundamentals'?"
-    Action: search_courses
-    Action Input: `courses_collection.find({{'title': 'Machine Learning Fundamentals'}}, {{'_id': 0, 'instructor_name': 1}})`
+    ENROLLMENT_MESSAGE = """
+    To find which courses a user is enrolled in and their progress, or who is enrolled in a course, call the `user_enrollments` tool with `user` and/or `course` instead of a `$lookup` pipeline.
+    """
 
-    Question: "What is the content of the third lesson in the Python course?"
-    Action: search_courses
-    Action Input: `courses_collection.find({{'title': {{'$regex': 'python', '$options': 'i'}}}}, {{'_id': 0, 'lessons': {{'$slice': [2, 1]}}, 'lessons.content': 1}})`
+    # The instructions above are the same on every call (a cacheable prefix); the schema and the examples below
+    # are picked for each question by the prompt assembler.
+    CONTEXT_MESSAGE = """
+    **--- AVAILABLE DATA ---**
+    {schema}
 
-    Question: "What courses is Alice Johnson enrolled in and what is her progress?"
-    Action: search_users
-    Action Input: `users_collection.aggregate([{{'$match': {{'full_name': 'Alice Johnson'}}}}, {{'$unwind': '$enrollments'}}, {{'$lookup': {{'from': 'courses', 'localField': 'enrollments.course_id', 'foreignField': '_id', 'as': 'course_details'}}}}, {{'$unwind': '$course_details'}}, {{'$project': {{'_id': 0, 'course_title': '$course_details.title', 'progress': '$enrollments.progress'}}}}])`
+    **--- EXAMPLES ---**
+    {examples}
     ---
     """
 
     prompt = ChatPromptTemplate.from_messages([
-        ("system", SYSTEM_MESSAGE),
+        ("system", SYSTEM_MESSAGE + (ENROLLMENT_MESSAGE if view is not None else "")),
+        ("system", CONTEXT_MESSAGE),
         ("user", "{input}"),
         MessagesPlaceholder(variable_name="agent_scratchpad"),
     ])
 
-    agent = create_openai_tools_agent(llm=llm, tools=tools, prompt=prompt)
+    assembler = create_prompt_assembler(enrollment_view=view is not None)
+    agent = assembler.assign() | create_openai_tools_agent(llm=llm, tools=tools, prompt=prompt)
     agent_executor = AgentExecutor(agent=agent,
                                    tools=tools,
-                                   verbose=True,
-                                   handle_parsing_errors=True
+                                   handle_parsing_errors=True,
+                                   max_iterations=config.AGENT_MAX_ITERATIONS,
+                                   **agent_executor_options()
                                    )
 
     logger.info("MongoDB agent executor created successfully.")
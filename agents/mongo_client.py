@@ -0,0 +1,65 @@
+import logging
+import threading
+from typing import Optional
+
+from pymongo import MongoClient
+
+import config
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:  # motor is optional: without it the async tool runs the blocking driver in a worker thread.
+    AsyncIOMotorClient = None
+
+logger = logging.getLogger(__name__)
+
+
+def client_options() -> dict:
+    """Pool limits, timeouts and read preference from the configuration, as MongoClient keyword arguments."""
+    return {"maxPoolSize": config.MONGO_MAX_POOL_SIZE,
+            "minPoolSize": config.MONGO_MIN_POOL_SIZE,
+            "serverSelectionTimeoutMS": config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "connectTimeoutMS": config.MONGO_CONNECT_TIMEOUT_MS,
+            "socketTimeoutMS": config.MONGO_SOCKET_TIMEOUT_MS,
+            "readPreference": config.MONGO_READ_PREFERENCE,
+            "appname": "simple-agentic-rag"}
+
+
+_client: Optional[MongoClient] = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_mongo_client() -> MongoClient:
+    """Returns the process-wide pymongo client, created from the configuration on first use. The client is
+    thread-safe and keeps its own connection pool, so every agent and thread shares it."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                logger.info(f"Creating MongoDB client (max pool {config.MONGO_MAX_POOL_SIZE}, "
+                            f"read preference {config.MONGO_READ_PREFERENCE}).")
+                _client = MongoClient(config.MONGO_URI, **client_options())
+    return _client
+
+
+def get_async_mongo_client():
+    """Returns the process-wide motor client, or None when motor is not installed or MONGO_ASYNC_DRIVER is off."""
+    global _async_client
+    if AsyncIOMotorClient is None or not config.MONGO_ASYNC_DRIVER:
+        return None
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncIOMotorClient(config.MONGO_URI, **client_options())
+    return _async_client
+
+
+def close_mongo_clients() -> None:
+    """Closes the shared clients; the next `get_mongo_client` call creates a new one."""
+    global _client, _async_client
+    with _client_lock:
+        for client in (_client, _async_client):
+            if client is not None:
+                client.close()
+        _client = _async_client = None
@@ -0,0 +1,95 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IndexKeys = List[Tuple[str, int]]
+
+# The fields the learning-platform agent's queries filter on (see the examples in its prompt):
+# * courses.title: exact matches use the index directly; a case-insensitive $regex cannot seek, but it scans the
+#   much smaller index keys instead of every course document with its lessons,
+# * users.full_name: the $match at the head of the enrollment pipeline,
+# * users.enrollments.course_id: the reverse side of the enrollment $lookup ("who is enrolled in course X").
+#   The $lookup itself joins on courses._id, which is always indexed.
+RECOMMENDED_INDEXES: Dict[str, List[IndexKeys]] = {
+    "courses": [[("title", 1)]],
+    "users": [[("full_name", 1)], [("enrollments.course_id", 1)]],
+}
+
+_advised = set()
+_advised_lock = threading.Lock()
+
+
+def _has_index(index_information: dict, keys: IndexKeys) -> bool:
+    """Whether an existing index starts with `keys` (a compound index serves queries on its prefix)."""
+    for info in index_information.values():
+        existing = [(field, int(direction)) for field, direction in info.get("key", [])
+                    if not isinstance(direction, str)]
+        if existing[:len(keys)] == list(keys):
+            return True
+    return False
+
+
+def _describe(collection: str, keys: IndexKeys) -> str:
+    return f"{collection}({', '.join(f'{field}: {direction}' for field, direction in keys)})"
+
+
+def advise_indexes(db, mode: Optional[str] = "report",
+                   indexes: Optional[Dict[str, List[IndexKeys]]] = None) -> List[dict]:
+    """Checks that the recommended indexes exist in the pymongo database `db`. With `mode` "create" missing
+    indexes are built, with "report" they are only logged. Returns one {"collection", "keys", "status"} entry per
+    index, with status "present", "created", "missing" or "failed". Errors (e.g. a user without the createIndex
+    privilege) are logged, never raised: the agent works without the indexes, only slower."""
+    if mode not in ("create", "report"):
+        return []
+    report = []
+    for collection, wanted in (indexes or RECOMMENDED_INDEXES).items():
+        try:
+            existing = db[collection].index_information()
+        except Exception as e:
+            logger.warning(f"Could not list the indexes of '{collection}': {e}")
+            report += [{"collection": collection, "keys": keys, "status": "failed"} for keys in wanted]
+            continue
+        for keys in wanted:
+            name = _describe(collection, keys)
+            if _has_index(existing, keys):
+                status = "present"
+            elif mode == "report":
+                logger.warning(f"Missing index {name}: queries on it scan the whole collection. "
+                               f"Create it with `python -m agents.mongo_indexes --create`.")
+                status = "missing"
+            else:
+                try:
+                    db[collection].create_index(keys)
+                    logger.info(f"Created index {name}.")
+                    status = "created"
+                except Exception as e:
+                    logger.warning(f"Could not create index {name}: {e}")
+                    status = "failed"
+            report.append({"collection": collection, "keys": keys, "status": status})
+    return report
+
+
+def advise_indexes_once(db, mode: Optional[str] = "report") -> None:
+    """`advise_indexes` on the first call for a database in this process; later calls (e.g. for every agent
+    created) do nothing."""
+    with _advised_lock:
+        if db.name in _advised:
+            return
+        _advised.add(db.name)
+    advise_indexes(db, mode)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import config
+    from agents.mongo_client import get_mongo_client
+
+    parser = argparse.ArgumentParser(description="Checks (and with --create builds) the indexes the "
+                                                 "learning-platform agent relies on.")
+    parser.add_argument("--create", action="store_true", help="Create the missing indexes.")
+    args = parser.parse_args()
+    for entry in advise_indexes(get_mongo_client()[config.MONGO_DB_NAME], "create" if args.create else "report"):
+        print(f"{_describe(entry['collection'], entry['keys']):<40} {entry['status']}")
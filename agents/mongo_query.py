@@ -0,0 +1,332 @@
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import json_util
+from pydantic import BaseModel, Field
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Operators that execute server-side JavaScript or write data. The agent must never be able to run them.
+FORBIDDEN_OPERATORS = {"$where", "$function", "$accumulator", "$out", "$merge", "$currentOp", "$listSessions",
+                       "$planCacheStats", "$collStats", "$indexStats"}
+
+
+class InvalidQueryError(ValueError):
+    """The query spec produced by the model is not allowed or not well formed."""
+
+
+class MongoQuerySpec(BaseModel):
+    """A read-only MongoDB query. Use `pipeline` for aggregations (e.g. `$lookup` joins); otherwise `filter`,
+    `projection` and `sort` describe a plain find."""
+
+    collection: str = Field(..., description="Collection to query: 'courses' or 'users'.")
+    filter: Dict[str, Any] = Field(default_factory=dict, description="MongoDB filter document for a find.")
+    projection: Optional[Dict[str, Any]] = Field(default=None, description="Fields to include/exclude.")
+    sort: Optional[Dict[str, int]] = Field(default=None, description="Sort spec, e.g. {'title': 1}.")
+    pipeline: Optional[List[Dict[str, Any]]] = Field(default=None, description="Aggregation pipeline stages.")
+    limit: Optional[int] = Field(default=None, description="Maximum number of documents to return.")
+    count_only: bool = Field(default=False, description="Return only the number of documents matching `filter`.")
+
+
+def _check_operators(value: Any, allowed_collections: set) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in FORBIDDEN_OPERATORS:
+                raise InvalidQueryError(f"Operator '{key}' is not allowed.")
+            target = None
+            if key in ("$lookup", "$graphLookup") and isinstance(item, dict):
+                target = item.get("from")
+            elif key == "$unionWith":
+                target = item.get("coll") if isinstance(item, dict) else item
+            if target is not None and target not in allowed_collections:
+                raise InvalidQueryError(f"{key} on collection '{target}' is not allowed.")
+            _check_operators(item, allowed_collections)
+    elif isinstance(value, list):
+        for item in value:
+            _check_operators(item, allowed_collections)
+
+
+def _to_bson(value: Any) -> Any:
+    """Turns MongoDB extended JSON written by the model (e.g. {'$oid': '...'}) into BSON types."""
+    return json_util.loads(json.dumps(value)) if value is not None else None
+
+
+def _truncate_strings(value: Any, max_chars: int) -> Any:
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + f"... [{len(value) - max_chars} more chars]"
+    if isinstance(value, dict):
+        return {k: _truncate_strings(v, max_chars) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_truncate_strings(v, max_chars) for v in value]
+    return value
+
+
+def summarize_plan(explain: dict) -> dict:
+    """The gist of an `explain` result in executionStats verbosity: the stages of the winning plan and of the
+    pipeline (in the order the explain output lists them), the keys and documents examined, the documents returned
+    by the query stage, and whether a collection was scanned without an index."""
+    stages: List[str] = []
+    totals = {"keys_examined": 0, "docs_examined": 0}
+    returned = None
+    collection_scans = 0
+
+    def walk(value: Any) -> None:
+        nonlocal returned, collection_scans
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key in ("rejectedPlans", "allPlansExecution", "parsedQuery", "filter", "command"):
+                    continue
+                if key == "stage" and isinstance(item, str) and item not in stages:
+                    stages.append(item)
+                elif key.startswith("$") and isinstance(item, dict) and key not in stages:
+                    stages.append(key)
+                elif key in ("totalKeysExamined", "totalDocsExamined") and isinstance(item, int):
+                    totals["keys_examined" if key == "totalKeysExamined" else "docs_examined"] += item
+                elif key == "nReturned" and returned is None and isinstance(item, int):
+                    returned = item
+                elif key == "collectionScans" and isinstance(item, int):
+                    collection_scans += item
+                walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+
+    walk(explain)
+    return {"stages": stages, **totals, "returned": returned,
+            "collection_scan": "COLLSCAN" in stages or collection_scans > 0}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token) used for output budgets."""
+    return len(text) // 4 + 1
+
+
+class MongoQueryExecutor:
+    """Validates `MongoQuerySpec`s and runs them with a server-side limit, batch size and projection.
+
+    Documents are streamed from the cursor and serialized one at a time; long string fields are shortened to
+    `max_field_chars`, and output stops once `token_budget` is reached, ending with a marker that says how many
+    more documents were left out. `db` may be a pymongo or a motor database (`run` / `arun` respectively).
+
+    When a find matches more documents than its limit, the matches are counted up to `count_limit_factor` times
+    the limit and for at most `count_max_time_ms`, so that a broad filter does not cost a full collection count;
+    past the cap the result says "more than N".
+
+    A query that takes longer than `slow_query_ms` is explained afterwards and logged with a summary of its plan,
+    so that a collection scan behind a slow answer shows up in the log."""
+
+    def __init__(self, db, allowed_collections: List[str], default_limit: int = 20, max_limit: int = 100,
+                 batch_size: int = 50, token_budget: int = 1500, max_field_chars: int = 400,
+                 max_pipeline_stages: int = 10, slow_query_ms: Optional[float] = None, count_limit_factor: int = 10,
+                 count_max_time_ms: int = 2000):
+        self.db = db
+        self.allowed_collections = set(allowed_collections)
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+        self.batch_size = batch_size
+        self.token_budget = token_budget
+        self.max_field_chars = max_field_chars
+        self.max_pipeline_stages = max_pipeline_stages
+        self.slow_query_ms = slow_query_ms
+        self.count_limit_factor = count_limit_factor
+        self.count_max_time_ms = count_max_time_ms
+
+    def validate(self, spec: MongoQuerySpec) -> MongoQuerySpec:
+        """Returns a normalized copy of the spec (BSON values, bounded limit) or raises InvalidQueryError."""
+        if spec.collection not in self.allowed_collections:
+            raise InvalidQueryError(f"Unknown collection '{spec.collection}'. "
+                                    f"Use one of: {', '.join(sorted(self.allowed_collections))}.")
+        if spec.pipeline is not None and len(spec.pipeline) > self.max_pipeline_stages:
+            raise InvalidQueryError(f"Pipelines may have at most {self.max_pipeline_stages} stages.")
+        for part in (spec.filter, spec.projection, spec.pipeline):
+            _check_operators(part, self.allowed_collections)
+        limit = spec.limit if spec.limit and spec.limit > 0 else self.default_limit
+        return spec.model_copy(update={
+            "filter": _to_bson(spec.filter) or {},
+            "projection": _to_bson(spec.projection),
+            "pipeline": _to_bson(spec.pipeline),
+            "limit": min(limit, self.max_limit),
+        })
+
+    def _find_cursor(self, spec: MongoQuerySpec):
+        collection = self.db[spec.collection]
+        cursor = collection.find(spec.filter, spec.projection)
+        if spec.sort:
+            cursor = cursor.sort(list(spec.sort.items()))
+        # One extra document tells us whether the limit cut anything off.
+        return cursor.limit(spec.limit + 1).batch_size(min(self.batch_size, spec.limit + 1))
+
+    def _aggregate_cursor(self, spec: MongoQuerySpec):
+        pipeline = list(spec.pipeline) + [{"$limit": spec.limit + 1}]
+        return self.db[spec.collection].aggregate(pipeline, batchSize=min(self.batch_size, spec.limit + 1))
+
+    def _explain_command(self, spec: MongoQuerySpec) -> dict:
+        """The `explain` command for a validated spec, mirroring the query `run` sends."""
+        if spec.count_only:
+            command = {"count": spec.collection, "query": spec.filter}
+        elif spec.pipeline is not None:
+            command = {"aggregate": spec.collection, "pipeline": list(spec.pipeline) + [{"$limit": spec.limit + 1}],
+                       "cursor": {}}
+        else:
+            command = {"find": spec.collection, "filter": spec.filter, "limit": spec.limit + 1}
+            if spec.projection:
+                command["projection"] = spec.projection
+            if spec.sort:
+                command["sort"] = spec.sort
+        return command
+
+    def _count_options(self, spec: MongoQuerySpec) -> dict:
+        # One past the cap tells "exactly the cap" from "more than the cap".
+        return {"limit": spec.limit * self.count_limit_factor + 1, "maxTimeMS": self.count_max_time_ms}
+
+    def _total(self, spec: MongoQuerySpec, count: Optional[int]) -> Tuple[Optional[int], bool]:
+        """(total matches, whether it is only a lower bound) from a capped count, or (None, False) without one."""
+        if count is None:
+            return None, False
+        cap = spec.limit * self.count_limit_factor
+        return (cap, True) if count > cap else (count, False)
+
+    @staticmethod
+    def _count_failed(e: Exception) -> None:
+        logger.warning(f"Could not count the matching MongoDB documents: {e}")
+
+    def _is_slow(self, start: float) -> Optional[float]:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return elapsed_ms if self.slow_query_ms is not None and elapsed_ms > self.slow_query_ms else None
+
+    def _log_slow(self, spec: MongoQuerySpec, elapsed_ms: float, explain: Optional[dict]) -> None:
+        query = spec.model_dump(exclude_defaults=True, exclude={"limit"})
+        if explain is None:
+            logger.warning(f"Slow MongoDB query ({elapsed_ms:.0f}ms, no plan available): {query}")
+            return
+        plan = summarize_plan(explain)
+        hint = "; collection scan: an index on the filtered fields would help" if plan["collection_scan"] else ""
+        logger.warning(f"Slow MongoDB query ({elapsed_ms:.0f}ms): plan {' > '.join(plan['stages']) or '?'}, "
+                       f"{plan['keys_examined']} keys and {plan['docs_examined']} documents examined, "
+                       f"{plan['returned']} returned{hint}. Query: {query}")
+
+    def _explain(self, spec: MongoQuerySpec, elapsed_ms: float) -> None:
+        try:
+            explain = self.db.command("explain", self._explain_command(spec), verbosity="executionStats")
+        except Exception as e:
+            logger.debug(f"Could not explain the slow MongoDB query: {e}")
+            explain = None
+        self._log_slow(spec, elapsed_ms, explain)
+
+    async def _aexplain(self, spec: MongoQuerySpec, elapsed_ms: float) -> None:
+        try:
+            explain = await self.db.command("explain", self._explain_command(spec), verbosity="executionStats")
+        except Exception as e:
+            logger.debug(f"Could not explain the slow MongoDB query: {e}")
+            explain = None
+        self._log_slow(spec, elapsed_ms, explain)
+
+    def run(self, spec: MongoQuerySpec) -> str:
+        spec = self.validate(spec)
+        start = time.perf_counter()
+        result = self._run(spec)
+        elapsed_ms = self._is_slow(start)
+        if elapsed_ms is not None:
+            self._explain(spec, elapsed_ms)
+        return result
+
+    async def arun(self, spec: MongoQuerySpec) -> str:
+        spec = self.validate(spec)
+        start = time.perf_counter()
+        result = await self._arun(spec)
+        elapsed_ms = self._is_slow(start)
+        if elapsed_ms is not None:
+            await self._aexplain(spec, elapsed_ms)
+        return result
+
+    def _run(self, spec: MongoQuerySpec) -> str:
+        collection = self.db[spec.collection]
+        if spec.count_only:
+            return str(collection.count_documents(spec.filter))
+        cursor = self._aggregate_cursor(spec) if spec.pipeline is not None else self._find_cursor(spec)
+        renderer = _Renderer(spec.limit, self.token_budget, self.max_field_chars)
+        try:
+            for document in cursor:
+                renderer.add(document)
+        finally:
+            cursor.close()
+        count = None
+        if renderer.beyond_limit and spec.pipeline is None:
+            try:
+                count = collection.count_documents(spec.filter, **self._count_options(spec))
+            except PyMongoError as e:
+                self._count_failed(e)
+        return renderer.result(*self._total(spec, count))
+
+    async def _arun(self, spec: MongoQuerySpec) -> str:
+        collection = self.db[spec.collection]
+        if spec.count_only:
+            return str(await collection.count_documents(spec.filter))
+        cursor = self._aggregate_cursor(spec) if spec.pipeline is not None else self._find_cursor(spec)
+        renderer = _Renderer(spec.limit, self.token_budget, self.max_field_chars)
+        try:
+            async for document in cursor:
+                renderer.add(document)
+        finally:
+            await cursor.close()
+        count = None
+        if renderer.beyond_limit and spec.pipeline is None:
+            try:
+                count = await collection.count_documents(spec.filter, **self._count_options(spec))
+            except PyMongoError as e:
+                self._count_failed(e)
+        return renderer.result(*self._total(spec, count))
+
+
+class _Renderer:
+    """Serializes documents one by one into JSON lines until the limit or the token budget is reached."""
+
+    def __init__(self, limit: int, token_budget: int, max_field_chars: int):
+        self.limit = limit
+        self.token_budget = token_budget
+        self.max_field_chars = max_field_chars
+        self.lines: List[str] = []
+        self.tokens = 0
+        self.seen = 0
+        self.omitted = 0
+        self.beyond_limit = False
+
+    def add(self, document: dict) -> None:
+        self.seen += 1
+        if self.seen > self.limit:
+            self.beyond_limit = True
+            return
+        if self.omitted:
+            self.omitted += 1
+            return
+        line = json.dumps(_truncate_strings(document, self.max_field_chars), default=json_util.default,
+                          ensure_ascii=False, separators=(",", ":"))
+        cost = estimate_tokens(line)
+        if self.lines and self.tokens + cost > self.token_budget:
+            self.omitted += 1
+            return
+        if cost > self.token_budget:  # a single document larger than the whole budget
+            line = line[:self.token_budget * 4] + " ... [document truncated]"
+            cost = estimate_tokens(line)
+        self.lines.append(line)
+        self.tokens += cost
+
+    def result(self, total_matches: Optional[int] = None, at_least: bool = False) -> str:
+        if not self.lines:
+            return "No documents found."
+        shown = len(self.lines)
+        text = "\n".join(self.lines)
+        if total_matches is not None and at_least:
+            text += f"\n... more than {total_matches - shown} more results (showing {shown} of more than " \
+                    f"{total_matches}; narrow the filter or use a projection)."
+        elif total_matches is not None and total_matches > shown:
+            text += f"\n... {total_matches - shown} more results (showing {shown} of {total_matches}; " \
+                    f"narrow the filter or use a projection)."
+        elif self.omitted or self.beyond_limit:
+            more = f"{self.omitted} more results" if not self.beyond_limit else \
+                f"{self.omitted} more results within the limit of {self.limit}, and more beyond it"
+            text += f"\n... {more} (narrow the filter or use a projection)."
+        return text
@@ -1,22 +1,116 @@
 import logging
+from typing import Any, List, Optional
 from langchain.agents import AgentExecutor, AgentType
-from langchain_community.agent_toolkits import create_sql_agent
+from langchain_community.agent_toolkits import create_sql_agent, SQLDatabaseToolkit
+from langchain_community.tools import QuerySQLDatabaseTool
 from langchain_community.utilities import SQLDatabase
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import Runnable, RunnablePassthrough
+from langchain_core.tools import BaseTool
 from langchain_openai import ChatOpenAI
+from pydantic import Field
 import config
+from agents.sql_catalog import RefreshingCatalog, load_or_build_catalog
+from agents.sql_query import SQLQueryExecutor, create_pooled_engine
+from utils.logging_config import agent_executor_options
+from utils.shared_store import get_shared_store
 
 logger = logging.getLogger(__name__)
 
+# Prompt used when the schema catalog is enabled: the relevant tables and the literal values of their
+# low-cardinality columns come with the question, so the agent can go straight to `sql_db_query`.
+CATALOG_SQL_PREFIX = """You are an agent designed to answer questions about a gaming store from its {dialect} database.
+Given an input question, create a syntactically correct {dialect} query to run, then look at the results of the query and return the answer.
+Unless the user specifies a specific number of examples they wish to obtain, always limit your query to at most {top_k} results.
+Never query for all the columns from a specific table, only ask for the relevant columns given the question.
 
-def create_postgres_agent(llm: ChatOpenAI) -> AgentExecutor:
+The schema of the relevant tables is given with the question. Column values in braces are the values stored in that column when the schema was last scanned; a value missing from the list may have been added since.
+The table and column names are in English, but the data (order status, product names, cities, ...) is stored in Persian (Farsi):
+always compare against the exact stored values listed in the schema, never their English translation.
+Only call `sql_db_schema` if you need a table that is not listed. If you get an error while executing a query, rewrite the query and try again.
+
+DO NOT make any DML statements (INSERT, UPDATE, DELETE, DROP etc.) to the database.
+
+If the question does not seem related to the database, just return "I don't know" as the answer.
+"""
+
+CATALOG_SQL_SUFFIX = """Begin!
+
+Question: {input}
+Relevant tables:
+{schema_context}
+Thought: The relevant tables and their stored values are listed above, so I can write the query directly.
+{agent_scratchpad}"""
+
+
+class BoundedQuerySQLDatabaseTool(QuerySQLDatabaseTool):
+    """The standard `sql_db_query` tool, except that queries go through a `SQLQueryExecutor`: read-only, with a
+    statement timeout, streamed from a server-side cursor and cut at a row/byte budget. When awaited it uses
+    the executor's async engine instead of blocking a worker thread."""
+
+    executor: Any = Field(default=None, exclude=True)
+
+    def _run(self, query: str, run_manager: Optional[Any] = None) -> str:
+        return self.executor.run(query)
+
+    async def _arun(self, query: str, run_manager: Optional[Any] = None) -> str:
+        return await self.executor.arun(query)
+
+
+class BoundedSQLDatabaseToolkit(SQLDatabaseToolkit):
+    """SQL toolkit whose query tool runs on `executor`."""
+
+    executor: Any = Field(default=None, exclude=True)
+    exclude_tools: List[str] = Field(default_factory=list)
+
+    def get_tools(self) -> List[BaseTool]:
+        tools = super().get_tools()
+        return [
+            BoundedQuerySQLDatabaseTool(db=self.db, description=t.description, executor=self.executor)
+            if isinstance(t, QuerySQLDatabaseTool) else t
+            for t in tools if t.name not in self.exclude_tools
+        ]
+
+
+def _create_engine(uri: str, asynchronous: bool = False):
+    return create_pooled_engine(uri, pool_size=config.SQL_POOL_SIZE, max_overflow=config.SQL_MAX_OVERFLOW,
+                                pool_timeout=config.SQL_POOL_TIMEOUT, pool_recycle=config.SQL_POOL_RECYCLE,
+                                asynchronous=asynchronous, read_only=True,
+                                statement_timeout=config.SQL_STATEMENT_TIMEOUT)
+
+
+def _create_async_engine():
+    if not config.POSTGRES_ASYNC_URI:
+        return None
+    try:
+        return _create_engine(config.POSTGRES_ASYNC_URI, asynchronous=True)
+    except ImportError as e:
+        logger.warning(f"Async PostgreSQL driver unavailable ({e}); async queries will use a worker thread.")
+        return None
+
+
+def _with_schema_context(agent_executor: AgentExecutor, catalog: RefreshingCatalog) -> Runnable:
+    """Puts the catalog entries of the tables relevant to the question into the agent's input."""
+    return RunnablePassthrough.assign(
+        schema_context=lambda inputs: catalog.current().context_for(inputs["input"], config.SQL_CATALOG_MAX_TABLES)
+    ) | agent_executor
+
+
+def create_postgres_agent(llm: ChatOpenAI) -> Runnable:
     """This function creates and returns a specialized AgentExecutor for interacting with a PostgreSQL database
     specifically designed for managing a gaming store. The agent can handle queries related to products, orders,
     and customers within the gaming store database."""
 
     logger.info("Creating PostgreSQL agent executor...")
     try:
-        db = SQLDatabase.from_uri(config.POSTGRES_URI)
+        engine = _create_engine(config.POSTGRES_URI)
+        db = SQLDatabase(engine)
+        executor = SQLQueryExecutor(engine, _create_async_engine(),
+                                    max_rows=config.SQL_MAX_ROWS,
+                                    max_bytes=config.SQL_MAX_RESULT_BYTES,
+                                    statement_timeout=config.SQL_STATEMENT_TIMEOUT,
+                                    fetch_size=config.SQL_FETCH_SIZE,
+                                    max_cell_chars=config.SQL_MAX_CELL_CHARS)
 
         POSTGRES_SYSTEM_MESSAGE = """
         You are a specialized PostgreSQL assistant dedicated to managing a gaming store database.
@@ -36,16 +130,35 @@ def create_postgres_agent(llm: ChatOpenAI) -> AgentExecutor:
             MessagesPlaceholder(variable_name="agent_scratchpad"),
         ])
 
+        catalog = None
+        prompt_kwargs = {}
+        exclude_tools = []
+        if config.SQL_CATALOG_ENABLED:
+            catalog = RefreshingCatalog(
+                lambda: load_or_build_catalog(engine, config.SQL_CATALOG_PATH, config.SQL_CATALOG_MAX_DISTINCT,
+                                              store=get_shared_store(),
+                                              max_ratio=config.SQL_CATALOG_MAX_DISTINCT_RATIO,
+                                              max_age=config.SQL_CATALOG_VALUES_TTL),
+                config.SQL_CATALOG_VALUES_TTL)
+            prompt_kwargs = {"prefix": CATALOG_SQL_PREFIX, "suffix": CATALOG_SQL_SUFFIX}
+            exclude_tools = ["sql_db_list_tables", "sql_db_query_checker"]
+
+        toolkit = BoundedSQLDatabaseToolkit(db=db, llm=llm, executor=executor, exclude_tools=exclude_tools)
+
+        executor_options = agent_executor_options()
         agent_executor = create_sql_agent(
             llm=llm,
-            db=db,
+            toolkit=toolkit,
             agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-            verbose=True,
+            verbose=executor_options.pop("verbose"),
+            agent_executor_kwargs=executor_options,
             handle_parsing_errors=True,
+            max_iterations=config.AGENT_MAX_ITERATIONS,
+            **prompt_kwargs,
         )
 
         logger.info("PostgreSQL agent executor created successfully.")
-        return agent_executor
+        return _with_schema_context(agent_executor, catalog) if catalog else agent_executor
 
     except Exception as e:
         logger.exception(f"Error creating PostgreSQL agent: {e}", exc_info=True)
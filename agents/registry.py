@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+AgentFactory = Callable[[Any], Any]
+
+
+def _build_postgres_agent(llm):
+    from agents.postgres_agent import create_postgres_agent
+    return create_postgres_agent(llm)
+
+
+def _build_mongo_agent(llm):
+    from agents.mongo_agent import create_mongo_agent
+    return create_mongo_agent(llm)
+
+
+def _build_weather_agent(llm):
+    from agents.weather_agent import create_weather_agent
+    return create_weather_agent(llm)
+
+
+# Route name -> factory. The agent modules are imported inside the factories so that a process which is
+# never routed to, say, the Postgres agent does not even import the SQL toolkit.
+DEFAULT_AGENT_FACTORIES: Dict[str, AgentFactory] = {
+    "GamingStoreDB": _build_postgres_agent,
+    "AILearningPlatformDB": _build_mongo_agent,
+    "WeatherAPI": _build_weather_agent,
+}
+
+
+class AgentRegistry:
+    """Builds each specialist agent the first time it is requested and caches it for the life of the process.
+
+    The LLM itself is also created lazily through `llm_factory`, so constructing a registry is free. Builds are
+    guarded by a per-route lock: concurrent first requests for the same route wait for a single build, while
+    different routes can be built in parallel."""
+
+    def __init__(self, llm_factory: Callable[[], Any], factories: Dict[str, AgentFactory] = None):
+        self._llm_factory = llm_factory
+        self._factories = dict(factories if factories is not None else DEFAULT_AGENT_FACTORIES)
+        self._llm = None
+        self._agents: Dict[str, Any] = {}
+        self._llm_lock = threading.Lock()
+        self._locks = {name: threading.Lock() for name in self._factories}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._factories)
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    self._llm = self._llm_factory()
+        return self._llm
+
+    def built(self) -> List[str]:
+        """Returns the names of the agents that have been built so far."""
+        return list(self._agents)
+
+    def get(self, name: str):
+        """Returns the cached agent for `name`, building it on first use. Raises KeyError for unknown routes."""
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        if name not in self._factories:
+            raise KeyError(name)
+        with self._locks[name]:
+            agent = self._agents.get(name)
+            if agent is None:
+                logger.info(f"Building agent '{name}' on first use...")
+                agent = self._factories[name](self.llm)
+                self._agents[name] = agent
+        return agent
+
+    async def aget(self, name: str):
+        """Async variant of `get`: a first-time build (which may connect to a database) runs in a worker thread
+        so it does not stall the event loop."""
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        return await asyncio.to_thread(self.get, name)
+
+    def reset(self, llm_factory: Callable[[], Any] = None) -> None:
+        """Drops every cached agent (and the LLM), optionally switching to a new LLM factory."""
+        with self._llm_lock:
+            if llm_factory is not None:
+                self._llm_factory = llm_factory
+            self._llm = None
+            self._agents.clear()
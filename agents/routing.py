@@ -0,0 +1,118 @@
+"""Shared descriptions of the specialist routes.
+
+Both the tools router in `main.py` and the LangGraph router in `main_langgraph.py` dispatch to the same three
+specialists. Their descriptions live here so the LLM routers and the local fast-path router are trained on,
+and prompted with, the same text.
+"""
+import json
+import re
+from typing import Dict, Iterable, List, Literal
+
+from pydantic import BaseModel, Field
+
+_JSON_LIST = re.compile(r"\[.*\]", re.S)
+
+ROUTE_DESCRIPTIONS = {
+    "GamingStoreDB": (
+        "This tool is designed to handle all user inquiries related to the gaming store. "
+        "It provides detailed information about the store's products, including popular gaming consoles such as PlayStation, "
+        "gaming accessories like mice, keyboards, and headsets, as well as customer-related data such as purchase history, "
+        "account information, order statuses, shipping details, and payment records. "
+        "Use this tool to answer questions about product availability, technical specifications, pricing, ongoing promotions, "
+        "customer orders, returns, cancellations, and support issues within the gaming store ecosystem."
+    ),
+    "AILearningPlatformDB": (
+        "This tool specializes in providing comprehensive information about the AI learning platform. "
+        "It covers course details including titles, lesson contents, instructor information, course schedules, and enrollment options. "
+        "Additionally, it handles queries related to user profiles, course enrollments, progress tracking, certification statuses, "
+        "and feedback or ratings. Use this tool to answer questions about course availability, curriculum content, instructor expertise, "
+        "student progress, and administrative details within the AI education platform."
+    ),
+    "WeatherAPI": (
+        "This tool is dedicated to providing accurate and real-time weather information for any specified city worldwide. "
+        "It retrieves current weather conditions including temperature, humidity, wind speed, and descriptive weather states such as rain or sunshine. "
+        "Use this tool to obtain up-to-date weather forecasts, alerts, and climate-related data to assist users in planning their activities accordingly."
+    ),
+}
+
+# One line per route for the routers' prompts and tool descriptions. The long descriptions above train the fast
+# router; sent with every routing call they would cost far more tokens than the choice needs.
+ROUTE_SUMMARIES = {
+    "GamingStoreDB": "Handles inquiries about the gaming store products, customers, orders, and related data.",
+    "AILearningPlatformDB": "Handles queries regarding AI courses, lessons, instructors, user enrollments, and progress.",
+    "WeatherAPI": "Provides real-time weather information for specified locations.",
+}
+
+
+def render_routes() -> str:
+    """The routes as the "- name: summary" list of the router prompts. It never changes, so it stays within the
+    prompts' cacheable prefix."""
+    return "\n".join(f"    - {route}: {summary}" for route, summary in ROUTE_SUMMARIES.items())
+
+
+# A handful of short, typical questions per route (English and Persian) so the fast-path router has
+# question-shaped training data before any routing decisions have been logged.
+ROUTE_SEED_EXAMPLES = {
+    "GamingStoreDB": [
+        "What are the top 3 most expensive products in the store?",
+        "How many orders are still pending?",
+        "Show me the price of the PlayStation 5 console",
+        "Which customer placed the most orders?",
+        "Is the gaming headset in stock?",
+        "List the keyboards and mice we sell",
+        "وضعیت سفارش من چیست؟",
+        "قیمت کنسول پلی استیشن چقدر است؟",
+        "محصولات فروشگاه را نشان بده",
+    ],
+    "AILearningPlatformDB": [
+        "How many lessons does the 'Machine Learning Fundamentals' course have?",
+        "Who is the instructor for the deep learning course?",
+        "What courses is Alice Johnson enrolled in and what is her progress?",
+        "What is the content of the third lesson in the Python course?",
+        "Which students have completed the NLP course?",
+        "List all courses on the platform",
+        "مدرس دوره یادگیری ماشین کیست؟",
+        "پیشرفت کاربر در دوره چقدر است؟",
+        "درس های دوره پایتون را نشان بده",
+    ],
+    "WeatherAPI": [
+        "Should I take a jacket if I go to Paris today?",
+        "What's the weather like in Tehran?",
+        "Is it raining in London right now?",
+        "What is the temperature in Berlin?",
+        "How windy is it in Chicago today?",
+        "Will I need an umbrella in Tokyo?",
+        "هوای تهران چطور است؟",
+        "دمای هوای اصفهان چند درجه است؟",
+        "آیا در شیراز باران می بارد؟",
+    ],
+}
+
+
+class RouteDecision(BaseModel):
+    """Select the specialist that should answer the user's question."""
+
+    route: Literal["GamingStoreDB", "AILearningPlatformDB", "WeatherAPI", "end"] = Field(
+        description="The specialist to forward the question to, or 'end' if none of them is relevant.")
+
+
+def parse_route_plan(output: str, question: str, routes: Iterable[str]) -> List[Dict[str, str]]:
+    """Turns the LLM router's reply into a list of {"route", "question"} steps.
+
+    The router answers with a bare route name (or 'end') for single-source questions, and with a JSON list of
+    {"route", "question"} objects when the question needs several specialists. Unknown routes are dropped and
+    sub-questions for the same route are merged; an empty plan means 'end'."""
+    routes = set(routes)
+    match = _JSON_LIST.search(output)
+    if match:
+        try:
+            steps = json.loads(match.group(0))
+        except ValueError:
+            steps = []
+        merged: Dict[str, List[str]] = {}
+        for step in steps:
+            if isinstance(step, dict) and step.get("route") in routes:
+                merged.setdefault(step["route"], []).append(str(step.get("question") or question))
+        return [{"route": route, "question": " ".join(parts)} for route, parts in merged.items()]
+    route = output.strip().strip("`'\".")
+    return [{"route": route, "question": question}] if route in routes else []
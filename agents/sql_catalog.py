@@ -0,0 +1,284 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import weakref
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import sqlalchemy as sa
+
+from utils.answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+# Bump when the catalog layout changes so that old cache files are rebuilt instead of misread.
+CATALOG_VERSION = 2
+# How long a catalog stays in the shared store (`utils.shared_store`) when it has no `max_age`; a schema change
+# gets a new key at once.
+CATALOG_STORE_TTL = 24 * 60 * 60
+
+# Words (English and Persian) that refer to a table without using its name, so that 'سفارش‌های ارسال شده'
+# still selects `orders`.
+TABLE_ALIASES = {
+    "orders": ["order", "purchase", "سفارش", "خرید"],
+    "customers": ["customer", "buyer", "user", "مشتری", "خریدار", "کاربر"],
+    "products": ["product", "game", "item", "console", "محصول", "بازی", "کالا", "کنسول"],
+}
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+# Column names whose values identify a row or a person: never listed, however few distinct values they have.
+_IDENTIFIER_COLUMN = re.compile(
+    r"(?:^|_)(?:id|uuid|guid|key|code|token|secret|password|hash|e?mail|phone|mobile|tel|fax|address|street|zip|"
+    r"postcode|postal|ssn|iban|card|ip|(?:first|last|middle|full|user|display)_?name|name)(?:_|$)", re.IGNORECASE)
+
+
+@dataclass
+class ColumnInfo:
+    name: str
+    type: str
+    primary_key: bool = False
+    references: Optional[str] = None  # "table.column" for foreign keys
+    values: Optional[List[str]] = None  # every distinct value, for low-cardinality text columns
+
+
+@dataclass
+class TableInfo:
+    name: str
+    columns: List[ColumnInfo] = field(default_factory=list)
+
+    @property
+    def referenced_tables(self) -> List[str]:
+        return [c.references.split(".")[0] for c in self.columns if c.references]
+
+
+def reflect_schema(engine, schema: Optional[str] = None) -> Dict[str, TableInfo]:
+    """Tables, column types, primary and foreign keys, without touching any rows."""
+    inspector = sa.inspect(engine)
+    tables = {}
+    for table_name in inspector.get_table_names(schema=schema):
+        primary_key = set(inspector.get_pk_constraint(table_name, schema=schema).get("constrained_columns") or [])
+        references = {}
+        for fk in inspector.get_foreign_keys(table_name, schema=schema):
+            for local, remote in zip(fk["constrained_columns"], fk["referred_columns"]):
+                references[local] = f"{fk['referred_table']}.{remote}"
+        tables[table_name] = TableInfo(table_name, [
+            ColumnInfo(column["name"], str(column["type"]), column["name"] in primary_key,
+                       references.get(column["name"]))
+            for column in inspector.get_columns(table_name, schema=schema)
+        ])
+    return tables
+
+
+def schema_fingerprint(tables: Dict[str, TableInfo]) -> str:
+    shape = [(t.name, [(c.name, c.type, c.primary_key, c.references) for c in t.columns])
+             for t in sorted(tables.values(), key=lambda t: t.name)]
+    return hashlib.sha256(json.dumps([CATALOG_VERSION, shape]).encode()).hexdigest()
+
+
+def _is_text(type_name: str) -> bool:
+    return any(word in type_name.upper() for word in ("CHAR", "TEXT", "STRING", "ENUM"))
+
+
+def collect_values(engine, tables: Dict[str, TableInfo], max_distinct: int, schema: Optional[str] = None,
+                   max_ratio: float = 0.2) -> None:
+    """Stores the distinct values of every categorical text column: one with at most `max_distinct` distinct values
+    and at most `max_ratio` of them per row, whose name does not look like an identifier or personal data."""
+    with engine.connect() as connection:
+        for table in tables.values():
+            source = sa.table(table.name, schema=schema)
+            rows = None
+            for column in table.columns:
+                if column.primary_key or column.references or not _is_text(column.type) \
+                        or _IDENTIFIER_COLUMN.search(column.name):
+                    continue
+                if rows is None:
+                    rows = connection.execute(sa.select(sa.func.count()).select_from(source)).scalar() or 0
+                col = sa.column(column.name)
+                query = sa.select(col).select_from(source).where(col.isnot(None)).distinct().limit(max_distinct + 1)
+                values = [row[0] for row in connection.execute(query)]
+                if len(values) <= max_distinct and len(values) <= max_ratio * rows:
+                    column.values = sorted(str(v) for v in values)
+
+
+class SchemaCatalog:
+    """The reflected schema of the game store plus the literal values of its low-cardinality text columns.
+
+    `context_for(question)` renders only the tables that the question refers to (by name, alias, column name or
+    stored value), plus any table needed to join them, as a compact block for the SQL agent's prompt."""
+
+    def __init__(self, tables: Dict[str, TableInfo], fingerprint: str, created_at: Optional[float] = None):
+        self.tables = tables
+        self.fingerprint = fingerprint
+        self.created_at = time.time() if created_at is None else created_at
+        self._keywords = {name: self._keywords_of(table) for name, table in tables.items()}
+
+    @staticmethod
+    def _keywords_of(table: TableInfo) -> Dict[str, int]:
+        keywords = {}
+        for column in table.columns:
+            if column.references:  # e.g. orders.customer_id says nothing about orders being relevant
+                continue
+            for part in column.name.lower().split("_"):
+                if part not in ("id", "at"):
+                    keywords.setdefault(part, 1)
+        for word in [table.name.lower(), table.name.lower().rstrip("s")] + TABLE_ALIASES.get(table.name, []):
+            keywords[normalize_question(word)] = 3
+        return keywords
+
+    def _score(self, name: str, words: List[str], text: str) -> int:
+        score = 0
+        for keyword, weight in self._keywords[name].items():
+            if any(w == keyword or (len(keyword) >= 4 and w.startswith(keyword)) for w in words):
+                score += weight
+        for column in self.tables[name].columns:
+            for value in column.values or ():
+                if normalize_question(value) and normalize_question(value) in text:
+                    score += 2
+        return score
+
+    def relevant_tables(self, question: str, max_tables: int = 4) -> List[str]:
+        text = normalize_question(question)
+        words = _WORD.findall(text)
+        scores = {name: self._score(name, words, text) for name in self.tables}
+        selected = [name for name, score in sorted(scores.items(), key=lambda item: -item[1]) if score > 0]
+        if not selected:
+            return list(self.tables)
+        selected = selected[:max_tables]
+        for name, table in self.tables.items():  # link tables needed to join two selected tables
+            if name not in selected and len(selected) < max_tables \
+                    and len(set(table.referenced_tables) & set(selected)) >= 2:
+                selected.append(name)
+        return selected
+
+    def render(self, table_names: List[str]) -> str:
+        lines = []
+        for name in table_names:
+            columns = []
+            for column in self.tables[name].columns:
+                text = f"{column.name} {column.type}"
+                if column.primary_key:
+                    text += " PK"
+                if column.references:
+                    text += f" -> {column.references}"
+                if column.values:
+                    text += " {" + ", ".join(f"'{v}'" for v in column.values) + "}"
+                columns.append(text)
+            lines.append(f"{name}({', '.join(columns)})")
+        return "\n".join(lines)
+
+    def context_for(self, question: str, max_tables: int = 4) -> str:
+        return self.render(self.relevant_tables(question, max_tables))
+
+    def to_dict(self) -> dict:
+        return {"version": CATALOG_VERSION, "fingerprint": self.fingerprint, "created_at": self.created_at,
+                "tables": [asdict(table) for table in self.tables.values()]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SchemaCatalog":
+        tables = {t["name"]: TableInfo(t["name"], [ColumnInfo(**c) for c in t["columns"]]) for t in data["tables"]}
+        return cls(tables, data["fingerprint"], data.get("created_at", 0))
+
+
+def _load(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable schema catalog '{path}': {e}")
+        return None
+
+
+def _save(path: str, catalog: SchemaCatalog) -> None:
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(catalog.to_dict(), f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def load_or_build_catalog(engine, path: Optional[str] = None, max_distinct: int = 25,
+                          schema: Optional[str] = None, store=None, max_ratio: float = 0.2,
+                          max_age: Optional[float] = None) -> SchemaCatalog:
+    """Returns the catalog from the cache file at `path` (or from the shared `store`) if it was built by this catalog
+    version for the same schema less than `max_age` seconds ago; otherwise scans the categorical columns again and
+    rewrites both."""
+    tables = reflect_schema(engine, schema)
+    fingerprint = schema_fingerprint(tables)
+    cached = _load(path) if path else None
+    if cached and cached.get("version") == CATALOG_VERSION and cached.get("fingerprint") == fingerprint \
+            and (not max_age or time.time() - cached.get("created_at", 0) < max_age):
+        logger.info(f"Loaded schema catalog from '{path}'.")
+        return SchemaCatalog.from_dict(cached)
+    store_key = f"sql_catalog:{fingerprint}"
+    cached = store.get(store_key) if store is not None else None
+    if cached:
+        logger.info("Loaded schema catalog from the shared store.")
+        return SchemaCatalog.from_dict(cached)
+
+    start = time.perf_counter()
+    collect_values(engine, tables, max_distinct, schema, max_ratio)
+    catalog = SchemaCatalog(tables, fingerprint)
+    logger.info(f"Built schema catalog for {len(tables)} tables in {time.perf_counter() - start:.2f}s.")
+    if path:
+        try:
+            _save(path, catalog)
+        except OSError as e:
+            logger.warning(f"Could not write schema catalog to '{path}': {e}")
+    if store is not None:
+        store.set(store_key, catalog.to_dict(), max_age or CATALOG_STORE_TTL)
+    return catalog
+
+
+class RefreshingCatalog:
+    """Hands out the catalog made by `build` and, once it is `max_age` seconds old, builds a new one in a background
+    thread so that the listed values follow the data. Questions get the previous catalog until the new one is
+    ready; a failed refresh is retried a minute later. Safe to create before `fork()`."""
+
+    RETRY_DELAY = 60
+
+    def __init__(self, build: Callable[[], SchemaCatalog], max_age: Optional[float] = None):
+        self.build = build
+        self.max_age = max_age
+        self.catalog = build()
+        self._due = self.catalog.created_at + max_age if max_age else None
+        self._lock = threading.Lock()
+        ref = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: ref() is not None and ref()._reset())
+
+    def _reset(self) -> None:
+        # A refresh running in the parent has no thread in the child, which starts its own.
+        self._lock = threading.Lock()
+        if self.max_age and self._due is None:
+            self._due = time.time()
+
+    def current(self) -> SchemaCatalog:
+        if self._due is not None and time.time() >= self._due:
+            with self._lock:
+                if self._due is None or time.time() < self._due:
+                    return self.catalog
+                self._due = None  # one refresh at a time
+            threading.Thread(target=self._refresh, name="sql-catalog-refresh", daemon=True).start()
+        return self.catalog
+
+    def _refresh(self) -> None:
+        try:
+            self.catalog = self.build()
+            self._due = self.catalog.created_at + self.max_age
+        except Exception as e:
+            logger.warning(f"Could not refresh the schema catalog; retrying in {self.RETRY_DELAY}s: {e}")
+            self._due = time.time() + self.RETRY_DELAY
+
+
+if __name__ == "__main__":
+    import config
+
+    catalog = load_or_build_catalog(sa.create_engine(config.POSTGRES_URI), config.SQL_CATALOG_PATH,
+                                    config.SQL_CATALOG_MAX_DISTINCT, max_ratio=config.SQL_CATALOG_MAX_DISTINCT_RATIO,
+                                    max_age=config.SQL_CATALOG_VALUES_TTL)
+    print(catalog.render(list(catalog.tables)))
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+import re
+import time
+import weakref
+from typing import Any, List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+# String literals, quoted identifiers, comments and dollar-quoted bodies, whose semicolons do not end a statement.
+_SQL_NON_CODE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|\$(\w*)\$.*?\$\1\$", re.DOTALL)
+_READ_STATEMENT = re.compile(r"^\s*\(*\s*(?:select|with|values|table|explain|show)\b", re.IGNORECASE)
+
+
+def check_read_statement(query: str) -> None:
+    """Raises ValueError unless `query` is a single statement that reads (SELECT, WITH, VALUES, TABLE, EXPLAIN or
+    SHOW). Drivers such as psycopg2 run every statement of a string, so `SELECT 1; COMMIT; DELETE ...` would
+    otherwise step out of the read-only transaction."""
+    code = _SQL_NON_CODE.sub(" ", query).strip().rstrip(";").strip()
+    if ";" in code:
+        raise ValueError("Only one SQL statement can be run at a time.")
+    if not _READ_STATEMENT.match(code):
+        raise ValueError("Only read-only statements (SELECT, WITH, EXPLAIN, ...) can be run.")
+
+
+def _postgres_connect_args(driver: str, statement_timeout: float) -> dict:
+    # Every transaction on the connection is read-only and bounded by the timeout, whatever the query says.
+    settings = {"default_transaction_read_only": "on", "statement_timeout": str(int(statement_timeout * 1000))}
+    if driver == "asyncpg":
+        return {"server_settings": settings}
+    return {"options": " ".join(f"-c {name}={value}" for name, value in settings.items())}
+
+
+def create_pooled_engine(uri: str, pool_size: int = 5, max_overflow: int = 10, pool_timeout: float = 30,
+                         pool_recycle: int = 1800, asynchronous: bool = False, read_only: bool = False,
+                         statement_timeout: Optional[float] = None):
+    """A SQLAlchemy engine with a bounded, health-checked connection pool (`asynchronous` for an async URI).
+    SQLite URIs keep SQLAlchemy's default pool, which does not take size arguments. With `read_only`, PostgreSQL
+    connections are opened read-only (`default_transaction_read_only`) and with `statement_timeout` seconds
+    per statement. The engine is safe to create before `fork()`: a forked process starts with an empty pool of
+    its own."""
+    url = make_url(uri)
+    kwargs = {"pool_pre_ping": True, "pool_recycle": pool_recycle}
+    if url.get_backend_name() != "sqlite":
+        kwargs.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+    if read_only and url.get_backend_name() == "postgresql":
+        kwargs["connect_args"] = _postgres_connect_args(url.get_driver_name(), statement_timeout or 0)
+    if asynchronous:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        engine = create_async_engine(uri, **kwargs)
+        _dispose_after_fork(engine.sync_engine)
+        return engine
+    engine = create_engine(uri, **kwargs)
+    _dispose_after_fork(engine)
+    return engine
+
+
+def _dispose_after_fork(engine) -> None:
+    # The parent's pooled connections share their sockets with the child; the child drops them unclosed (closing
+    # them would end the parent's sessions) and opens its own.
+    ref = weakref.ref(engine)
+
+    def dispose():
+        if ref() is not None:
+            ref().dispose(close=False)
+
+    os.register_at_fork(after_in_child=dispose)
+
+
+def _cell(value: Any, max_chars: int) -> str:
+    if value is None:
+        return "NULL"
+    text_value = str(value).replace("\\", "\\\\").replace("|", "\\|").replace("\n", "\\n")
+    if len(text_value) > max_chars:
+        text_value = text_value[:max_chars] + "..."
+    return text_value
+
+
+class _TableRenderer:
+    """Encodes rows as a pipe-separated table until the row or byte budget is exhausted."""
+
+    def __init__(self, columns: List[str], max_rows: int, max_bytes: int, max_cell_chars: int):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_cell_chars = max_cell_chars
+        self.lines = ["|".join(columns)]
+        self.size = len(self.lines[0].encode())
+        self.rows = 0
+        self.truncated_by = None
+
+    def add(self, rows) -> bool:
+        """Adds a batch of rows; returns False once nothing more will be accepted."""
+        for row in rows:
+            if self.rows >= self.max_rows:
+                self.truncated_by = "row"
+                return False
+            line = "|".join(_cell(value, self.max_cell_chars) for value in row)
+            size = len(line.encode()) + 1
+            if self.size + size > self.max_bytes and self.rows:
+                self.truncated_by = "size"
+                return False
+            self.lines.append(line)
+            self.size += size
+            self.rows += 1
+        return True
+
+    def result(self) -> str:
+        if not self.rows:
+            return "(0 rows)"
+        if self.truncated_by is None:
+            return "\n".join(self.lines) + f"\n({self.rows} rows)"
+        limit = f"{self.max_rows} rows" if self.truncated_by == "row" else f"{self.max_bytes} bytes"
+        return "\n".join(self.lines) + (f"\n(showing the first {self.rows} rows; the result was cut at the "
+                                        f"{limit} limit and has more rows. Filter, aggregate or add a LIMIT.)")
+
+
+class SQLQueryExecutor:
+    """Runs the SQL agent's queries on a pooled engine, read-only and with a statement timeout.
+
+    Rows are fetched `fetch_size` at a time from a server-side cursor (`stream_results`) and encoded as a
+    compact table; fetching stops as soon as `max_rows` rows or `max_bytes` bytes of output are reached, so an
+    unbounded `SELECT * FROM orders` costs no more than its first page. Only a single reading statement is
+    accepted (`check_read_statement`), and the transaction is always rolled back. For PostgreSQL, build the
+    engines with `create_pooled_engine(..., read_only=True)` so that the connection itself is read-only too."""
+
+    def __init__(self, engine, async_engine=None, max_rows: int = 50, max_bytes: int = 8000,
+                 statement_timeout: float = 10, fetch_size: int = 100, max_cell_chars: int = 200):
+        self.engine = engine
+        self.async_engine = async_engine
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.statement_timeout = statement_timeout
+        self.fetch_size = fetch_size
+        self.max_cell_chars = max_cell_chars
+
+    def _renderer(self, columns) -> _TableRenderer:
+        return _TableRenderer(list(columns), self.max_rows, self.max_bytes, self.max_cell_chars)
+
+    def _batch_size(self) -> int:
+        # One row past `max_rows` is enough to know that the result was cut.
+        return min(self.fetch_size, self.max_rows + 1)
+
+    def _execution_options(self) -> dict:
+        return {"stream_results": True, "max_row_buffer": self._batch_size()}
+
+    def _read_only_statements(self, dialect: str) -> List[str]:
+        if dialect == "postgresql":
+            return ["SET TRANSACTION READ ONLY",
+                    f"SET LOCAL statement_timeout = {int(self.statement_timeout * 1000)}"]
+        return []
+
+    def _guard_sqlite(self, connection) -> None:
+        """SQLite has neither read-only transactions nor statement timeouts; use `query_only` and a progress
+        handler that aborts the statement after the deadline instead."""
+        driver_connection = connection.connection.driver_connection
+        connection.exec_driver_sql("PRAGMA query_only = ON")
+        deadline = time.monotonic() + self.statement_timeout
+        driver_connection.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+
+    @staticmethod
+    def _unguard_sqlite(connection) -> None:
+        connection.connection.driver_connection.set_progress_handler(None, 0)
+        connection.exec_driver_sql("PRAGMA query_only = OFF")
+
+    def run(self, query: str) -> str:
+        try:
+            check_read_statement(query)
+            with self.engine.connect() as connection:
+                dialect = connection.dialect.name
+                transaction = connection.begin()
+                try:
+                    for statement in self._read_only_statements(dialect):
+                        connection.exec_driver_sql(statement)
+                    if dialect == "sqlite":
+                        self._guard_sqlite(connection)
+                    result = connection.execution_options(**self._execution_options()).execute(text(query))
+                    if not result.returns_rows:
+                        return "(0 rows)"
+                    renderer = self._renderer(result.keys())
+                    try:
+                        for partition in result.partitions(self._batch_size()):
+                            if not renderer.add(partition):
+                                break
+                    finally:
+                        result.close()
+                    return renderer.result()
+                finally:
+                    transaction.rollback()
+                    if dialect == "sqlite":
+                        self._unguard_sqlite(connection)
+        except Exception as e:
+            logger.warning(f"SQL query failed: {e}")
+            return f"Error: {e}"
+
+    async def arun(self, query: str) -> str:
+        if self.async_engine is None:
+            return await asyncio.to_thread(self.run, query)
+        try:
+            check_read_statement(query)
+            async with self.async_engine.connect() as connection:
+                transaction = await connection.begin()
+                try:
+                    for statement in self._read_only_statements(connection.dialect.name):
+                        await connection.exec_driver_sql(statement)
+                    result = await connection.stream(text(query), execution_options=self._execution_options())
+                    renderer = self._renderer(result.keys())
+                    try:
+                        async for partition in result.partitions(self._batch_size()):
+                            if not renderer.add(partition):
+                                break
+                    finally:
+                        await result.close()
+                    return renderer.result()
+                finally:
+                    await transaction.rollback()
+        except Exception as e:
+            logger.warning(f"SQL query failed: {e}")
+            return f"Error: {e}"
@@ -2,45 +2,57 @@ import logging
 import os
 from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain_core.prompts import MessagesPlaceholder, ChatPromptTemplate
-import requests
-from langchain.tools import tool
+from langchain.tools import StructuredTool
 from langchain_openai import ChatOpenAI
 import config
+from agents.weather_client import CityNotFoundError, get_weather_client
+from utils.logging_config import agent_executor_options
 
 logger = logging.getLogger(__name__)
 
 
+def _format_weather(city: str, data: dict) -> str:
+    return f"Current weather in {city}: {data['weather'][0]['description']}, Temperature: {data['main']['temp']}°C"
+
+
 def create_weather_agent(llm: ChatOpenAI) -> AgentExecutor:
     """This function creates and returns a specialized AgentExecutor that integrates with a weather API service.
     The agent is designed to provide up-to-date current weather information for a specified city.
+    The weather tool has both a blocking and an asyncio implementation, so the agent can be driven with either
+    `invoke` or `ainvoke`. Both go through the process-wide `WeatherClient` (pooled connections, per-city TTL cache,
+    request coalescing and retries).
     """
 
     logger.info("Creating Weather agent executor...")
+    client = get_weather_client()
 
-    @tool
     def get_current_weather(city: str) -> str:
         """Use this tool to get the current weather for a specific city."""
         logger.info(f"Fetching weather for city: {city}")
-        params = {'q': city, 'appid': config.WEATHER_API_KEY, 'units': 'metric', 'lang': 'fa'}
 
         try:
-            response = requests.get(config.WEATHER_API_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-            return f"Current weather in {city}: {data['weather'][0]['description']}, Temperature: {data['main']['temp']}°C"
-
-        except requests.exceptions.HTTPError as http_err:
-            if response.status_code == 404:
-                logger.warning(f"City not found: {city}")
-                return f"Unfortunately, the city {city} is not available."
-            else:
-                logger.error(f"HTTP error fetching weather for {city}: {http_err}", exc_info=True)
-                return f"An HTTP error occurred: {http_err}"
+            return _format_weather(city, client.get(city))
+        except CityNotFoundError:
+            logger.warning(f"City not found: {city}")
+            return f"Unfortunately, the city {city} is not available."
+        except Exception as e:
+            logger.error(f"An unexpected error occurred while fetching weather for {city}: {e}", exc_info=True)
+            return f"An unexpected error occurred: {e}"
+
+    async def aget_current_weather(city: str) -> str:
+        """Use this tool to get the current weather for a specific city."""
+        logger.info(f"Fetching weather for city (async): {city}")
+
+        try:
+            return _format_weather(city, await client.aget(city))
+        except CityNotFoundError:
+            logger.warning(f"City not found: {city}")
+            return f"Unfortunately, the city {city} is not available."
         except Exception as e:
             logger.error(f"An unexpected error occurred while fetching weather for {city}: {e}", exc_info=True)
             return f"An unexpected error occurred: {e}"
 
-    tools = [get_current_weather]
+    tools = [StructuredTool.from_function(func=get_current_weather, coroutine=aget_current_weather)]
     SYSTEM_MESSAGE = """
                     You are a helpful assistant whose only job is to provide the current weather for a specific city.
                     You MUST use the `get_current_weather` tool to answer the user's questions.
@@ -55,8 +67,9 @@ def create_weather_agent(llm: ChatOpenAI) -> AgentExecutor:
 
     agent_executor = AgentExecutor(agent=agent,
                                    tools=tools,
-                                   verbose=True,
-                                   handle_parsing_errors=True
+                                   handle_parsing_errors=True,
+                                   max_iterations=config.AGENT_MAX_ITERATIONS,
+                                   **agent_executor_options()
                                    )
 
     logger.info("Weather agent executor created successfully.")
@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from utils.answer_cache import normalize_question
+from utils.shared_store import get_shared_store
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Persian spellings (and common transliterations) mapped to the English name sent to OpenWeatherMap, so that
+# 'تهران', 'Tehran' and 'tehran ' share one cache entry and one upstream call.
+CITY_ALIASES = {
+    "تهران": "tehran", "tehrān": "tehran",
+    "اصفهان": "isfahan", "esfahan": "isfahan", "isfahān": "isfahan",
+    "شیراز": "shiraz",
+    "مشهد": "mashhad", "mashad": "mashhad",
+    "تبریز": "tabriz",
+    "کرج": "karaj",
+    "قم": "qom", "ghom": "qom",
+    "اهواز": "ahvaz", "ahwaz": "ahvaz",
+    "کرمانشاه": "kermanshah",
+    "رشت": "rasht",
+    "یزد": "yazd",
+    "کرمان": "kerman",
+    "ارومیه": "urmia", "orumiyeh": "urmia",
+    "بندرعباس": "bandar abbas", "بندر عباس": "bandar abbas",
+    "لندن": "london",
+    "پاریس": "paris",
+    "برلین": "berlin",
+    "دبی": "dubai",
+    "استانبول": "istanbul",
+    "توکیو": "tokyo",
+    "نیویورک": "new york", "nyc": "new york",
+    "مسکو": "moscow",
+}
+_CITY_PREFIXES = ("شهر ", "city of ")
+_CITY_SUFFIXES = (" city", " شهر")
+
+
+class CityNotFoundError(Exception):
+    """The weather service does not know the requested city."""
+
+
+class WeatherServiceError(Exception):
+    """The weather service could not be reached or kept failing after all retries."""
+
+
+def _city_name(city: str) -> str:
+    name = normalize_question(city)
+    for prefix in _CITY_PREFIXES:
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    for suffix in _CITY_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+
+def normalize_city(city: str) -> str:
+    """Returns the canonical city name used as the cache key."""
+    name = _city_name(city)
+    return CITY_ALIASES.get(name, name)
+
+
+def upstream_city(city: str) -> str:
+    """Returns the name sent to OpenWeatherMap: the English name of a known alias, otherwise the city as given, so
+    that "Paris, FR" keeps the country code that tells it from Paris, Texas."""
+    return CITY_ALIASES.get(_city_name(city)) or city.strip()
+
+
+def _is_retryable(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+class WeatherClient:
+    """A pooled, caching OpenWeatherMap client shared by every weather tool call in the process.
+
+    * one `requests.Session` (sync) and one `httpx.AsyncClient` per event loop (async) keep connections alive,
+    * results are cached per normalized city for `ttl` seconds (unknown cities for `not_found_ttl`),
+    * with a `store` (`utils.shared_store`) results are also cached there, so that pre-fork workers share them,
+    * concurrent requests for the same city are coalesced into a single upstream call (single-flight),
+    * timeouts, connection errors, 429 and 5xx responses are retried up to `max_retries` times with
+      exponential backoff.
+
+    A client created before `fork()` keeps its cache in the child, with connections and locks of its own."""
+
+    def __init__(self, api_url: str, api_key: Optional[str], ttl: float = 600, not_found_ttl: float = 60,
+                 timeout: float = 5, max_retries: int = 2, backoff: float = 0.5, pool_size: int = 10, store=None):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.ttl = ttl
+        self.not_found_ttl = not_found_ttl
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.store = store
+
+        self._cache: Dict[str, Tuple[float, Optional[dict]]] = {}
+        self._connect()
+        self.stats = {"upstream_calls": 0, "cache_hits": 0, "shared_hits": 0, "coalesced": 0, "retries": 0}
+        ref = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: ref() is not None and ref()._connect())
+
+    def _connect(self) -> None:
+        # Connections, locks and in-flight requests of the parent must not be used after fork(): a child
+        # starts with new ones.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        # Per event loop: its async client, its in-flight requests, and the generator that closes the client when
+        # the loop shuts down (see `_loop_state`).
+        self._loops: Dict[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, Dict[str, asyncio.Future], Any]] = {}
+
+    def clear(self) -> None:
+        """Drops every cached result."""
+        with self._lock:
+            self._cache.clear()
+
+    def _params(self, query: str) -> dict:
+        return {'q': query, 'appid': self.api_key, 'units': 'metric', 'lang': 'fa'}
+
+    def _cached(self, key: str):
+        """Returns (hit, data); data is None for a cached 'city not found'."""
+        entry = self._cache.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return False, None
+        self.stats["cache_hits"] += 1
+        return True, entry[1]
+
+    def _store(self, key: str, data: Optional[dict], ttl: Optional[float] = None, shared: bool = True) -> None:
+        if ttl is None:
+            ttl = self.ttl if data is not None else self.not_found_ttl
+        with self._lock:
+            self._cache[key] = (time.monotonic() + ttl, data)
+        if shared and self.store is not None and ttl > 0:
+            self.store.set(f"weather:{key}", {"data": data}, ttl)
+
+    def _shared(self, key: str):
+        """Returns (hit, data) from the shared store, caching a hit locally for the time it has left."""
+        found = self.store.lookup(f"weather:{key}") if self.store is not None else None
+        if found is None:
+            return False, None
+        value, remaining = found
+        self._store(key, value["data"], remaining, shared=False)
+        with self._lock:
+            self.stats["shared_hits"] += 1
+        return True, value["data"]
+
+    @staticmethod
+    def _result(city: str, data: Optional[dict]) -> dict:
+        if data is None:
+            raise CityNotFoundError(city)
+        return data
+
+    def get(self, city: str) -> dict:
+        """Returns the OpenWeatherMap payload for the city. Raises CityNotFoundError or WeatherServiceError."""
+        key = normalize_city(city)
+        with self._lock:
+            hit, data = self._cached(key)
+            if hit:
+                return self._result(city, data)
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            return self._result(city, future.result())
+
+        try:
+            hit, data = self._shared(key)
+            if not hit:
+                with span("http", "openweathermap") as fields:
+                    data = self._fetch(key, upstream_city(city))
+                    fields["result_size"] = len(str(data)) if data else 0
+                self._store(key, data)
+            future.set_result(data)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return self._result(city, data)
+
+    def _fetch(self, key: str, query: str) -> Optional[dict]:
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            with self._lock:
+                self.stats["upstream_calls"] += 1
+            try:
+                response = self._session.get(self.api_url, params=self._params(query), timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                logger.warning(f"Weather request for '{key}' failed (attempt {attempt + 1}): {e}")
+                last_error = e
+                continue
+            if response.status_code == 404:
+                return None
+            if _is_retryable(response.status_code):
+                logger.warning(f"Weather service returned {response.status_code} for '{key}' (attempt {attempt + 1}).")
+                last_error = requests.exceptions.HTTPError(f"{response.status_code} {response.reason}")
+                continue
+            response.raise_for_status()
+            return response.json()
+        raise WeatherServiceError(f"Weather service unavailable for '{key}': {last_error}")
+
+    async def _loop_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+            closer = _close_at_shutdown(client)
+            state = self._loops[loop] = (client, {}, closer)
+            for other in [l for l in self._loops if l.is_closed()]:
+                del self._loops[other]
+            # Started on this loop, the generator is finalized by the loop's `shutdown_asyncgens()` (run by
+            # `asyncio.run` and uvicorn before closing the loop), which closes the client on the loop it belongs to.
+            await closer.__anext__()
+        return state
+
+    async def aget(self, city: str) -> dict:
+        """Async variant of `get`, sharing the same cache."""
+        key = normalize_city(city)
+        with self._lock:
+            hit, data = self._cached(key)
+        if hit:
+            return self._result(city, data)
+
+        client, inflight, _ = await self._loop_state()
+        future = inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return self._result(city, await asyncio.shield(future))
+
+        future = inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            hit, data = await asyncio.to_thread(self._shared, key) if self.store is not None else (False, None)
+            if not hit:
+                with span("http", "openweathermap") as fields:
+                    data = await self._afetch(client, key, upstream_city(city))
+                    fields["result_size"] = len(str(data)) if data else 0
+                if self.store is not None:
+                    await asyncio.to_thread(self._store, key, data)
+                else:
+                    self._store(key, data)
+            future.set_result(data)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark as retrieved so an unawaited failure is not reported by asyncio
+            raise
+        finally:
+            inflight.pop(key, None)
+        return self._result(city, data)
+
+    async def _afetch(self, client: httpx.AsyncClient, key: str, query: str) -> Optional[dict]:
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            with self._lock:
+                self.stats["upstream_calls"] += 1
+            try:
+                response = await client.get(self.api_url, params=self._params(query))
+            except httpx.TransportError as e:
+                logger.warning(f"Weather request for '{key}' failed (attempt {attempt + 1}): {e}")
+                last_error = e
+                continue
+            if response.status_code == 404:
+                return None
+            if _is_retryable(response.status_code):
+                logger.warning(f"Weather service returned {response.status_code} for '{key}' (attempt {attempt + 1}).")
+                last_error = httpx.HTTPStatusError(f"{response.status_code}", request=response.request,
+                                                   response=response)
+                continue
+            response.raise_for_status()
+            return response.json()
+        raise WeatherServiceError(f"Weather service unavailable for '{key}': {last_error}")
+
+
+async def _close_at_shutdown(client: httpx.AsyncClient):
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+_client: Optional[WeatherClient] = None
+_client_lock = threading.Lock()
+
+
+def get_weather_client() -> WeatherClient:
+    """Returns the process-wide weather client, created from the configuration on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WeatherClient(config.WEATHER_API_URL, config.WEATHER_API_KEY,
+                                        ttl=config.WEATHER_CACHE_TTL, not_found_ttl=config.WEATHER_NOT_FOUND_TTL,
+                                        timeout=config.WEATHER_TIMEOUT, max_retries=config.WEATHER_MAX_RETRIES,
+                                        backoff=config.WEATHER_RETRY_BACKOFF, pool_size=config.WEATHER_POOL_SIZE,
+                                        store=get_shared_store())
+    return _client
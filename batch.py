@@ -0,0 +1,236 @@
+"""Batch mode: answers a JSON-lines file of questions through the LangGraph app with a pool of worker threads or
+coroutines, and streams one JSON line per question (route, answer, latency, error) to an output file.
+
+Each input line is an object with a "question" and optionally an "id" (by default its line number) and a
+"session_id"; the questions of one session are answered in file order by a single worker, as turns of one
+conversation. A plain JSON string is read as a question.
+
+The output file is also the checkpoint: every record is flushed as soon as its question is answered, and a rerun
+with the same output file skips the questions already answered without an error, so a crashed or interrupted
+batch resumes where it stopped (a line cut short by the crash is ignored).
+
+    python batch.py questions.jsonl --output answers.jsonl --workers 8 --mode async --qps 5
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+import config
+import main_langgraph
+from utils.rate_limit import create_rate_limiter, set_rate_limiter
+from utils.tracing import percentile
+
+logger = logging.getLogger(__name__)
+
+
+def load_questions(path: str) -> List[dict]:
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping line {line_no} of '{path}': not valid JSON.")
+                continue
+            if isinstance(item, str):
+                item = {"question": item}
+            if not isinstance(item, dict) or not item.get("question"):
+                logger.warning(f"Skipping line {line_no} of '{path}': no question.")
+                continue
+            items.append({**item, "id": str(item.get("id", line_no))})
+    return items
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """The ids of the questions answered without an error in an earlier run's output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and not record.get("error"):
+                done.add(str(record.get("id")))
+    return done
+
+
+def work_units(items: List[dict]) -> List[List[dict]]:
+    """Groups the questions into units of work: the questions of a session together (in file order), every other
+    question on its own."""
+    sessions: Dict[str, List[dict]] = {}
+    units = []
+    for item in items:
+        session_id = item.get("session_id")
+        if session_id is None:
+            units.append([item])
+        elif session_id in sessions:
+            sessions[session_id].append(item)
+        else:
+            sessions[session_id] = [item]
+            units.append(sessions[session_id])
+    return units
+
+
+class ResultWriter:
+    """Appends one JSON line per answered question to the output file, flushed at once, from any thread."""
+
+    def __init__(self, path: str):
+        cut_short = False  # the last line of an earlier run was cut short by a crash: start a new one
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                cut_short = f.read(1) != b"\n"
+        self._file = open(path, "a", encoding="utf-8")
+        if cut_short:
+            self._file.write("\n")
+        self._lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.latencies.append(record["latency_ms"])
+            self.errors += 1 if record["error"] else 0
+            if len(self.latencies) % 100 == 0:
+                logger.info(f"Batch progress: {len(self.latencies)} questions answered ({self.errors} errors).")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def _run_config(item: dict) -> dict:
+    return {"run_name": "batch", "metadata": {"request_id": f"batch-{item['id']}"}}
+
+
+def _record(item: dict, start: float, final_state: Optional[dict] = None, error: Optional[str] = None) -> dict:
+    final_state = final_state or {}
+    return {"id": item["id"], "question": item["question"], "session_id": item.get("session_id"),
+            "route": final_state.get("next_agent"), "answer": final_state.get("agent_outcome"),
+            "cached": final_state.get("cached", False), "budget_exhausted": final_state.get("budget_exhausted"),
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1), "error": error, "ts": time.time()}
+
+
+def answer_one(item: dict, writer: ResultWriter) -> None:
+    start = time.perf_counter()
+    try:
+        final_state = main_langgraph.answer_question(item["question"], run_config=_run_config(item),
+                                                     session_id=item.get("session_id"))
+        writer.write(_record(item, start, final_state))
+    except Exception as e:
+        logger.error(f"Question '{item['id']}' failed: {e}", exc_info=True)
+        writer.write(_record(item, start, error=str(e)))
+
+
+async def aanswer_one(item: dict, writer: ResultWriter) -> None:
+    start = time.perf_counter()
+    try:
+        final_state = await main_langgraph.aanswer_question(item["question"], run_config=_run_config(item),
+                                                            session_id=item.get("session_id"))
+        writer.write(_record(item, start, final_state))
+    except Exception as e:
+        logger.error(f"Question '{item['id']}' failed: {e}", exc_info=True)
+        writer.write(_record(item, start, error=str(e)))
+
+
+def run_threads(units: List[List[dict]], workers: int, writer: ResultWriter) -> None:
+    """Answers the units on `workers` threads, each with the blocking `invoke`."""
+    def run_unit(unit: List[dict]) -> None:
+        for item in unit:
+            answer_one(item, writer)
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+    try:
+        for future in [pool.submit(run_unit, unit) for unit in units]:
+            future.result()
+    finally:
+        # On Ctrl-C the questions not started yet are dropped; those in progress are still written.
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+async def run_async(units: List[List[dict]], workers: int, writer: ResultWriter) -> None:
+    """Answers the units with `workers` coroutines on one event loop, each with `ainvoke`."""
+    queue: asyncio.Queue = asyncio.Queue()
+    for unit in units:
+        queue.put_nowait(unit)
+
+    async def worker() -> None:
+        while not queue.empty():
+            for item in queue.get_nowait():
+                await aanswer_one(item, writer)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+
+
+def run_batch(input_path: str, output_path: str, workers: int = None, mode: str = "thread") -> dict:
+    """Answers the questions of `input_path` not yet answered in `output_path` and returns a summary: questions,
+    skipped (already answered), answered, errors, elapsed seconds, questions per second and latency p50/p95."""
+    if mode not in ("thread", "async"):
+        raise ValueError(f"Unknown batch mode '{mode}'; expected 'thread' or 'async'.")
+    workers = workers or config.BATCH_WORKERS
+    items = load_questions(input_path)
+    done = completed_ids(output_path)
+    pending = [item for item in items if item["id"] not in done]
+    if done:
+        logger.info(f"Resuming: {len(items) - len(pending)} of {len(items)} questions were already answered.")
+    logger.info(f"Answering {len(pending)} questions with {workers} {mode} workers.")
+
+    writer = ResultWriter(output_path)
+    start = time.perf_counter()
+    try:
+        if mode == "async":
+            asyncio.run(run_async(work_units(pending), workers, writer))
+        else:
+            run_threads(work_units(pending), workers, writer)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    latencies = sorted(writer.latencies)
+    return {"questions": len(items), "skipped": len(items) - len(pending), "answered": len(latencies),
+            "errors": writer.errors, "elapsed_s": round(elapsed, 3),
+            "questions_per_s": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+            "p50_ms": statistics.median(latencies) if latencies else None,
+            "p95_ms": percentile(latencies, 95) if latencies else None}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSON-lines file of questions.")
+    parser.add_argument("--output", required=True, help="JSON-lines file the answers are appended to.")
+    parser.add_argument("--workers", type=int, default=config.BATCH_WORKERS)
+    parser.add_argument("--mode", choices=["thread", "async"], default=config.BATCH_MODE)
+    parser.add_argument("--qps", type=float, default=config.LLM_REQUESTS_PER_SECOND,
+                        help="Limit on LLM calls per second across all workers.")
+    parser.add_argument("--burst", type=float, default=config.LLM_MAX_BURST,
+                        help="LLM calls allowed at once after an idle period.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or fill the answer cache.")
+    parser.add_argument("--restart", action="store_true", help="Discard the output file instead of resuming.")
+    args = parser.parse_args()
+
+    set_rate_limiter(create_rate_limiter(args.qps, args.burst))
+    if args.no_cache:
+        main_langgraph.set_answer_cache(None)
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    try:
+        summary = run_batch(args.input, args.output, args.workers, args.mode)
+    except KeyboardInterrupt:
+        logger.warning("Batch interrupted; run it again with the same --output to resume.")
+        raise SystemExit(130)
+    print(json.dumps(summary))
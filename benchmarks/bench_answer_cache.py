@@ -0,0 +1,83 @@
+"""Answer-cache benchmark: latency of a cache hit versus a full agent run.
+
+Each question is first answered through `main_langgraph.answer_question` with an empty cache (router + specialist
+agent + tool against the stand-ins, scripted LLM with `--llm-latency`), then asked again in a differently
+formatted spelling that normalizes to the same key. The second pass is served from the cache. Both the in-memory
+LRU and the SQLite backend are measured; the SQLite run also reopens the cache to show the answers survive a
+restart.
+
+    python -m benchmarks.bench_answer_cache --llm-latency 0.3
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import format_summary, summarize
+
+QUESTIONS = [
+    "What's the weather in Paris today?",
+    "Which courses are available on the platform?",
+    "Who teaches the deep learning course?",
+    "Is it raining in London?",
+]
+
+
+def respell(question: str) -> str:
+    return "  " + question.upper().replace("?", " ?!") + " "
+
+
+def measure(main_langgraph, questions) -> list:
+    timings = []
+    for question in questions:
+        start = time.perf_counter()
+        main_langgraph.answer_question(question)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main(args) -> None:
+    from benchmarks.standins import create_mongomock_client, install_standins, make_standin_responder, start_weather_stub
+
+    _, weather_url = start_weather_stub()
+    install_standins(weather_url=weather_url, mongo_client=create_mongomock_client())
+
+    import config
+    import main_langgraph
+    from benchmarks.common import ScriptedChatModel
+    from utils.answer_cache import AnswerCache
+
+    config.ROUTING_LOG_PATH = None
+    config.TRACE_PATH = None
+    main_langgraph.set_llm(ScriptedChatModel(responder=make_standin_responder(), latency=args.llm_latency))
+    sqlite_path = os.path.join(tempfile.mkdtemp(), "answer_cache.sqlite3")
+
+    reports = []
+    for backend, path in (("memory", None), ("sqlite", sqlite_path)):
+        main_langgraph.set_answer_cache(AnswerCache(config.ANSWER_CACHE_TTLS, sqlite_path=path))
+        misses = measure(main_langgraph, QUESTIONS * 1)
+        hits = measure(main_langgraph, [respell(q) for q in QUESTIONS] * args.rounds)
+        reports.append((backend, misses, hits, main_langgraph.get_answer_cache().stats()))
+
+    restarted = AnswerCache(config.ANSWER_CACHE_TTLS, sqlite_path=sqlite_path)
+    disk_hits, survived = [], 0
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        survived += restarted.get(question) is not None
+        disk_hits.append(time.perf_counter() - start)
+
+    print()
+    for backend, misses, hits, stats in reports:
+        print(f"[{backend}]")
+        print(format_summary("  full agent run (miss)", summarize(misses)))
+        print(format_summary("  cache hit", summarize(hits)))
+        print(f"  speedup p50: {summarize(misses)['p50_ms'] / summarize(hits)['p50_ms']:.0f}x   metrics: {stats}")
+    print(f"sqlite entries found after reopening the cache: {survived}/{len(QUESTIONS)}")
+    print(format_summary("  cold hit read from sqlite", summarize(disk_hits)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Simulated LLM latency in seconds.")
+    parser.add_argument("--rounds", type=int, default=50, help="How many times the cached questions are re-asked.")
+    main(parser.parse_args())
@@ -0,0 +1,64 @@
+"""Async load benchmark: throughput of `main_langgraph.aanswer_questions` at increasing concurrency.
+
+Questions alternate between the weather agent (local fake OpenWeatherMap with `--weather-latency`) and the
+learning-platform agent (mongomock). The chat model is scripted and awaits `--llm-latency` per call, the way a
+remote model would. Since almost all of a request's time is spent waiting on I/O, throughput should grow close
+to linearly with the semaphore size until the CPU becomes the bottleneck.
+
+    python -m benchmarks.bench_async_load --questions 48 --levels 1 2 4 8 16
+"""
+import argparse
+import asyncio
+import time
+
+QUESTIONS = [
+    "What's the weather in Paris today?",
+    "Which courses are available on the platform?",
+    "Is it raining in London?",
+    "Who teaches the deep learning course?",
+]
+
+
+def main(args) -> None:
+    from benchmarks.standins import create_mongomock_client, install_standins, make_standin_responder, start_weather_stub
+
+    server, weather_url = start_weather_stub(latency=args.weather_latency)
+    install_standins(weather_url=weather_url, mongo_client=create_mongomock_client())
+
+    import config
+    import main_langgraph
+    from benchmarks.common import ScriptedChatModel
+
+    config.ROUTING_LOG_PATH = None
+    config.TRACE_PATH = None
+    llm = ScriptedChatModel(responder=make_standin_responder(), latency=args.llm_latency)
+    main_langgraph.set_llm(llm)
+    main_langgraph.set_answer_cache(None)  # measure the agents, not the answer cache
+
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.questions)]
+    asyncio.run(main_langgraph.aanswer_questions(questions[:2], concurrency=2))  # build agents outside the timing
+
+    results = []
+    for level in args.levels:
+        llm.reset_calls()
+        start = time.perf_counter()
+        answers = asyncio.run(main_langgraph.aanswer_questions(questions, concurrency=level))
+        elapsed = time.perf_counter() - start
+        errors = sum(answer.startswith("An error occurred") for answer in answers)
+        results.append((level, elapsed, len(questions) / elapsed, llm.calls, errors))
+
+    print(f"\nquestions={len(questions)} llm_latency={args.llm_latency * 1000:.0f}ms "
+          f"weather_latency={args.weather_latency * 1000:.0f}ms")
+    base = results[0][2]
+    for level, elapsed, throughput, calls, errors in results:
+        print(f"concurrency={level:<4} wall={elapsed:7.2f}s  throughput={throughput:7.2f} q/s  "
+              f"speedup={throughput / base:5.2f}x  llm_calls={calls}  errors={errors}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=32)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Simulated LLM latency in seconds.")
+    parser.add_argument("--weather-latency", type=float, default=0.05, help="Fake weather API latency in seconds.")
+    main(parser.parse_args())
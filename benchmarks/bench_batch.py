@@ -0,0 +1,80 @@
+"""Batch mode benchmark: questions per second of `batch.run_batch` at increasing worker counts, with thread and
+async workers, and with the global LLM rate limit.
+
+The questions are the harness corpus (`benchmarks/fixtures/corpus.json`) repeated `--copies` times, answered by
+the scripted chat model (`--llm-latency` per call) against the backend stand-ins, with the answer cache and the
+fast router disabled so that every question runs the whole graph. The last rows rerun the largest pool with
+`--qps` LLM calls per second allowed across all workers, which caps the throughput whatever the pool size.
+
+    python -m benchmarks.bench_batch --llm-latency 0.1 --copies 10 --workers 1 2 4 8 16 --qps 20
+"""
+import argparse
+import json
+import os
+import tempfile
+
+
+def main(args) -> None:
+    from benchmarks.standins import (create_game_store_sqlite, create_mongomock_client, install_standins,
+                                     make_standin_responder, start_weather_stub)
+
+    workdir = tempfile.mkdtemp(prefix="bench_batch_")
+    _, weather_url = start_weather_stub(latency=args.weather_latency)
+    install_standins(weather_url=weather_url, mongo_client=create_mongomock_client(),
+                     sqlite_uri=create_game_store_sqlite(os.path.join(workdir, "game_store.sqlite3")))
+
+    import batch
+    import config
+    import main_langgraph
+    from benchmarks.common import ScriptedChatModel
+    from benchmarks.harness import load_corpus
+    from utils.rate_limit import create_rate_limiter
+
+    config.ROUTING_LOG_PATH = None
+    config.TRACE_PATH = None
+    config.FAST_ROUTER_ENABLED = False
+    config.AGENT_VERBOSE = False
+    config.WEATHER_CACHE_TTL = 0
+    config.SQL_CATALOG_PATH = os.path.join(workdir, "sql_catalog.json")
+    main_langgraph.set_answer_cache(None)
+
+    corpus = load_corpus()
+    routes = {item["question"]: item["route"] for item in corpus}
+    plans = {item["question"]: [tuple(step) for step in item["plan"]] for item in corpus if item.get("plan")}
+    input_path = os.path.join(workdir, "questions.jsonl")
+    with open(input_path, "w", encoding="utf-8") as f:
+        for copy in range(args.copies):
+            for i, item in enumerate(corpus):
+                f.write(json.dumps({"id": f"{copy}-{i}", "question": item["question"]}) + "\n")
+    n = args.copies * len(corpus)
+    print(f"questions={n} llm_latency={args.llm_latency * 1000:.0f}ms "
+          f"weather_latency={args.weather_latency * 1000:.0f}ms")
+
+    runs = [(mode, workers, None) for mode in ("thread", "async") for workers in args.workers]
+    if args.qps:
+        runs += [(mode, max(args.workers), args.qps) for mode in ("thread", "async")]
+    warmed_up = False
+    for mode, workers, qps in runs:
+        llm = ScriptedChatModel(responder=make_standin_responder(routes, plans), latency=args.llm_latency,
+                                rate_limiter=create_rate_limiter(qps))
+        main_langgraph.set_llm(llm)
+        if not warmed_up:  # build the specialists outside the measurement
+            batch.run_batch(input_path, os.path.join(workdir, "warmup.jsonl"), workers=1)
+            warmed_up = True
+        output_path = os.path.join(workdir, f"answers-{mode}-{workers}-{qps}.jsonl")
+        llm.reset_calls()
+        summary = batch.run_batch(input_path, output_path, workers=workers, mode=mode)
+        label = f"{mode} x{workers}" + (f" qps<={qps:g}" if qps else "")
+        print(f"{label:<24} questions/s={summary['questions_per_s']:7.2f}  "
+              f"llm_calls/s={llm.calls / summary['elapsed_s']:7.2f}  p50={summary['p50_ms']:8.1f}ms  "
+              f"p95={summary['p95_ms']:8.1f}ms  errors={summary['errors']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Simulated LLM latency in seconds.")
+    parser.add_argument("--weather-latency", type=float, default=0.02, help="Fake weather API latency in seconds.")
+    parser.add_argument("--copies", type=int, default=10, help="How many times the corpus is repeated.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--qps", type=float, default=20, help="LLM calls per second for the rate-limited rows.")
+    main(parser.parse_args())
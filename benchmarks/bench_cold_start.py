@@ -0,0 +1,88 @@
+"""Cold-start benchmark: import time and time-to-first-answer of `main_langgraph` for each route.
+
+Each route is measured in a fresh Python process, with the stand-in services from `benchmarks.standins` and a
+scripted chat model. The report also lists which specialists each process ended up building and whether the
+SQL toolkit / MongoDB driver modules were imported at all. `--eager` builds every specialist before the first
+question, which is what the module used to do at import time.
+
+    python -m benchmarks.bench_cold_start
+    python -m benchmarks.bench_cold_start --eager
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+QUESTIONS = {
+    "WeatherAPI": "What's the weather in Paris today?",
+    "AILearningPlatformDB": "Which courses are available on the platform?",
+    "GamingStoreDB": "What are the top 3 most expensive products in the store?",
+}
+
+
+def run_child(route: str, eager: bool) -> None:
+    from benchmarks.standins import (create_game_store_sqlite, create_mongomock_client, install_standins,
+                                     make_standin_responder, start_weather_stub)
+
+    _, weather_url = start_weather_stub()
+    sqlite_uri = create_game_store_sqlite(os.path.join(tempfile.mkdtemp(), "game_store.db"))
+    install_standins(weather_url=weather_url, sqlite_uri=sqlite_uri, mongo_client=create_mongomock_client())
+
+    start = time.perf_counter()
+    import main_langgraph
+    import_seconds = time.perf_counter() - start
+
+    import config
+    from benchmarks.common import ScriptedChatModel
+    config.ROUTING_LOG_PATH = None
+    config.TRACE_PATH = None
+    main_langgraph.set_llm(ScriptedChatModel(responder=make_standin_responder({QUESTIONS[route]: route})))
+
+    question = QUESTIONS[route]
+    start = time.perf_counter()
+    if eager:
+        for name in main_langgraph.registry.names:
+            main_langgraph.registry.get(name)
+    main_langgraph.get_app().invoke({"input": question})
+    first_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    main_langgraph.get_app().invoke({"input": question})
+    warm_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        "route": route,
+        "import_ms": import_seconds * 1000,
+        "first_answer_ms": first_seconds * 1000,
+        "warm_answer_ms": warm_seconds * 1000,
+        "built": main_langgraph.registry.built(),
+        "sql_toolkit_imported": "langchain_community.agent_toolkits.sql.base" in sys.modules,
+        "mongo_agent_imported": "agents.mongo_agent" in sys.modules,
+    }))
+
+
+def main(args) -> None:
+    print(f"{'route':<22}{'import':>10}{'1st answer':>12}{'warm':>10}  built / imported")
+    for route in QUESTIONS:
+        command = [sys.executable, "-m", "benchmarks.bench_cold_start", "--child", route]
+        if args.eager:
+            command.append("--eager")
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{route:<22}{result['import_ms']:>8.0f}ms{result['first_answer_ms']:>10.0f}ms"
+              f"{result['warm_answer_ms']:>8.0f}ms  built={result['built']} "
+              f"sql_toolkit={result['sql_toolkit_imported']} mongo={result['mongo_agent_imported']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eager", action="store_true", help="Build every specialist before the first answer.")
+    parser.add_argument("--child", choices=sorted(QUESTIONS), help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+    if arguments.child:
+        run_child(arguments.child, arguments.eager)
+    else:
+        main(arguments)
@@ -0,0 +1,68 @@
+"""Router mode benchmark: LLM calls and latency per question for `main.py`'s nested router agent versus the
+single-hop dispatcher.
+
+* agent:    the tools-calling router agent; the specialist runs as one of its tools, then the router makes one
+            more LLM call to restate the specialist's answer,
+* dispatch: one structured-output call picks the specialist, whose answer is returned as it is.
+
+The questions are the single-route and off-topic questions of the harness corpus (`benchmarks/fixtures/corpus.json`),
+answered by the scripted chat model (`--llm-latency` per call) against the backend stand-ins. The fast router and
+the answer cache are disabled, so every question goes through the LLM router.
+
+    python -m benchmarks.bench_dispatch --llm-latency 0.3 --repeats 3
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def main(args) -> None:
+    from benchmarks.standins import (create_game_store_sqlite, create_mongomock_client, install_standins,
+                                     make_standin_responder, start_weather_stub)
+
+    workdir = tempfile.mkdtemp(prefix="bench_dispatch_")
+    _, weather_url = start_weather_stub(latency=args.weather_latency)
+    install_standins(weather_url=weather_url, mongo_client=create_mongomock_client(),
+                     sqlite_uri=create_game_store_sqlite(os.path.join(workdir, "game_store.sqlite3")))
+
+    import config
+    import main as router_main
+    from benchmarks.common import ScriptedChatModel, format_summary, summarize
+    from benchmarks.harness import load_corpus
+
+    config.ROUTING_LOG_PATH = None
+    config.TRACE_PATH = None
+    config.FAST_ROUTER_ENABLED = False
+    config.ANSWER_CACHE_ENABLED = False
+    config.MEMORY_ENABLED = False  # every question is answered on its own
+    config.AGENT_VERBOSE = False
+    config.SQL_CATALOG_PATH = os.path.join(workdir, "sql_catalog.json")
+
+    corpus = [item for item in load_corpus() if not item.get("plan")]
+    llm = ScriptedChatModel(responder=make_standin_responder({item["question"]: item["route"] for item in corpus}),
+                            latency=args.llm_latency)
+    print(f"questions={len(corpus)} repeats={args.repeats} llm_latency={args.llm_latency * 1000:.0f}ms "
+          f"weather_latency={args.weather_latency * 1000:.0f}ms")
+
+    for mode in ("agent", "dispatch"):
+        session = router_main.create_session(llm, mode=mode)
+        for item in corpus:  # build the specialists outside the measurement
+            session.answer(item["question"])
+
+        latencies = []
+        llm.reset_calls()
+        for _ in range(args.repeats):
+            for item in corpus:
+                start = time.perf_counter()
+                session.answer(item["question"])
+                latencies.append(time.perf_counter() - start)
+        print(format_summary(mode, summarize(latencies)) + f"  llm_calls/q={llm.calls / len(latencies):5.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Simulated LLM latency in seconds.")
+    parser.add_argument("--weather-latency", type=float, default=0.05, help="Fake weather API latency in seconds.")
+    parser.add_argument("--repeats", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,117 @@
+"""Enrollment view benchmark: the Mongo agent's enrollment questions answered by the `$unwind` + `$lookup` aggregate
+(through `MongoQueryExecutor`, with the advised indexes) and by `EnrollmentView`, on a large seeded dataset.
+
+A MongoDB (`--uri`) gets a `--db` database seeded with `--users` users and `--courses` courses, dropped at the end
+unless `--keep` is given; `--mongomock` uses an in-process mongomock database instead (its aggregates copy the
+whole collection, so keep `--users` small there). The view is built once (time and memory are reported), then
+`--samples` random users' enrollments ("What courses is X enrolled in and what is their progress?") and the
+students of one course are looked up both ways. On a replica set the view follows the change streams, and the
+last row is the delay until a progress update shows in the view.
+
+    python -m benchmarks.bench_enrollment_view --uri mongodb://localhost:27017 --users 100000 --courses 2000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from agents.enrollment_view import EnrollmentView
+from agents.mongo_client import client_options
+from agents.mongo_indexes import advise_indexes
+from agents.mongo_query import MongoQueryExecutor, MongoQuerySpec
+from benchmarks.common import format_summary, summarize
+from benchmarks.standins import seed_learning_platform
+
+
+def enrollments_pipeline(match: dict) -> list:
+    """The prompt's enrollment example, for any `$match`."""
+    return [{"$match": match}, {"$unwind": "$enrollments"},
+            {"$lookup": {"from": "courses", "localField": "enrollments.course_id", "foreignField": "_id",
+                         "as": "course_details"}},
+            {"$unwind": "$course_details"},
+            {"$project": {"_id": 0, "full_name": 1, "course_title": "$course_details.title",
+                          "progress": "$enrollments.progress"}}]
+
+
+def timed(fn, repeats: int = 1) -> list:
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main(args) -> None:
+    if args.mongomock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        client = MongoClient(args.uri, **client_options())
+    db = client[args.db]
+    start = time.perf_counter()
+    seed_learning_platform(db, n_users=args.users, lessons_per_course=args.lessons, extra_courses=args.courses)
+    advise_indexes(db, "create")
+    print(f"users={args.users} courses={args.courses + 6} seeded in {time.perf_counter() - start:.1f}s "
+          f"({'mongomock' if args.mongomock else args.uri})")
+
+    view = EnrollmentView(db, max_rows=10 ** 6)
+    tracemalloc.start()
+    start = time.perf_counter()
+    view.refresh()
+    build_s = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"view built in {build_s:.2f}s, {len(view)} users, ~{size / 1024 / 1024:.1f}MB")
+
+    executor = MongoQueryExecutor(db, ["courses", "users"], max_limit=10 ** 6)
+    rng = random.Random(11)
+    names = ["Alice Johnson"] + [f"User {rng.randrange(args.users - 2)}" for _ in range(args.samples - 1)]
+    aggregate, direct = [], []
+    for name in names:
+        spec = MongoQuerySpec(collection="users", pipeline=enrollments_pipeline({"full_name": name}), limit=100)
+        aggregate += timed(lambda: executor.run(spec))
+        direct += timed(lambda: view.render(user=name))
+    print(format_summary("user: $lookup aggregate", summarize(aggregate)))
+    print(format_summary("user: enrollment view", summarize(direct)))
+
+    course_id = {"$oid": str(db.courses.find_one({"title": "Deep Learning with Python"})["_id"])}
+    pipeline = enrollments_pipeline({"enrollments.course_id": course_id})
+    pipeline.insert(2, {"$match": {"enrollments.course_id": course_id}})  # only that course's enrollments
+    spec = MongoQuerySpec(collection="users", pipeline=pipeline, limit=10 ** 6)
+    print(format_summary("course: $lookup aggregate", summarize(timed(lambda: executor.run(spec), args.repeats))))
+    print(format_summary("course: enrollment view",
+                         summarize(timed(lambda: view.render(course="Deep Learning with Python"), args.repeats))))
+
+    if not args.mongomock:
+        view.start(refresh_s=3600)
+        deadline = time.time() + 10
+        while not view.following and time.time() < deadline:
+            time.sleep(0.05)
+        if view.following:
+            start = time.perf_counter()
+            db.users.update_one({"full_name": "Alice Johnson"}, {"$set": {"enrollments.0.progress": 101}})
+            while not any(row["progress"] == 101 for row in view.lookup(user="Alice Johnson")):
+                time.sleep(0.001)
+            print(f"change stream: update visible in the view after {(time.perf_counter() - start) * 1000:.1f}ms")
+        else:
+            print("change stream: not available (standalone server); the view refreshes periodically")
+        view.stop()
+        if not args.keep:
+            client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="MongoDB to seed and query.")
+    parser.add_argument("--db", default="learning_platform_bench", help="Database to create (and drop).")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--courses", type=int, default=2000, help="Courses besides the six named ones.")
+    parser.add_argument("--lessons", type=int, default=8)
+    parser.add_argument("--samples", type=int, default=20, help="Users whose enrollments are looked up.")
+    parser.add_argument("--repeats", type=int, default=5, help="Repeats of the course lookup.")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded database.")
+    parser.add_argument("--mongomock", action="store_true", help="Use an in-process mongomock database.")
+    main(parser.parse_args())
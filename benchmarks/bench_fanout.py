@@ -0,0 +1,100 @@
+"""Fan-out benchmark: wall-clock time of multi-source questions with parallel branches versus one after another.
+
+Each question needs two or three specialists (weather stand-in, SQLite game store, mongomock learning platform)
+and the scripted chat model waits `--llm-latency` per call. Three ways of answering are timed:
+
+* graph (threads):  `get_app().invoke`, whose `Send` branches run concurrently in LangGraph's thread pool,
+* graph (asyncio):  `get_app().ainvoke`, with the branches as concurrent coroutines,
+* sequential:       the same router call, then each branch with `run_branch` one after another, then
+                    `synthesize` - what the graph did before it could fan out.
+
+The fast router is disabled so that every question is planned by the (scripted) LLM router.
+
+    python -m benchmarks.bench_fanout --llm-latency 0.3 --repeats 3
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+PLANS = {
+    "What's the weather in Tehran and which courses are available on the platform?": [
+        ("WeatherAPI", "What's the weather in Tehran?"),
+        ("AILearningPlatformDB", "Which courses are available on the platform?"),
+    ],
+    "Is it raining in London, and what are the three most expensive products in the store?": [
+        ("WeatherAPI", "Is it raining in London?"),
+        ("GamingStoreDB", "What are the three most expensive products in the store?"),
+    ],
+    "What's the weather in Paris, which courses does the platform offer and which products cost the most?": [
+        ("WeatherAPI", "What's the weather in Paris?"),
+        ("AILearningPlatformDB", "Which courses does the platform offer?"),
+        ("GamingStoreDB", "Which products cost the most?"),
+    ],
+}
+
+
+def main(args) -> None:
+    from benchmarks.standins import (create_game_store_sqlite, create_mongomock_client, install_standins,
+                                     make_standin_responder, start_weather_stub)
+
+    workdir = tempfile.mkdtemp(prefix="bench_fanout_")
+    _, weather_url = start_weather_stub(latency=args.weather_latency)
+    install_standins(weather_url=weather_url, mongo_client=create_mongomock_client(),
+                     sqlite_uri=create_game_store_sqlite(os.path.join(workdir, "game_store.sqlite3")))
+
+    import config
+    import main_langgraph
+    from agents.routing import parse_route_plan
+    from benchmarks.common import ScriptedChatModel
+    from utils.budget import RequestBudget
+
+    config.ROUTING_LOG_PATH = None
+    config.TRACE_PATH = None
+    config.FAST_ROUTER_ENABLED = False
+    config.SQL_CATALOG_PATH = os.path.join(workdir, "sql_catalog.json")
+    main_langgraph.set_llm(ScriptedChatModel(responder=make_standin_responder(plans=PLANS),
+                                             latency=args.llm_latency))
+    main_langgraph.set_answer_cache(None)
+    app = main_langgraph.get_app()
+
+    def sequential(question: str) -> str:
+        output = main_langgraph.get_router_chain().invoke({"input": question})
+        plan = parse_route_plan(output, question, main_langgraph.registry.names)
+        budget = RequestBudget()  # no limits: this mode times the calls themselves
+        outcomes = [main_langgraph.run_branch(step["route"], step["question"], budget) for step in plan]
+        return main_langgraph.synthesize(question, outcomes)
+
+    modes = {
+        "graph (threads)": lambda q: app.invoke({"input": q})["agent_outcome"],
+        "graph (asyncio)": lambda q: asyncio.run(app.ainvoke({"input": q}))["agent_outcome"],
+        "sequential": sequential,
+    }
+    for question in PLANS:  # build every specialist outside the timing
+        sequential(question)
+
+    totals = {name: 0.0 for name in modes}
+    print(f"llm_latency={args.llm_latency * 1000:.0f}ms weather_latency={args.weather_latency * 1000:.0f}ms "
+          f"repeats={args.repeats}")
+    for question, plan in PLANS.items():
+        row = []
+        for name, answer in modes.items():
+            start = time.perf_counter()
+            for _ in range(args.repeats):
+                answer(question)
+            elapsed = (time.perf_counter() - start) / args.repeats
+            totals[name] += elapsed
+            row.append(f"{name}={elapsed * 1000:7.1f}ms")
+        print(f"{len(plan)} branches  " + "  ".join(row))
+    base = totals["sequential"]
+    for name, total in totals.items():
+        print(f"{name:<16} total={total * 1000:8.1f}ms  saving vs sequential={(1 - total / base) * 100:5.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Simulated LLM latency in seconds.")
+    parser.add_argument("--weather-latency", type=float, default=0.05, help="Fake weather API latency in seconds.")
+    parser.add_argument("--repeats", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,109 @@
+"""Logging microbenchmark: time a request thread spends logging, with the synchronous handlers and verbose agent
+printing versus the background JSON writer.
+
+Every simulated request emits what one graph run produces: `--records` INFO lines from the router and agents
+and, in the "before" setup, the executors' verbose chain output (`--verbose-bytes` printed to stdout), or in the
+"after" setup, three DEBUG agent-trace records that the sampler keeps for LOG_DEBUG_SAMPLE_RATE of the requests.
+`--threads` request threads log concurrently. The console is a line-buffered temporary file; `--console-latency`
+adds a delay to every console write to mimic a slow terminal or a container log driver pushing back.
+
+    python -m benchmarks.bench_logging --requests 2000 --threads 8 --console-latency 0.0002
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import config
+from benchmarks.common import format_summary, summarize
+from utils import logging_config
+
+
+class SlowStream:
+    """A text stream that waits `latency` seconds on every write before passing it on."""
+
+    def __init__(self, stream, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text: str) -> int:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+def simulate_request(logger: logging.Logger, trace_logger: logging.Logger, args, verbose: bool) -> float:
+    request_id = uuid.uuid4().hex
+    token = logging_config.bind_request_id(request_id)
+    start = time.perf_counter()
+    for i in range(args.records):
+        logger.info(f"[{request_id}] ---CALLING AGENT: GamingStoreDB--- step {i}: routing decision recorded.")
+    if verbose:
+        print("\n> Entering new AgentExecutor chain...\n" + "x" * args.verbose_bytes + "\n> Finished chain.")
+    else:
+        for _ in range(3):
+            trace_logger.debug("Agent action: sql_db_query", extra={"tool": "sql_db_query",
+                                                                    "tool_input": "SELECT name FROM products"})
+    elapsed = time.perf_counter() - start
+    logging_config.request_id_var.reset(token)
+    return elapsed
+
+
+def run(mode: str, verbose: bool, args, workdir: str) -> None:
+    config.LOG_PATH = os.path.join(workdir, f"{mode}.log")
+    console = open(os.path.join(workdir, f"{mode}.console"), "w", buffering=1, encoding="utf-8")
+    real_stdout, sys.stdout = sys.stdout, SlowStream(console, args.console_latency)
+    try:
+        logging_config.setup_logging(mode)
+        logger = logging.getLogger("main_langgraph")
+        trace_logger = logging.getLogger("agents.trace")
+        durations, lock = [], threading.Lock()
+
+        def worker(n: int) -> None:
+            local = [simulate_request(logger, trace_logger, args, verbose) for _ in range(n)]
+            with lock:
+                durations.extend(local)
+
+        per_thread = args.requests // args.threads
+        threads = [threading.Thread(target=worker, args=(per_thread,)) for _ in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        drain_start = time.perf_counter()
+        logging_config.setup_logging("plain")  # stops (and drains) the background writer, if any
+        drain = time.perf_counter() - drain_start
+    finally:
+        sys.stdout = real_stdout
+        console.close()
+        logging.getLogger().handlers = []
+    label = f"{mode}{' + verbose' if verbose else ''}"
+    print(format_summary(label, summarize(durations)) + f"  wall={wall:6.2f}s  drain={drain * 1000:7.1f}ms  "
+          f"log={os.path.getsize(config.LOG_PATH) / 1024:7.1f}KB")
+
+
+def main(args) -> None:
+    workdir = tempfile.mkdtemp(prefix="bench_logging_")
+    print(f"requests={args.requests} threads={args.threads} records/request={args.records} "
+          f"console_latency={args.console_latency * 1e6:.0f}us debug_sample_rate={config.LOG_DEBUG_SAMPLE_RATE}")
+    run("plain", True, args, workdir)
+    run("async_json", False, args, workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--records", type=int, default=12, help="INFO records per request.")
+    parser.add_argument("--verbose-bytes", type=int, default=1500, help="Verbose chain output per request.")
+    parser.add_argument("--console-latency", type=float, default=0.0002, help="Delay per console write (s).")
+    main(parser.parse_args())
@@ -0,0 +1,115 @@
+"""Conversation memory benchmark: prompt tokens, LLM calls and latency per turn over one long session of the
+LangGraph app, with bounded memory and with memory that only grows.
+
+* bounded:   the configured memory: old turns are merged into a summary of at most MEMORY_SUMMARY_TOKENS once the
+             recent ones exceed MEMORY_RECENT_TOKENS, and at most MEMORY_CONTEXT_TURNS turns go with a question,
+* unbounded: every turn is kept and forwarded (to the specialists, those of the same route), never summarized.
+
+Each turn is a question from a fixed cycle of questions and follow-ups ("And in Paris?"), asked in one session
+(`answer_question(..., session_id=...)`, SQLite checkpointer in a temporary directory). The chat model is the
+scripted stand-in, which takes `--llm-latency` per call plus `--prefill-latency` per 1K prompt tokens, so that
+longer prompts are slower as they are with a real model. Prompt tokens are estimated from the prompt text
+(characters / 4), like the tracer does. The fast router and the answer cache are disabled, so every question
+goes through the LLM router.
+
+    python -m benchmarks.bench_memory --turns 50 --llm-latency 0.05 --prefill-latency 0.05
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+QUESTIONS = [
+    "What's the weather in Tehran?",
+    "And in Paris?",
+    "Which course has the most lessons?",
+    "Who teaches it?",
+    "What are the three most expensive products in the store?",
+    "Which of them is a headset?",
+    "Is it windy in Tehran?",
+    "How many students are enrolled in the AI courses?",
+    "What is her progress in the second course?",
+    "Should I take an umbrella in London?",
+]
+
+
+class PromptCounter(BaseCallbackHandler):
+    """Counts the LLM calls below a run and the characters of their prompts."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chars = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.calls += 1
+        self.chars += sum(len(str(m.content)) for batch in messages for m in batch)
+
+
+def main(args) -> None:
+    from benchmarks.standins import (create_game_store_sqlite, create_mongomock_client, install_standins,
+                                     make_standin_responder, start_weather_stub)
+
+    workdir = tempfile.mkdtemp(prefix="bench_memory_")
+    _, weather_url = start_weather_stub(latency=args.weather_latency)
+    install_standins(weather_url=weather_url, mongo_client=create_mongomock_client(),
+                     sqlite_uri=create_game_store_sqlite(os.path.join(workdir, "game_store.sqlite3")))
+
+    import config
+    import main_langgraph
+    from benchmarks.common import ScriptedChatModel, format_summary, summarize
+    from utils.budget import RequestBudget
+    from utils.tracing import estimate_tokens
+
+    config.ROUTING_LOG_PATH = None
+    config.TRACE_PATH = None
+    config.FAST_ROUTER_ENABLED = False
+    config.AGENT_VERBOSE = False
+    config.MEMORY_ENABLED = True
+    config.MEMORY_SQLITE_PATH = os.path.join(workdir, "memory.sqlite3")
+    config.SQL_CATALOG_PATH = os.path.join(workdir, "sql_catalog.json")
+    bounded = (config.MEMORY_RECENT_TOKENS, config.MEMORY_CONTEXT_TURNS)
+
+    responder = make_standin_responder()
+
+    def respond(messages, kwargs):
+        # Simulated prefill: the model reads the whole prompt before answering.
+        time.sleep(estimate_tokens(sum(len(str(m.content)) for m in messages)) / 1000 * args.prefill_latency)
+        return responder(messages, kwargs)
+
+    llm = ScriptedChatModel(responder=respond, latency=args.llm_latency)
+    main_langgraph.set_llm(llm)
+    main_langgraph.set_answer_cache(None)
+    main_langgraph.answer_question(QUESTIONS[0])  # build the specialists outside the measurement
+
+    checkpoints = sorted({1, *range(10, args.turns + 1, 10), args.turns})
+    print(f"turns={args.turns} llm_latency={args.llm_latency * 1000:.0f}ms "
+          f"prefill_latency={args.prefill_latency * 1000:.0f}ms/1K tokens recent_tokens={bounded[0]} "
+          f"summary_tokens={config.MEMORY_SUMMARY_TOKENS} context_turns={bounded[1]}")
+    print(f"{'prompt tokens at turn':<28} " + " ".join(f"{turn:>7}" for turn in checkpoints))
+    for mode in ("bounded", "unbounded"):
+        config.MEMORY_RECENT_TOKENS, config.MEMORY_CONTEXT_TURNS = bounded if mode == "bounded" else (10 ** 9, 10 ** 9)
+        tokens, calls, latencies = [], [], []
+        for turn in range(args.turns):
+            counter = PromptCounter()
+            start = time.perf_counter()
+            main_langgraph.answer_question(QUESTIONS[turn % len(QUESTIONS)], {"callbacks": [counter]},
+                                           budget=RequestBudget(), session_id=f"bench-{mode}")
+            latencies.append(time.perf_counter() - start)
+            tokens.append(estimate_tokens(counter.chars))
+            calls.append(counter.calls)
+        last = tokens[-10:]
+        print(f"{mode:<28} " + " ".join(f"{tokens[turn - 1]:>7}" for turn in checkpoints))
+        print(format_summary(mode, summarize(latencies)) + f"  llm_calls/turn={sum(calls) / len(calls):5.2f}  "
+              f"prompt_tokens/turn (last 10)={sum(last) / len(last):7.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated LLM latency in seconds.")
+    parser.add_argument("--prefill-latency", type=float, default=0.05,
+                        help="Simulated extra LLM latency in seconds per 1K prompt tokens.")
+    parser.add_argument("--weather-latency", type=float, default=0.02, help="Fake weather API latency in seconds.")
+    main(parser.parse_args())
@@ -0,0 +1,129 @@
+"""Mongo index and client benchmark: latency and query plans of the learning-platform agent's queries on a large
+seeded dataset, without and with the indexes of `agents/mongo_indexes.py`, and the cost of a new client per query
+compared with the shared pooled client.
+
+A local MongoDB (`--uri`) gets a `--db` database seeded with `--users` users and `--courses` courses; it is
+dropped at the end unless `--keep` is given. Each query is one of the agent's prompt examples (or the reverse side
+of its enrollment `$lookup`), run through `MongoQueryExecutor` `--repeats` times; the plan columns come from
+`explain` in executionStats verbosity. `--mongomock` runs the same steps in process (no server, no plans, no
+real index use), as a dry run of the script.
+
+    python -m benchmarks.bench_mongo_indexes --uri mongodb://localhost:27017 --users 100000 --courses 2000
+"""
+import argparse
+import time
+
+from agents.mongo_client import client_options
+from agents.mongo_indexes import RECOMMENDED_INDEXES, advise_indexes
+from agents.mongo_query import MongoQueryExecutor, MongoQuerySpec, summarize_plan
+from benchmarks.common import summarize
+from benchmarks.standins import seed_learning_platform
+
+
+def queries(course_id) -> list:
+    return [
+        ("instructor by title", MongoQuerySpec(
+            collection="courses", filter={"title": "Machine Learning Fundamentals"},
+            projection={"_id": 0, "instructor_name": 1})),
+        ("title regex (case-insens.)", MongoQuerySpec(
+            collection="courses", filter={"title": {"$regex": "python", "$options": "i"}},
+            projection={"_id": 0, "title": 1}, limit=5)),
+        ("user by name", MongoQuerySpec(collection="users", filter={"full_name": "Alice Johnson"},
+                                        projection={"_id": 0, "email": 1})),
+        ("enrollments of a user", MongoQuerySpec(collection="users", pipeline=[
+            {"$match": {"full_name": "Alice Johnson"}}, {"$unwind": "$enrollments"},
+            {"$lookup": {"from": "courses", "localField": "enrollments.course_id", "foreignField": "_id",
+                         "as": "course_details"}},
+            {"$unwind": "$course_details"},
+            {"$project": {"_id": 0, "course_title": "$course_details.title",
+                          "progress": "$enrollments.progress"}}])),
+        ("students of a course", MongoQuerySpec(
+            collection="users", filter={"enrollments.course_id": {"$oid": str(course_id)}}, count_only=True)),
+    ]
+
+
+def plan_of(executor: MongoQueryExecutor, spec: MongoQuerySpec) -> str:
+    try:
+        explain = executor.db.command("explain", executor._explain_command(executor.validate(spec)),
+                                      verbosity="executionStats")
+    except Exception:
+        return "no plan"
+    plan = summarize_plan(explain)
+    return f"{' > '.join(plan['stages'])}  keys={plan['keys_examined']} docs={plan['docs_examined']}"
+
+
+def time_queries(executor: MongoQueryExecutor, specs: list, repeats: int, label: str) -> None:
+    for name, spec in specs:
+        executor.run(spec)  # warm up the plan cache and the connection
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            executor.run(spec)
+            latencies.append(time.perf_counter() - start)
+        summary = summarize(latencies)
+        print(f"{label:<13} {name:<28} p50={summary['p50_ms']:8.2f}ms  p95={summary['p95_ms']:8.2f}ms  "
+              f"{plan_of(executor, spec)}")
+
+
+def with_new_client(client_factory, db_name: str, spec: MongoQuerySpec) -> str:
+    """What `create_mongo_agent` used to cost per agent: a new client, its connection handshake and its pool."""
+    client = client_factory()
+    try:
+        return MongoQueryExecutor(client[db_name], ["courses", "users"]).run(spec)
+    finally:
+        client.close()
+
+
+def main(args) -> None:
+    def client_factory():
+        if args.mongomock:
+            import mongomock
+            return mongomock.MongoClient()
+        from pymongo import MongoClient
+        return MongoClient(args.uri, **client_options())
+
+    client = client_factory()
+    db = client[args.db]
+    start = time.perf_counter()
+    for collection in RECOMMENDED_INDEXES:
+        db[collection].drop_indexes()
+    seed_learning_platform(db, n_users=args.users, lessons_per_course=args.lessons, extra_courses=args.courses)
+    print(f"users={args.users} courses={args.courses + 6} seeded in {time.perf_counter() - start:.1f}s "
+          f"({'mongomock' if args.mongomock else args.uri})")
+
+    executor = MongoQueryExecutor(db, ["courses", "users"])
+    specs = queries(db.courses.find_one({}, {"_id": 1})["_id"])
+    time_queries(executor, specs, args.repeats, "no indexes")
+    start = time.perf_counter()
+    report = advise_indexes(db, "create")
+    print(f"created {sum(entry['status'] == 'created' for entry in report)} indexes in "
+          f"{time.perf_counter() - start:.1f}s")
+    time_queries(executor, specs, args.repeats, "indexes")
+
+    name, spec = specs[0]
+    for label, run in (("shared client", lambda: executor.run(spec)),
+                       ("client/query", lambda: with_new_client(client_factory, args.db, spec))):
+        latencies = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            run()
+            latencies.append(time.perf_counter() - start)
+        summary = summarize(latencies)
+        print(f"{label:<13} {name:<28} p50={summary['p50_ms']:8.2f}ms  p95={summary['p95_ms']:8.2f}ms")
+
+    if not args.keep:
+        client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="MongoDB to seed and query.")
+    parser.add_argument("--db", default="learning_platform_bench", help="Database to create (and drop).")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--courses", type=int, default=2000, help="Courses besides the six named ones.")
+    parser.add_argument("--lessons", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded database.")
+    parser.add_argument("--mongomock", action="store_true", help="Dry run with an in-process mongomock database.")
+    main(parser.parse_args())
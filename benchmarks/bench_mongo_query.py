@@ -0,0 +1,87 @@
+"""Mongo tool benchmark: the old eval-based tools versus `MongoQueryExecutor` on a large synthetic collection.
+
+A mongomock learning_platform is seeded with `--users` users and courses with `--lessons` long lessons each.
+For every query the old path (`eval` of the query string, `list(cursor)`, `json.dumps(..., indent=2)`) and the
+executor (server-side limit and batch size, streamed rendering, token budget) are timed, and the peak traced
+memory and size of the tool output are reported.
+
+    python -m benchmarks.bench_mongo_query --users 20000 --lessons 40
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from bson import ObjectId, json_util
+
+import config
+from agents.mongo_query import MongoQueryExecutor, MongoQuerySpec, estimate_tokens
+from benchmarks.standins import seed_learning_platform
+
+QUERIES = [
+    ("all courses",
+     "courses_collection.find({})",
+     MongoQuerySpec(collection="courses")),
+    ("all user names",
+     "users_collection.find({}, {'_id': 0, 'full_name': 1})",
+     MongoQuerySpec(collection="users", projection={"_id": 0, "full_name": 1})),
+    ("all users",
+     "users_collection.find({})",
+     MongoQuerySpec(collection="users")),
+    ("enrollments of one user",
+     "users_collection.aggregate([{'$match': {'full_name': 'Alice Johnson'}}, {'$unwind': '$enrollments'}, "
+     "{'$lookup': {'from': 'courses', 'localField': 'enrollments.course_id', 'foreignField': '_id', "
+     "'as': 'course'}}, {'$unwind': '$course'}, "
+     "{'$project': {'_id': 0, 'title': '$course.title', 'progress': '$enrollments.progress'}}])",
+     MongoQuerySpec(collection="users", pipeline=[
+         {"$match": {"full_name": "Alice Johnson"}}, {"$unwind": "$enrollments"},
+         {"$lookup": {"from": "courses", "localField": "enrollments.course_id", "foreignField": "_id",
+                      "as": "course"}},
+         {"$unwind": "$course"},
+         {"$project": {"_id": 0, "title": "$course.title", "progress": "$enrollments.progress"}}])),
+]
+
+
+def legacy_tool(db, query: str) -> str:
+    """What `search_courses` / `search_users` used to do with the model's query string."""
+    local_vars = {"courses_collection": db["courses"], "users_collection": db["users"], "ObjectId": ObjectId}
+    result = eval(query, {"__builtins__": {}}, local_vars)
+    return json.dumps(list(result), default=json_util.default, ensure_ascii=False, indent=2)
+
+
+def measure(fn, repeats: int):
+    tracemalloc.start()
+    output = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats, peak, output
+
+
+def main(args) -> None:
+    import mongomock
+
+    db = mongomock.MongoClient()[config.MONGO_DB_NAME]
+    seed_learning_platform(db, n_users=args.users, lessons_per_course=args.lessons)
+    executor = MongoQueryExecutor(db, ["courses", "users"], default_limit=config.MONGO_DEFAULT_LIMIT,
+                                  max_limit=config.MONGO_MAX_LIMIT, batch_size=config.MONGO_BATCH_SIZE,
+                                  token_budget=config.MONGO_RESULT_TOKEN_BUDGET,
+                                  max_field_chars=config.MONGO_MAX_FIELD_CHARS)
+
+    print(f"users={args.users} lessons_per_course={args.lessons} token_budget={config.MONGO_RESULT_TOKEN_BUDGET}")
+    print(f"{'query':<25} {'tool':<9} {'latency':>10} {'peak memory':>12} {'output':>10} {'~tokens':>9}")
+    for name, legacy_query, spec in QUERIES:
+        for label, fn in (("eval", lambda: legacy_tool(db, legacy_query)), ("executor", lambda: executor.run(spec))):
+            latency, peak, output = measure(fn, args.repeats)
+            print(f"{name:<25} {label:<9} {latency * 1000:8.1f}ms {peak / 1024 / 1024:10.2f}MB "
+                  f"{len(output) / 1024:8.1f}KB {estimate_tokens(output):9d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--lessons", type=int, default=40)
+    parser.add_argument("--repeats", type=int, default=3)
+    main(parser.parse_args())
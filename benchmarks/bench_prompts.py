@@ -0,0 +1,134 @@
+"""Prompt assembly benchmark: prompt tokens and LLM latency per call of each agent over the harness corpus, with
+the whole Mongo schema and every example in every prompt (PROMPT_ASSEMBLY_ENABLED = False) and with the examples
+and schema fragments selected for each question (True).
+
+Prompt tokens are estimated from the prompt text and the tool definitions sent with it (characters / 4), like the
+tracer does. The chat model is the scripted stand-in, which takes `--llm-latency` per call plus
+`--prefill-latency` per 1K prompt tokens, so that shorter prompts answer sooner as they do with a real model. The
+"stable prefix" column is the mean number of tokens a call shares, from the start, with the previous call of the
+same agent: the part a provider's prompt cache can reuse. Calls are grouped by graph node and, for the
+specialists, by their first tool. The fast router and the answer cache are disabled.
+
+    python -m benchmarks.bench_prompts --rounds 3 --llm-latency 0.05 --prefill-latency 0.2
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class PromptRecorder(BaseCallbackHandler):
+    """Records, for every chat model call, the agent that made it, its prompt text and its duration."""
+
+    def __init__(self):
+        self.calls = []  # [agent, prompt text, duration in seconds]
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+
+        tools = (kwargs.get("invocation_params") or {}).get("tools") or []
+        tools = [tool if isinstance(tool, dict) else convert_to_openai_tool(tool) for tool in tools]
+        agent = (metadata or {}).get("langgraph_node") or "llm"
+        if tools:
+            agent += "/" + tools[0]["function"]["name"]
+        # Providers put the tool definitions in front of the messages.
+        text = json.dumps(tools, ensure_ascii=False) + "".join(str(m.content) for batch in messages for m in batch)
+        with self._lock:
+            self._started[run_id] = (agent, text, time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            agent, text, start = self._started.pop(run_id)
+            self.calls.append([agent, text, time.perf_counter() - start])
+
+
+def common_prefix(a: str, b: str) -> int:
+    return len(os.path.commonprefix([a, b]))
+
+
+def report(label: str, calls: list) -> dict:
+    from utils.tracing import estimate_tokens
+
+    by_agent, previous = {}, {}
+    for agent, text, duration in calls:
+        row = by_agent.setdefault(agent, {"calls": 0, "tokens": 0, "prefix": 0, "seconds": 0.0})
+        row["calls"] += 1
+        row["tokens"] += estimate_tokens(len(text))
+        row["prefix"] += estimate_tokens(common_prefix(previous.get(agent, ""), text))
+        row["seconds"] += duration
+        previous[agent] = text
+    for agent, row in sorted(by_agent.items()):
+        print(f"{label:<10} {agent:<34} {row['calls']:>6} {row['tokens'] / row['calls']:>14.0f} "
+              f"{row['prefix'] / row['calls']:>14.0f} {row['seconds'] / row['calls'] * 1000:>11.1f}ms")
+    return by_agent
+
+
+def main(args) -> None:
+    from benchmarks.standins import (create_game_store_sqlite, create_mongomock_client, install_standins,
+                                     make_standin_responder, start_weather_stub)
+
+    workdir = tempfile.mkdtemp(prefix="bench_prompts_")
+    _, weather_url = start_weather_stub(latency=args.weather_latency)
+    install_standins(weather_url=weather_url, mongo_client=create_mongomock_client(),
+                     sqlite_uri=create_game_store_sqlite(os.path.join(workdir, "game_store.sqlite3")))
+
+    import config
+    import main_langgraph
+    from benchmarks.common import ScriptedChatModel
+    from benchmarks.harness import load_corpus
+    from utils.tracing import chat_prompt_chars, estimate_tokens
+
+    config.ROUTING_LOG_PATH = None
+    config.TRACE_PATH = None
+    config.FAST_ROUTER_ENABLED = False
+    config.AGENT_VERBOSE = False
+    config.WEATHER_CACHE_TTL = 0
+    config.SQL_CATALOG_PATH = os.path.join(workdir, "sql_catalog.json")
+
+    corpus = load_corpus()
+    routes = {item["question"]: item["route"] for item in corpus}
+    plans = {item["question"]: [tuple(step) for step in item["plan"]] for item in corpus if item.get("plan")}
+    responder = make_standin_responder(routes, plans)
+
+    def respond(messages, kwargs):
+        # Simulated prefill: the model reads the whole prompt, tool definitions included, before answering.
+        tokens = estimate_tokens(chat_prompt_chars([messages], {"invocation_params": kwargs}))
+        time.sleep(tokens / 1000 * args.prefill_latency)
+        return responder(messages, kwargs)
+
+    print(f"questions={len(corpus)}x{args.rounds} llm_latency={args.llm_latency * 1000:.0f}ms "
+          f"prefill_latency={args.prefill_latency * 1000:.0f}ms/1K tokens examples={config.PROMPT_EXAMPLES}")
+    print(f"{'assembly':<10} {'agent':<34} {'calls':>6} {'prompt tokens':>14} {'stable prefix':>14} "
+          f"{'llm latency':>13}")
+    totals = {}
+    for enabled in (False, True):
+        config.PROMPT_ASSEMBLY_ENABLED = enabled
+        main_langgraph.set_llm(ScriptedChatModel(responder=respond, latency=args.llm_latency))  # rebuild the agents
+        main_langgraph.set_answer_cache(None)
+        recorder = PromptRecorder()
+        for _ in range(args.rounds):
+            for item in corpus:
+                main_langgraph.answer_question(item["question"], {"callbacks": [recorder]})
+        totals[enabled] = report("on" if enabled else "off", recorder.calls)
+    for agent in sorted(set(totals[False]) & set(totals[True])):
+        before, after = totals[False][agent], totals[True][agent]
+        saved = 1 - (after["tokens"] / after["calls"]) / (before["tokens"] / before["calls"])
+        print(f"{agent:<45} prompt tokens -{saved:6.1%}  llm latency "
+              f"{before['seconds'] / before['calls'] * 1000:7.1f}ms -> "
+              f"{after['seconds'] / after['calls'] * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=3, help="How many times the corpus is asked in each mode.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated LLM latency in seconds.")
+    parser.add_argument("--prefill-latency", type=float, default=0.2,
+                        help="Simulated extra LLM latency in seconds per 1K prompt tokens.")
+    parser.add_argument("--weather-latency", type=float, default=0.02, help="Fake weather API latency in seconds.")
+    main(parser.parse_args())
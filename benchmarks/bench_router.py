@@ -0,0 +1,109 @@
+"""Routing benchmark: fast-path router + LLM fallback versus the LLM-only router.
+
+The chat model is a stub that answers with the labelled route after `--llm-latency` seconds, so the LLM-only path
+is always correct and its latency is exactly the simulated round trip. What this measures is how many questions
+the fast path can take off the LLM, how accurate those confident decisions are, and the resulting latency.
+
+    python -m benchmarks.bench_router --llm-latency 0.4 --threshold 0.75
+"""
+import argparse
+import time
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from agents.routing import ROUTE_DESCRIPTIONS, ROUTE_SEED_EXAMPLES
+from benchmarks.common import ScriptedChatModel, format_summary, last_user_text, summarize
+from utils.fast_router import FastRouter
+
+CORPUS = [
+    ("What's the cheapest gaming mouse you sell?", "GamingStoreDB"),
+    ("Has order 1042 been shipped yet?", "GamingStoreDB"),
+    ("How many PlayStation consoles are left in stock?", "GamingStoreDB"),
+    ("Which customers bought a headset last month?", "GamingStoreDB"),
+    ("Show me all cancelled orders", "GamingStoreDB"),
+    ("What is the total payment amount for customer Sara?", "GamingStoreDB"),
+    ("Are there any promotions on mechanical keyboards?", "GamingStoreDB"),
+    ("کدام محصول بیشترین فروش را داشته است؟", "GamingStoreDB"),
+    ("سفارش های لغو شده را نشان بده", "GamingStoreDB"),
+    ("Who teaches Machine Learning Fundamentals?", "AILearningPlatformDB"),
+    ("How many lessons are in the Python course?", "AILearningPlatformDB"),
+    ("Which courses is Bob Smith enrolled in?", "AILearningPlatformDB"),
+    ("What is Alice's progress in deep learning?", "AILearningPlatformDB"),
+    ("Describe the content of the first lesson in NLP", "AILearningPlatformDB"),
+    ("List every instructor on the platform", "AILearningPlatformDB"),
+    ("Which students finished the computer vision course?", "AILearningPlatformDB"),
+    ("دوره های موجود در پلتفرم کدام ها هستند؟", "AILearningPlatformDB"),
+    ("مدرس دوره پایتون کیست؟", "AILearningPlatformDB"),
+    ("What's the weather in Madrid right now?", "WeatherAPI"),
+    ("Is it going to rain in Shiraz?", "WeatherAPI"),
+    ("How hot is it in Dubai?", "WeatherAPI"),
+    ("Do I need a coat in Moscow today?", "WeatherAPI"),
+    ("What's the humidity in Singapore?", "WeatherAPI"),
+    ("Is it windy in Amsterdam?", "WeatherAPI"),
+    ("Current temperature in New York please", "WeatherAPI"),
+    ("هوای تبریز امروز چطور است؟", "WeatherAPI"),
+    ("دمای مشهد چند درجه است؟", "WeatherAPI"),
+    ("Tell me a joke", "end"),
+    ("What is the capital of France?", "end"),
+    ("Write me a poem about the sea", "end"),
+]
+
+
+def build_llm_router(latency: float):
+    expected = dict(CORPUS)
+    llm = ScriptedChatModel(responder=lambda messages, kwargs: expected.get(
+        last_user_text(messages).removeprefix("Question: "), "end"), latency=latency)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "Route the question to GamingStoreDB, AILearningPlatformDB, WeatherAPI or 'end'."),
+        ("user", "Question: {input}"),
+    ])
+    return prompt | llm | StrOutputParser(), llm
+
+
+def run(args):
+    llm_router, llm = build_llm_router(args.llm_latency)
+    fast_router = FastRouter.from_descriptions(ROUTE_DESCRIPTIONS, ROUTE_SEED_EXAMPLES, log_path=args.routing_log,
+                                               threshold=args.threshold)
+
+    llm_only_latencies, llm_only_correct = [], 0
+    hybrid_latencies, hybrid_correct = [], 0
+    fast_hits, fast_correct = 0, 0
+
+    for _ in range(args.rounds):
+        for question, expected in CORPUS:
+            start = time.perf_counter()
+            route = llm_router.invoke({"input": question})
+            llm_only_latencies.append(time.perf_counter() - start)
+            llm_only_correct += route == expected
+
+            start = time.perf_counter()
+            route = fast_router.route(question)
+            if route is not None:
+                fast_hits += 1
+                fast_correct += route == expected
+            else:
+                route = llm_router.invoke({"input": question})
+            hybrid_latencies.append(time.perf_counter() - start)
+            hybrid_correct += route == expected
+
+    total = len(CORPUS) * args.rounds
+    print(f"questions={len(CORPUS)} rounds={args.rounds} threshold={args.threshold} "
+          f"simulated_llm_latency={args.llm_latency * 1000:.0f}ms")
+    print(format_summary("llm-only router", summarize(llm_only_latencies)))
+    print(format_summary("fast-path + llm fallback", summarize(hybrid_latencies)))
+    print(f"llm-only accuracy:          {llm_only_correct / total:.1%}")
+    print(f"hybrid accuracy:            {hybrid_correct / total:.1%}")
+    print(f"fast-path coverage:         {fast_hits / total:.1%} of questions skipped the LLM")
+    print(f"fast-path accuracy:         {(fast_correct / fast_hits if fast_hits else float('nan')):.1%} "
+          f"on the questions it answered")
+    print(f"LLM routing calls:          {llm.calls} total")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Simulated LLM round trip in seconds.")
+    parser.add_argument("--threshold", type=float, default=0.75, help="Fast router confidence threshold.")
+    parser.add_argument("--routing-log", default=None, help="Optional routing log (JSONL) to train on.")
+    parser.add_argument("--rounds", type=int, default=3, help="How many times to replay the corpus.")
+    run(parser.parse_args())
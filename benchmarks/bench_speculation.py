@@ -0,0 +1,108 @@
+"""Speculation benchmark: latency per question and the extra LLM work of `main_langgraph.py` without speculation,
+with prefetches, and with speculative specialist runs started next to the LLM router.
+
+* off:        the router decides, then the specialist runs,
+* prefetch:   the fast router's best guess is built and its caches warmed (the weather of the named city) while the
+              router decides,
+* specialist: the best guess runs in full while the router decides; its answer is used if the router agrees,
+              and the run is cancelled otherwise.
+
+The questions are the harness corpus (`benchmarks/fixtures/corpus.json`) answered `--repeats` times by the scripted
+chat model (`--llm-latency` per call) against the backend stand-ins, with the weather cache cleared before each
+question. The fast router never decides alone (its threshold is set above 1), so every question goes through the
+LLM router, and its best guess is what is speculated on. The answer cache is disabled. "extra llm calls/q" counts
+the speculative calls whose result was thrown away; "changed" the answers that differ from those without
+speculation.
+
+    python -m benchmarks.bench_speculation --llm-latency 0.3 --weather-latency 0.2 --repeats 3
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+
+def main(args) -> None:
+    from benchmarks.standins import (create_game_store_sqlite, create_mongomock_client, install_standins,
+                                     make_standin_responder, start_weather_stub)
+
+    workdir = tempfile.mkdtemp(prefix="bench_speculation_")
+    _, weather_url = start_weather_stub(latency=args.weather_latency)
+    install_standins(weather_url=weather_url, mongo_client=create_mongomock_client(),
+                     sqlite_uri=create_game_store_sqlite(os.path.join(workdir, "game_store.sqlite3")))
+
+    import config
+    import main_langgraph
+    from agents.weather_client import get_weather_client
+    from benchmarks.common import ScriptedChatModel, format_summary, summarize
+    from benchmarks.harness import load_corpus
+    from utils.speculation import Speculator
+
+    config.ROUTING_LOG_PATH = None
+    config.TRACE_PATH = None
+    config.AGENT_VERBOSE = False
+    config.FAST_ROUTER_ENABLED = True
+    config.FAST_ROUTER_THRESHOLD = 1.01
+    config.SQL_CATALOG_PATH = os.path.join(workdir, "sql_catalog.json")
+    main_langgraph.reset_fast_router()
+    main_langgraph.set_answer_cache(None)
+
+    corpus = load_corpus()
+    routes = {item["question"]: item["route"] for item in corpus}
+    plans = {item["question"]: [tuple(step) for step in item["plan"]] for item in corpus if item.get("plan")}
+    questions = [item["question"] for item in corpus] * args.repeats
+
+    def answer(question: str) -> str:
+        if args.use_async:
+            return asyncio.run(main_langgraph.aanswer_question(question)).get("agent_outcome")
+        return main_langgraph.answer_question(question).get("agent_outcome")
+
+    print(f"questions={len(questions)} llm_latency={args.llm_latency * 1000:.0f}ms "
+          f"weather_latency={args.weather_latency * 1000:.0f}ms min_confidence={args.min_confidence} "
+          f"ceiling={args.max_llm_calls} llm calls, {args.max_in_flight} in flight "
+          f"({'ainvoke' if args.use_async else 'invoke'})")
+    baseline = None
+    for mode in (None, "prefetch", "specialist"):
+        config.SPECULATION_MODE = mode
+        config.SPECULATION_MIN_CONFIDENCE = args.min_confidence
+        llm = ScriptedChatModel(responder=make_standin_responder(routes, plans), latency=args.llm_latency)
+        main_langgraph.set_llm(llm)
+        for question in corpus:  # build the specialists outside the measurement
+            main_langgraph.answer_question(question["question"])
+        speculator = Speculator(args.max_in_flight, args.max_llm_calls, args.max_tokens)
+        main_langgraph.set_speculator(speculator)
+        llm.reset_calls()
+        answers, latencies = [], []
+        for question in questions:
+            get_weather_client().clear()
+            start = time.perf_counter()
+            answers.append(answer(question))
+            latencies.append(time.perf_counter() - start)
+        time.sleep(args.llm_latency * args.max_llm_calls)  # let cancelled runs finish their last call
+        stats = speculator.report()
+        baseline = baseline or answers
+        changed = sum(a != b for a, b in zip(answers, baseline))
+        print(format_summary(mode or "off", summarize(latencies)) +
+              f"  llm_calls/q={llm.calls / len(questions):5.2f}  "
+              f"extra llm calls/q={stats.get('wasted_llm_calls', 0) / len(questions):5.2f}  "
+              f"extra tokens/q={stats.get('wasted_tokens', 0) / len(questions):6.0f}  changed={changed}")
+        if mode:
+            print(f"{'':<28} started={stats.get(f'{mode}_started', 0)} used={stats.get('used', 0)} "
+                  f"cancelled={stats.get('cancelled', 0)} rerun={stats.get('incomplete', 0)} "
+                  f"prefetch hits={stats.get('prefetch_hits', 0)} misses={stats.get('prefetch_misses', 0)} "
+                  f"skipped={stats.get('skipped', 0)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Simulated LLM latency in seconds.")
+    parser.add_argument("--weather-latency", type=float, default=0.2, help="Fake weather API latency in seconds.")
+    parser.add_argument("--repeats", type=int, default=3, help="How many times the corpus is asked in each mode.")
+    parser.add_argument("--min-confidence", type=float, default=0.5,
+                        help="Fast-router confidence needed to speculate (SPECULATION_MIN_CONFIDENCE).")
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--max-llm-calls", type=int, default=3, help="LLM calls allowed to one speculative run.")
+    parser.add_argument("--max-tokens", type=int, default=6000, help="Tokens allowed to one speculative run.")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Answer with `aanswer_question`.")
+    main(parser.parse_args())
@@ -0,0 +1,116 @@
+"""SQL agent benchmark: agent steps and latency with and without the precomputed schema catalog.
+
+The real `create_postgres_agent` runs against a SQLite copy of the game store with a scripted ReAct model
+(`--llm-latency` per call) that follows what each prompt asks of it:
+
+* without the catalog, the stock SQL agent prompt says to look at the tables first, so the model lists the
+  tables, reads the schema of the ones it needs, has its query checked (`sql_db_query_checker`, itself an LLM
+  call) and only then runs it;
+* with the catalog, the relevant tables and their stored Persian values come with the question, so the model
+  runs the query straight away.
+
+The step counts therefore show the round trips the prompts lead to rather than the behaviour of a particular
+model; the tool calls, database work and catalog lookups are real. Catalog build time (cold) and load time (from
+the cache file) are printed as well.
+
+    python -m benchmarks.bench_sql_catalog --llm-latency 0.3
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from benchmarks.common import ScriptedChatModel, last_user_text
+from benchmarks.standins import create_game_store_sqlite, install_standins
+
+# Question -> (tables the model would inspect, query it ends up running)
+QUESTIONS = {
+    "How many orders have been delivered?":
+        ("orders", "SELECT COUNT(*) FROM orders WHERE status = 'تحویل داده شده'"),
+    "Which three products are the most expensive?":
+        ("products", "SELECT name, price FROM products ORDER BY price DESC LIMIT 3"),
+    "How many customers live in Tehran?":
+        ("customers", "SELECT COUNT(*) FROM customers WHERE city = 'تهران'"),
+    "سفارش‌های در حال پردازش چند تا هستند؟":
+        ("orders", "SELECT COUNT(*) FROM orders WHERE status = 'در حال پردازش'"),
+    "Which customers ordered consoles?":
+        ("customers, orders, products",
+         "SELECT DISTINCT c.full_name FROM customers c JOIN orders o ON o.customer_id = c.id "
+         "JOIN products p ON p.id = o.product_id WHERE p.category = 'کنسول' LIMIT 10"),
+    "What is the total stock of headsets?":
+        ("products", "SELECT SUM(stock) FROM products WHERE category = 'هدست'"),
+}
+
+
+def react_responder(messages, kwargs) -> str:
+    text = last_user_text(messages)
+    if "Double check the" in text:  # the query checker tool's own LLM call
+        return re.search(r"\n(SELECT .*?)\n", text, re.S).group(1)
+    question = re.findall(r"^Question: (.*)$", text, re.M)[-1].strip()
+    tables, query = QUESTIONS[question]
+    scratchpad = text.rsplit("Question:", 1)[1]
+    done = re.findall(r"Action: (\w+)", scratchpad)
+    if "sql_db_query" in done:
+        return "Thought: I now know the final answer\nFinal Answer: " + scratchpad.rsplit("Observation:", 1)[1][:200]
+    if "Relevant tables:" in text or "sql_db_query_checker" in done:
+        return f"Action: sql_db_query\nAction Input: {query}"
+    if "sql_db_schema" in done:
+        return f"Action: sql_db_query_checker\nAction Input: {query}"
+    if "sql_db_list_tables" in done:
+        return f"Thought: I should query the schema of the relevant tables.\nAction: sql_db_schema\nAction Input: {tables}"
+    return "Action: sql_db_list_tables\nAction Input: "
+
+
+class ToolCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.calls = 0
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.calls += 1
+
+
+def run(agent, llm, label: str) -> None:
+    llm.reset_calls()
+    counter = ToolCounter()
+    start = time.perf_counter()
+    for question in QUESTIONS:
+        agent.invoke({"input": question}, config={"callbacks": [counter]})
+    elapsed = time.perf_counter() - start
+    n = len(QUESTIONS)
+    print(f"{label:<18} llm_calls/q={llm.calls / n:5.2f}  tool_calls/q={counter.calls / n:5.2f}  "
+          f"latency/q={elapsed / n * 1000:8.1f}ms")
+
+
+def main(args) -> None:
+    workdir = tempfile.mkdtemp(prefix="bench_sql_catalog_")
+    install_standins(sqlite_uri=create_game_store_sqlite(os.path.join(workdir, "game_store.sqlite3")))
+
+    import config
+    from agents.postgres_agent import create_postgres_agent
+    from agents.sql_catalog import load_or_build_catalog
+    from sqlalchemy import create_engine
+
+    config.SQL_CATALOG_PATH = os.path.join(workdir, "sql_catalog.json")
+    engine = create_engine(config.POSTGRES_URI)
+    for label in ("build (cold)", "load (cached)"):
+        start = time.perf_counter()
+        catalog = load_or_build_catalog(engine, config.SQL_CATALOG_PATH, config.SQL_CATALOG_MAX_DISTINCT)
+        print(f"catalog {label:<14} {(time.perf_counter() - start) * 1000:7.1f}ms")
+    for question in QUESTIONS:
+        print(f"  {question!r} -> {catalog.relevant_tables(question, config.SQL_CATALOG_MAX_TABLES)}")
+
+    llm = ScriptedChatModel(responder=react_responder, latency=args.llm_latency)
+    for enabled, label in ((False, "stock SQL agent"), (True, "schema catalog")):
+        config.SQL_CATALOG_ENABLED = enabled
+        agent = create_postgres_agent(llm)
+        agent.invoke({"input": next(iter(QUESTIONS))})  # warm up
+        run(agent, llm, label)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Simulated LLM latency in seconds.")
+    main(parser.parse_args())
@@ -0,0 +1,76 @@
+"""SQL query tool benchmark: the stock `sql_db_query` tool versus `SQLQueryExecutor` on a large table.
+
+A SQLite database with an `events` table of `--rows` rows (each with a short text payload) is generated in a
+temporary directory. For each query, the stock tool (`SQLDatabase.run_no_throw`: fetch everything, stringify
+the list of tuples) and the executor (read-only, server-side cursor, `SQL_MAX_ROWS` / `SQL_MAX_RESULT_BYTES`
+budget) are timed, with the peak traced memory and the size of the text returned to the model.
+
+    python -m benchmarks.bench_sql_query --rows 500000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from langchain_community.utilities import SQLDatabase
+
+import config
+from agents.sql_query import SQLQueryExecutor, create_pooled_engine
+
+QUERIES = [
+    ("select all", "SELECT * FROM events"),
+    ("filtered", "SELECT id, kind, amount FROM events WHERE kind = 'refund'"),
+    ("aggregate", "SELECT kind, COUNT(*), SUM(amount) FROM events GROUP BY kind"),
+]
+
+
+def create_events_sqlite(path: str, n_rows: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    kinds = ["purchase", "refund", "login", "logout", "review"]
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, kind TEXT, amount REAL, payload TEXT)")
+    conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?)", (
+        (i, rng.choice(kinds), round(rng.uniform(1, 500), 2), f"event {i} " + "x" * rng.randint(20, 120))
+        for i in range(1, n_rows + 1)))
+    conn.commit()
+    conn.close()
+    return f"sqlite:///{path}"
+
+
+def measure(fn, repeats: int):
+    tracemalloc.start()
+    output = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats, peak, output
+
+
+def main(args) -> None:
+    uri = create_events_sqlite(os.path.join(tempfile.mkdtemp(prefix="bench_sql_query_"), "events.sqlite3"),
+                               args.rows)
+    engine = create_pooled_engine(uri)
+    db = SQLDatabase(engine)
+    executor = SQLQueryExecutor(engine, max_rows=config.SQL_MAX_ROWS, max_bytes=config.SQL_MAX_RESULT_BYTES,
+                                statement_timeout=config.SQL_STATEMENT_TIMEOUT, fetch_size=config.SQL_FETCH_SIZE,
+                                max_cell_chars=config.SQL_MAX_CELL_CHARS)
+
+    print(f"rows={args.rows} max_rows={config.SQL_MAX_ROWS} max_bytes={config.SQL_MAX_RESULT_BYTES}")
+    print(f"{'query':<12} {'tool':<9} {'latency':>10} {'peak memory':>12} {'output':>11}")
+    for name, query in QUERIES:
+        for label, fn in (("stock", lambda: db.run_no_throw(query)), ("executor", lambda: executor.run(query))):
+            latency, peak, output = measure(fn, args.repeats)
+            print(f"{name:<12} {label:<9} {latency * 1000:8.1f}ms {peak / 1024 / 1024:10.2f}MB "
+                  f"{len(output.encode()) / 1024:9.1f}KB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--repeats", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,82 @@
+"""Tracing benchmark: per-question overhead of the tracing callbacks and node wrappers, and what the trace shows.
+
+The LangGraph app answers the same questions (weather stand-in, SQLite game store, mongomock learning platform,
+and one multi-source question) with tracing disabled and with a tracer writing to a temporary JSON-lines file.
+The chat model is scripted with `--llm-latency` per call. Afterwards the trace file is summarized the way
+`python -m utils.tracing` does: p50/p95/p99 per node, LLM, tool, agent iteration and HTTP call.
+
+    python -m benchmarks.bench_tracing --llm-latency 0.05 --repeats 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+QUESTIONS = [
+    "What's the weather in Paris today?",
+    "Which courses are available on the platform?",
+    "What are the three most expensive products in the store?",
+    "Is it raining in London, and which courses are available on the platform?",
+]
+
+
+def main(args) -> None:
+    from benchmarks.standins import (create_game_store_sqlite, create_mongomock_client, install_standins,
+                                     make_standin_responder, start_weather_stub)
+
+    workdir = tempfile.mkdtemp(prefix="bench_tracing_")
+    _, weather_url = start_weather_stub(latency=args.weather_latency)
+    install_standins(weather_url=weather_url, mongo_client=create_mongomock_client(),
+                     sqlite_uri=create_game_store_sqlite(os.path.join(workdir, "game_store.sqlite3")))
+
+    import config
+    import main_langgraph
+    from benchmarks.common import ScriptedChatModel
+    from utils.tracing import Tracer, set_tracer, summarize_trace_file, with_tracing
+
+    config.ROUTING_LOG_PATH = None
+    config.SQL_CATALOG_PATH = os.path.join(workdir, "sql_catalog.json")
+    config.WEATHER_CACHE_TTL = 0  # every weather question makes an HTTP call
+    plans = {QUESTIONS[3]: [("WeatherAPI", "Is it raining in London?"),
+                            ("AILearningPlatformDB", "Which courses are available on the platform?")]}
+    main_langgraph.set_llm(ScriptedChatModel(responder=make_standin_responder(plans=plans),
+                                             latency=args.llm_latency))
+    main_langgraph.set_answer_cache(None)
+
+    trace_path = os.path.join(workdir, "traces.jsonl")
+    timings = {}
+    for label, tracer in (("tracing off", None), ("tracing on", Tracer(trace_path, config.LLM_PRICES))):
+        set_tracer(tracer)
+        app = main_langgraph.get_app()
+        for question in QUESTIONS:  # build the specialists outside the timing
+            app.invoke({"input": question}, config=with_tracing())
+        if tracer is not None:
+            tracer.close()
+            os.remove(trace_path)
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            for question in QUESTIONS:
+                app.invoke({"input": question}, config=with_tracing())
+        timings[label] = (time.perf_counter() - start) / (args.repeats * len(QUESTIONS))
+    set_tracer(None)
+    tracer.close()
+
+    with open(trace_path, encoding="utf-8") as f:
+        n_spans = sum(1 for _ in f)
+    overhead = timings["tracing on"] - timings["tracing off"]
+    print(f"llm_latency={args.llm_latency * 1000:.0f}ms repeats={args.repeats} questions={len(QUESTIONS)}")
+    for label, seconds in timings.items():
+        print(f"{label:<12} latency/q={seconds * 1000:8.2f}ms")
+    print(f"overhead/q={overhead * 1000:.2f}ms ({overhead / timings['tracing off'] * 100:.1f}%)  "
+          f"spans/q={n_spans / (args.repeats * len(QUESTIONS)):.1f}  trace file={os.path.getsize(trace_path) / 1024:.1f}KB\n")
+    for row in summarize_trace_file(trace_path):
+        print(f"{row['kind']:<11} {row['name'][:28]:<28} n={row['n']:<5} p50={row['p50_ms']:8.2f}ms "
+              f"p95={row['p95_ms']:8.2f}ms p99={row['p99_ms']:8.2f}ms tokens={row['tokens']:6.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated LLM latency in seconds.")
+    parser.add_argument("--weather-latency", type=float, default=0.02, help="Fake weather API latency in seconds.")
+    parser.add_argument("--repeats", type=int, default=5)
+    main(parser.parse_args())
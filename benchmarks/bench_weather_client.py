@@ -0,0 +1,81 @@
+"""Weather client benchmark: upstream calls and wall time for a burst of same-city questions.
+
+`--burst` concurrent lookups for Tehran, spelled in four different ways (English, Persian, lower/upper case),
+are sent against a local fake OpenWeatherMap server with `--latency` seconds of response time:
+
+* naive:  one bare `requests.get` per lookup, which is what the weather tool used to do,
+* client (threads): `WeatherClient.get` from a thread pool,
+* client (asyncio): `WeatherClient.aget` from `asyncio.gather`.
+
+The client runs start with an empty cache, so the single remaining upstream call comes from request coalescing;
+a second burst is then served entirely from the TTL cache.
+
+    python -m benchmarks.bench_weather_client --burst 50 --latency 0.2
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from agents.weather_client import WeatherClient
+from benchmarks.standins import start_weather_stub
+
+SPELLINGS = ["Tehran", "تهران", "tehran ", "TEHRAN"]
+
+
+def naive_lookup(url: str, city: str) -> dict:
+    response = requests.get(url, params={"q": city, "appid": "x", "units": "metric", "lang": "fa"})
+    response.raise_for_status()
+    return response.json()
+
+
+def run_threads(fn, burst: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=burst) as pool:
+        list(pool.map(fn, [SPELLINGS[i % len(SPELLINGS)] for i in range(burst)]))
+    return time.perf_counter() - start
+
+
+def run_async(client: WeatherClient, burst: int) -> float:
+    async def burst_of_lookups():
+        await asyncio.gather(*(client.aget(SPELLINGS[i % len(SPELLINGS)]) for i in range(burst)))
+
+    start = time.perf_counter()
+    asyncio.run(burst_of_lookups())
+    return time.perf_counter() - start
+
+
+def main(args) -> None:
+    server, url = start_weather_stub(latency=args.latency)
+    rows = []
+
+    def measure(name, run):
+        before = server.request_count
+        elapsed = run()
+        rows.append((name, server.request_count - before, elapsed))
+
+    measure("naive requests.get", lambda: run_threads(lambda city: naive_lookup(url, city), args.burst))
+
+    client = WeatherClient(url, "x")
+    measure("client (threads), cold", lambda: run_threads(client.get, args.burst))
+    measure("client (threads), warm", lambda: run_threads(client.get, args.burst))
+
+    async_client = WeatherClient(url, "x")
+    measure("client (asyncio), cold", lambda: run_async(async_client, args.burst))
+    measure("client (asyncio), warm", lambda: run_async(async_client, args.burst))
+
+    print(f"burst={args.burst} lookups of one city in {len(SPELLINGS)} spellings, "
+          f"upstream latency={args.latency * 1000:.0f}ms")
+    for name, calls, elapsed in rows:
+        print(f"{name:<26} upstream_calls={calls:<4} wall={elapsed * 1000:8.1f}ms")
+    print(f"thread client stats: {client.stats}")
+    print(f"async client stats:  {async_client.stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake weather API latency in seconds.")
+    main(parser.parse_args())
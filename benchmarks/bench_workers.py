@@ -0,0 +1,136 @@
+"""Pre-fork worker benchmark: throughput of `workers.py` serving POST /ask with 1 to N worker processes.
+
+The graph and agents are built once in this process, against the backend stand-ins and the scripted chat model
+(`--llm-latency` of waiting plus `--llm-cpu` of busy work per call, so that a worker's event loop is kept busy as
+by a real client's request building and parsing). For every worker count a supervisor is forked to serve a fresh
+socket, and `--requests` questions of the harness corpus are sent with `--concurrency` in flight. The workers share
+their weather cache through a new SQLite store per run (`--store none`: per-worker caches only); "weather calls"
+counts the requests the fake weather API received. The answer cache is disabled. Throughput can only grow up to
+the number of cores of the machine, which is printed first.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --requests 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import tempfile
+import time
+
+import httpx
+
+
+async def run_load(url: str, questions: list, concurrency: int) -> list:
+    """(seconds, ok) of every question, sent `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one(question: str):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(f"{url}/ask", json={"question": question})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                return time.perf_counter() - start, ok
+        return await asyncio.gather(*(one(question) for question in questions))
+
+
+def wait_until_healthy(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if httpx.get(f"{url}/healthz", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"The workers at {url} did not become healthy within {timeout:g}s.")
+        time.sleep(0.05)
+
+
+def main(args) -> None:
+    from benchmarks.standins import (create_game_store_sqlite, create_mongomock_client, install_standins,
+                                     make_standin_responder, start_weather_stub)
+
+    workdir = tempfile.mkdtemp(prefix="bench_workers_")
+    weather_stub, weather_url = start_weather_stub(latency=args.weather_latency)
+    install_standins(weather_url=weather_url, mongo_client=create_mongomock_client(),
+                     sqlite_uri=create_game_store_sqlite(os.path.join(workdir, "game_store.sqlite3")))
+
+    import config
+    import main_langgraph
+    import workers
+    from agents.weather_client import get_weather_client
+    from benchmarks.common import ScriptedChatModel, format_summary, summarize
+    from benchmarks.harness import load_corpus
+    from utils.shared_store import SharedStore
+
+    config.ROUTING_LOG_PATH = None
+    config.TRACE_PATH = None
+    config.AGENT_VERBOSE = False
+    config.MEMORY_ENABLED = False
+    config.SQL_CATALOG_PATH = os.path.join(workdir, "sql_catalog.json")
+    logging.getLogger().setLevel(logging.WARNING)  # no access logs from the workers
+
+    corpus = load_corpus()
+    routes = {item["question"]: item["route"] for item in corpus}
+    plans = {item["question"]: [tuple(step) for step in item["plan"]] for item in corpus if item.get("plan")}
+    responder = make_standin_responder(routes, plans)
+
+    def respond(messages, kwargs):
+        busy_until = time.perf_counter() + args.llm_cpu
+        while time.perf_counter() < busy_until:
+            pass
+        return responder(messages, kwargs)
+
+    main_langgraph.set_llm(ScriptedChatModel(responder=respond, latency=args.llm_latency))
+    main_langgraph.set_answer_cache(None)
+    workers.warm_up()
+    weather = get_weather_client()
+    questions = [corpus[i % len(corpus)]["question"] for i in range(args.requests)]
+
+    print(f"cores={os.cpu_count()} requests={args.requests} concurrency={args.concurrency} "
+          f"llm_latency={args.llm_latency * 1000:.0f}ms llm_cpu={args.llm_cpu * 1000:.0f}ms store={args.store}")
+    baseline = None
+    for n in args.workers:
+        weather.clear()
+        weather.store = SharedStore(os.path.join(workdir, f"shared_store_{n}.sqlite3")) \
+            if args.store == "sqlite" else None
+        weather_stub.request_count = 0
+        sock = workers.listen("127.0.0.1", 0)
+        url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+        pid = os.fork()
+        if pid == 0:
+            try:
+                workers.Supervisor(n, lambda slot: workers.serve(sock, slot), grace=5).run()
+            finally:
+                os._exit(0)
+        sock.close()
+        try:
+            wait_until_healthy(url)
+            start = time.perf_counter()
+            results = asyncio.run(run_load(url, questions, args.concurrency))
+            elapsed = time.perf_counter() - start
+        finally:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        throughput = len(questions) / elapsed
+        baseline = baseline or throughput
+        print(format_summary(f"{n} workers", summarize([seconds for seconds, _ in results])) +
+              f"  {throughput:6.1f} q/s  x{throughput / baseline:4.2f}  "
+              f"errors={sum(not ok for _, ok in results)}  weather calls={weather_stub.request_count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to measure.")
+    parser.add_argument("--requests", type=int, default=200, help="Questions sent to each worker count.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Questions in flight at once.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated LLM latency in seconds.")
+    parser.add_argument("--llm-cpu", type=float, default=0.01, help="Simulated CPU time per LLM call in seconds.")
+    parser.add_argument("--weather-latency", type=float, default=0.05, help="Fake weather API latency in seconds.")
+    parser.add_argument("--store", choices=["sqlite", "none"], default="sqlite",
+                        help="Share the weather cache between the workers through a SQLite store, or not.")
+    main(parser.parse_args())
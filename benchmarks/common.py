@@ -0,0 +1,114 @@
+"""Helpers shared by the benchmark scripts: a scripted stand-in for `ChatOpenAI` and latency statistics."""
+import asyncio
+import json
+import statistics
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from utils.tracing import percentile as nearest_rank
+
+Responder = Callable[[List[BaseMessage], Dict[str, Any]], Union[AIMessage, str]]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """A chat model that answers through a Python callable after a fixed simulated latency.
+
+    The responder receives the prompt messages and the bound kwargs (e.g. `tools`) and returns either a string
+    or a full `AIMessage`, which lets it emit tool calls for the OpenAI-tools agents. Every call is counted."""
+
+    responder: Responder
+    latency: float = 0.0
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _calls: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat-model"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def reset_calls(self) -> None:
+        with self._lock:
+            self._calls = 0
+
+    def _respond(self, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> ChatResult:
+        with self._lock:
+            self._calls += 1
+        message = self.responder(messages, kwargs)
+        if isinstance(message, str):
+            message = AIMessage(content=message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages, kwargs)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages, kwargs)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any):
+        """Streams the scripted answer word by word (tool calls arrive as a single chunk)."""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = self._respond(messages, kwargs).generations[0].message
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(message.tool_calls)]))
+            return
+        words = str(message.content).split(" ")
+        for i, word in enumerate(words):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(tools=tools, **kwargs)
+
+
+def last_user_text(messages: List[BaseMessage]) -> str:
+    """Returns the content of the last human message in a prompt, which is where every agent puts the question."""
+    for message in reversed(messages):
+        if message.type == "human":
+            return str(message.content)
+    return ""
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile; `pct` is in [0, 100]."""
+    if not values:
+        return float("nan")
+    return nearest_rank(sorted(values), pct)
+
+
+def summarize(values_seconds: Sequence[float]) -> Dict[str, float]:
+    """Returns count, mean, p50, p95 and p99 of a list of durations, in milliseconds."""
+    ms = [v * 1000 for v in values_seconds]
+    return {
+        "n": len(ms),
+        "mean_ms": statistics.fmean(ms) if ms else float("nan"),
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+    }
+
+
+def format_summary(name: str, summary: Dict[str, float]) -> str:
+    return (f"{name:<28} n={summary['n']:<5} mean={summary['mean_ms']:9.2f}ms  p50={summary['p50_ms']:9.2f}ms  "
+            f"p95={summary['p95_ms']:9.2f}ms  p99={summary['p99_ms']:9.2f}ms")
@@ -0,0 +1,229 @@
+"""Offline benchmark harness: replays recorded LLM responses against local stand-ins of every backend and runs a
+fixed question corpus through both orchestrators.
+
+* LLM:      `ScriptedChatModel` answering from `benchmarks/fixtures/llm_fixtures.json` (see `benchmarks/replay.py`),
+            after `--llm-latency` seconds per call,
+* backends: SQLite for game_store, mongomock for learning_platform and a local OpenWeatherMap stub
+            (`benchmarks/standins.py`),
+* corpus:   `benchmarks/fixtures/corpus.json` (single-route, multi-source and off-topic questions).
+
+For `main.py`'s router session (in both router modes) and for the LangGraph app (`main_langgraph.answer_question`),
+the harness reports the latency distribution per question, LLM and tool calls per question, peak traced memory
+per question, errors and prompts missing from the fixtures. The answer cache, the conversation memory, the routing
+log and the trace file are disabled and the agents run with `AGENT_VERBOSE = False`. `--output` saves the report
+as JSON, so that a change can be compared against a saved baseline with `--baseline`. The routes the LangGraph app
+chose are checked against the corpus (its "route", and the routes of its "plan" for a multi-source question); a
+misrouted question fails the run.
+
+Fixtures are recorded with `--record standins` (the scripted stand-in responder, no API key needed) or
+`--record openai` (the configured OpenAI model, against the same stand-in backends). Recording covers runs with
+and without the fast router.
+
+    python -m benchmarks.harness --llm-latency 0.3 --repeats 3 --output baseline.json
+    python -m benchmarks.harness --llm-latency 0.3 --baseline baseline.json
+    python -m benchmarks.harness --record openai
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+CORPUS_PATH = os.path.join(FIXTURES_DIR, "corpus.json")
+LLM_FIXTURES_PATH = os.path.join(FIXTURES_DIR, "llm_fixtures.json")
+
+
+class ToolCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.calls = 0
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.calls += 1
+
+
+def load_corpus(path: str = CORPUS_PATH) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def setup_environment(args) -> None:
+    """Starts the backend stand-ins and points the configuration at them. Must run before the agents are built."""
+    from benchmarks.standins import (create_game_store_sqlite, create_mongomock_client, install_standins,
+                                     start_weather_stub)
+
+    workdir = tempfile.mkdtemp(prefix="bench_harness_")
+    _, weather_url = start_weather_stub(latency=args.weather_latency)
+    install_standins(weather_url=weather_url, mongo_client=create_mongomock_client(),
+                     sqlite_uri=create_game_store_sqlite(os.path.join(workdir, "game_store.sqlite3")))
+
+    import config
+    config.ROUTING_LOG_PATH = None
+    config.TRACE_PATH = None
+    config.ANSWER_CACHE_ENABLED = False
+    config.MEMORY_ENABLED = False  # every question is answered on its own
+    config.AGENT_VERBOSE = False
+    config.WEATHER_CACHE_TTL = 0  # every weather question reaches the HTTP stub
+    config.SQL_CATALOG_PATH = os.path.join(workdir, "sql_catalog.json")
+
+
+def make_systems(llm) -> Dict[str, Callable]:
+    """Question -> answer callables for both orchestrators, sharing the given chat model. Each accepts a run
+    config (for the tool counter) and returns the answer text."""
+    import main
+    import main_langgraph
+
+    main_langgraph.set_llm(llm)
+    main_langgraph.set_answer_cache(None)
+    main_langgraph.reset_fast_router()
+    agent_session = main.create_session(llm, mode="agent")
+    dispatch_session = main.create_session(llm, mode="dispatch")
+    return {
+        "main (router agent)": lambda q, run_config: str(agent_session.answer(q, run_config).get("output")),
+        "main (dispatch)": lambda q, run_config: str(dispatch_session.answer(q, run_config).get("output")),
+        "main_langgraph": lambda q, run_config: str(
+            main_langgraph.answer_question(q, run_config).get("agent_outcome")),
+    }
+
+
+def record(args, corpus: List[dict]) -> None:
+    import config
+    from benchmarks.common import ScriptedChatModel
+    from benchmarks.replay import RecordingChatModel, save_fixtures
+    from benchmarks.standins import make_standin_responder
+
+    if args.record == "openai":
+        from langchain_openai import ChatOpenAI
+        inner = ChatOpenAI(model=config.MODEL_NAME, temperature=config.TEMPERATURE)
+    else:
+        routes = {item["question"]: item["route"] for item in corpus}
+        plans = {item["question"]: [tuple(step) for step in item["plan"]] for item in corpus if item.get("plan")}
+        inner = ScriptedChatModel(responder=make_standin_responder(routes, plans))
+    llm = RecordingChatModel(inner=inner)
+    for fast_router in (True, False):
+        config.FAST_ROUTER_ENABLED = fast_router
+        for name, answer in make_systems(llm).items():
+            for item in corpus:
+                answer(item["question"], None)
+    source = f"{args.record}:{getattr(inner, 'model_name', type(inner).__name__)}"
+    save_fixtures(args.fixtures, llm.responses, source)
+    print(f"Recorded {len(llm.responses)} LLM responses from {source} to {args.fixtures}")
+
+
+def run_system(name: str, answer: Callable, llm, corpus: List[dict], repeats: int) -> dict:
+    questions = [item["question"] for item in corpus]
+    for question in questions:  # build the agents and fill connection pools outside the measurement
+        answer(question, None)
+
+    latencies, llm_calls, tool_calls, errors = [], 0, 0, 0
+    for _ in range(repeats):
+        for question in questions:
+            counter = ToolCounter()
+            calls_before = llm.calls
+            start = time.perf_counter()
+            try:
+                output = answer(question, {"callbacks": [counter]})
+                errors += output.startswith(("Error", "An error occurred"))
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+            llm_calls += llm.calls - calls_before
+            tool_calls += counter.calls
+
+    peaks = []
+    for question in questions:
+        tracemalloc.start()
+        try:
+            answer(question, None)
+        except Exception:
+            pass
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    from benchmarks.common import summarize
+    n = len(latencies)
+    return {"system": name, **summarize(latencies), "llm_calls_per_q": llm_calls / n,
+            "tool_calls_per_q": tool_calls / n, "peak_mem_mb_max": max(peaks) / 1024 / 1024,
+            "peak_mem_mb_mean": sum(peaks) / len(peaks) / 1024 / 1024, "errors": errors}
+
+
+def expected_routes(item: dict) -> List[str]:
+    return sorted(step[0] for step in item["plan"]) if item.get("plan") else [item["route"]]
+
+
+def check_routes(corpus: List[dict]) -> List[str]:
+    """Runs every question through the LangGraph app and returns a description of each one whose routes differ
+    from those of the corpus."""
+    import main_langgraph
+
+    misrouted = []
+    for item in corpus:
+        state = main_langgraph.answer_question(item["question"])
+        routes = sorted(step["route"] for step in state.get("plan") or []) or [state.get("next_agent")]
+        if routes != expected_routes(item):
+            misrouted.append(f"'{item['question']}': routed to {routes}, expected {expected_routes(item)}")
+    return misrouted
+
+
+def print_report(results: List[dict], baseline: Dict[str, dict]) -> None:
+    from benchmarks.common import format_summary
+    for row in results:
+        print(format_summary(row["system"], row))
+        print(f"{'':<28} llm_calls/q={row['llm_calls_per_q']:5.2f}  tool_calls/q={row['tool_calls_per_q']:5.2f}  "
+              f"peak_mem/q max={row['peak_mem_mb_max']:6.2f}MB mean={row['peak_mem_mb_mean']:6.2f}MB  "
+              f"errors={row['errors']}")
+        base = baseline.get(row["system"])
+        if base:
+            print(f"{'':<28} vs baseline: " + "  ".join(
+                f"{key}={row[key] - base[key]:+.2f}" for key in
+                ("p50_ms", "p95_ms", "llm_calls_per_q", "tool_calls_per_q", "peak_mem_mb_max")))
+
+
+def main(args) -> None:
+    setup_environment(args)
+    import config
+    from benchmarks.common import ScriptedChatModel
+    from benchmarks.replay import FixtureResponder, load_fixtures
+
+    corpus = load_corpus(args.corpus)
+    if args.record:
+        record(args, corpus)
+        return
+
+    config.FAST_ROUTER_ENABLED = not args.no_fast_router
+    responder = FixtureResponder(load_fixtures(args.fixtures))
+    llm = ScriptedChatModel(responder=responder, latency=args.llm_latency)
+    results = [run_system(name, answer, llm, corpus, args.repeats) for name, answer in make_systems(llm).items()]
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {row["system"]: row for row in json.load(f)["results"]}
+    print(f"\nquestions={len(corpus)} repeats={args.repeats} llm_latency={args.llm_latency * 1000:.0f}ms "
+          f"weather_latency={args.weather_latency * 1000:.0f}ms fast_router={config.FAST_ROUTER_ENABLED} "
+          f"fixture_misses={responder.misses}")
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=1)
+    misrouted = check_routes(corpus)
+    if misrouted:
+        raise SystemExit("Misrouted questions:\n" + "\n".join(misrouted))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Simulated LLM latency in seconds.")
+    parser.add_argument("--weather-latency", type=float, default=0.05, help="Fake weather API latency in seconds.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--no-fast-router", action="store_true", help="Send every question to the LLM router.")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--fixtures", default=LLM_FIXTURES_PATH)
+    parser.add_argument("--record", choices=["standins", "openai"], help="Record the LLM fixtures instead.")
+    parser.add_argument("--output", help="Save the report as JSON.")
+    parser.add_argument("--baseline", help="A report saved with --output to compare against.")
+    main(parser.parse_args())
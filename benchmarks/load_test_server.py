@@ -0,0 +1,104 @@
+"""Load test for `server.py`'s streaming endpoint with a mocked LLM.
+
+Starts the API in-process on a free port (stand-in weather API and mongomock behind it, scripted chat model with
+`--llm-latency`), then fires `--requests` streaming questions with `--concurrency` in flight. For every request
+it records time to first byte, time to the first answer token and total time, and prints their distributions
+together with the overall throughput. Pass `--url` to load-test an already running server instead.
+
+    python -m benchmarks.load_test_server --requests 64 --concurrency 16
+"""
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+import httpx
+
+from benchmarks.common import format_summary, summarize
+
+QUESTIONS = [
+    "What's the weather in Paris today?",
+    "Which courses are available on the platform?",
+    "Is it raining in London?",
+    "Who teaches the deep learning course?",
+]
+
+
+def start_local_server(llm_latency: float) -> str:
+    import uvicorn
+
+    from benchmarks.common import ScriptedChatModel
+    from benchmarks.standins import (create_mongomock_client, install_standins, make_standin_responder,
+                                     start_weather_stub)
+
+    _, weather_url = start_weather_stub()
+    install_standins(weather_url=weather_url, mongo_client=create_mongomock_client())
+
+    import config
+    import main_langgraph
+    import server
+
+    config.ROUTING_LOG_PATH = None
+    config.TRACE_PATH = None
+    main_langgraph.set_llm(ScriptedChatModel(responder=make_standin_responder(), latency=llm_latency))
+    main_langgraph.set_answer_cache(None)  # measure the agents, not the answer cache
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    uvicorn_server = uvicorn.Server(uvicorn.Config(server.api, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=uvicorn_server.run, daemon=True).start()
+    while not uvicorn_server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def one_request(client: httpx.AsyncClient, url: str, question: str) -> dict:
+    start = time.perf_counter()
+    first_byte = first_token = None
+    status = "ok"
+    async with client.stream("POST", f"{url}/ask/stream", json={"question": question}) as response:
+        async for line in response.aiter_lines():
+            now = time.perf_counter()
+            if first_byte is None and line:
+                first_byte = now - start
+            if line == "event: token" and first_token is None:
+                first_token = now - start
+            if line == "event: error":
+                status = "error"
+    return {"ttfb": first_byte, "first_token": first_token, "total": time.perf_counter() - start, "status": status}
+
+
+async def run_load(url: str, n_requests: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=None) as client:
+        async def bounded(i: int) -> dict:
+            async with semaphore:
+                return await one_request(client, url, QUESTIONS[i % len(QUESTIONS)])
+        return await asyncio.gather(*(bounded(i) for i in range(n_requests)))
+
+
+def main(args) -> None:
+    url = args.url or start_local_server(args.llm_latency)
+    asyncio.run(run_load(url, len(QUESTIONS), len(QUESTIONS)))  # warm up the specialists
+
+    start = time.perf_counter()
+    results = asyncio.run(run_load(url, args.requests, args.concurrency))
+    elapsed = time.perf_counter() - start
+
+    print(f"\nrequests={args.requests} concurrency={args.concurrency} wall={elapsed:.2f}s "
+          f"throughput={args.requests / elapsed:.2f} req/s errors={sum(r['status'] != 'ok' for r in results)}")
+    print(format_summary("time to first byte", summarize([r["ttfb"] for r in results if r["ttfb"] is not None])))
+    print(format_summary("time to first token",
+                         summarize([r["first_token"] for r in results if r["first_token"] is not None])))
+    print(format_summary("total", summarize([r["total"] for r in results])))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Base URL of a running server (default: start one in-process).")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Simulated LLM latency in seconds.")
+    main(parser.parse_args())
@@ -0,0 +1,123 @@
+"""Recorded LLM fixtures: a chat model wrapper that records every response keyed by its prompt, and a responder
+for `ScriptedChatModel` that replays them.
+
+A fixture key is a hash of the prompt messages (type, content, tool calls and their ids, tool call id) and the
+names of the tools bound to the model, so it does not depend on the model or on call order. Replayed responses
+keep the recorded tool call ids, which makes the following prompts, and therefore their keys, identical to the
+recorded ones as long as the backends (the stand-ins) return the same data."""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+from benchmarks.common import last_user_text
+
+FIXTURE_VERSION = 1
+
+
+class MissingFixtureError(LookupError):
+    pass
+
+
+def _tool_names(kwargs: Dict[str, Any]) -> List[str]:
+    names = []
+    for tool in kwargs.get("tools") or []:
+        if isinstance(tool, dict):
+            names.append(tool.get("function", {}).get("name") or tool.get("name"))
+        else:
+            names.append(getattr(tool, "name", None) or getattr(tool, "__name__", None))  # tools or schemas
+    return sorted(str(name) for name in names)
+
+
+def fixture_key(messages: Sequence[BaseMessage], kwargs: Dict[str, Any]) -> str:
+    payload = {
+        "tools": _tool_names(kwargs),
+        "messages": [{
+            "type": m.type,
+            "content": m.content,
+            "tool_calls": [[c["name"], c["args"], c["id"]] for c in getattr(m, "tool_calls", None) or []],
+            "tool_call_id": getattr(m, "tool_call_id", None),
+        } for m in messages],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+def load_fixtures(path: str) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != FIXTURE_VERSION:
+        raise ValueError(f"'{path}' was recorded with fixture version {data.get('version')}; record it again.")
+    return data["responses"]
+
+
+def save_fixtures(path: str, responses: Dict[str, dict], source: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": FIXTURE_VERSION, "source": source, "responses": dict(sorted(responses.items()))},
+                  f, ensure_ascii=False, indent=1)
+
+
+class RecordingChatModel(BaseChatModel):
+    """Passes every call to `inner` and records the response (and its latency) under the prompt's fixture key."""
+
+    inner: BaseChatModel
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _responses: Dict[str, dict] = PrivateAttr(default_factory=dict)
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording-chat-model"
+
+    @property
+    def responses(self) -> Dict[str, dict]:
+        return self._responses
+
+    def _record(self, messages: List[BaseMessage], kwargs: Dict[str, Any], result: ChatResult, latency: float):
+        entry = {"question": last_user_text(messages)[:120], "latency": round(latency, 4),
+                 "response": message_to_dict(result.generations[0].message)}
+        with self._lock:
+            self._responses[fixture_key(messages, kwargs)] = entry
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        start = time.perf_counter()
+        result = self.inner._generate(messages, stop=stop, **kwargs)
+        self._record(messages, kwargs, result, time.perf_counter() - start)
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        start = time.perf_counter()
+        result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+        self._record(messages, kwargs, result, time.perf_counter() - start)
+        return result
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+
+class FixtureResponder:
+    """A `ScriptedChatModel` responder that answers each prompt with its recorded response."""
+
+    def __init__(self, responses: Dict[str, dict]):
+        self.responses = responses
+        self.misses = 0
+
+    def __call__(self, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> BaseMessage:
+        entry = self.responses.get(fixture_key(messages, kwargs))
+        if entry is None:
+            self.misses += 1
+            raise MissingFixtureError(f"No recorded LLM response for the prompt about "
+                                      f"'{last_user_text(messages)[:80]}'; record the fixtures again.")
+        return messages_from_dict([entry["response"]])[0]
@@ -0,0 +1,267 @@
+"""Local stand-ins for the external services, so benchmarks can run the real agents without OpenAI, PostgreSQL,
+MongoDB or OpenWeatherMap:
+
+* a threaded HTTP server that speaks the subset of the OpenWeatherMap API used by the weather agent,
+* a SQLite file with the game_store tables (Persian data values, like the real database),
+* a mongomock client seeded with the learning_platform collections,
+* a scripted responder that plays the LLM for the routers and every specialist agent.
+"""
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+import config
+from benchmarks.common import last_user_text
+
+ORDER_STATUSES = ["در حال پردازش", "ارسال شده", "تحویل داده شده", "لغو شده"]
+PRODUCT_CATEGORIES = ["کنسول", "ماوس", "کیبورد", "هدست", "بازی"]
+COURSE_TITLES = ["Machine Learning Fundamentals", "Deep Learning with Python", "Natural Language Processing",
+                 "Computer Vision Basics", "Python for Data Science", "Reinforcement Learning"]
+
+
+# --- Weather -----------------------------------------------------------------------------------------------------
+
+class _WeatherHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+        if server.latency:
+            time.sleep(server.latency)
+        query = parse_qs(urlparse(self.path).query)
+        city = (query.get("q") or [""])[0]
+        if not city or city.lower() in {"nowhere", "atlantis"}:
+            body, status = {"cod": "404", "message": "city not found"}, 404
+        else:
+            body = {"name": city, "weather": [{"description": "آسمان صاف"}],
+                    "main": {"temp": 21.5, "humidity": 40}, "wind": {"speed": 3.1}}
+            status = 200
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_weather_stub(latency: float = 0.0, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Starts a fake OpenWeatherMap server in a daemon thread. Returns the server (whose `request_count` counts
+    upstream calls) and the URL to use as `config.WEATHER_API_URL`."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _WeatherHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.request_count = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/data/2.5/weather"
+
+
+# --- Game store (PostgreSQL stand-in) ----------------------------------------------------------------------------
+
+def create_game_store_sqlite(path: str, n_customers: int = 200, n_products: int = 50, n_orders: int = 2000,
+                             seed: int = 7) -> str:
+    """Creates (or recreates) a SQLite game_store database and returns its SQLAlchemy URI."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    cur = conn.cursor()
+    cur.executescript("""
+        DROP TABLE IF EXISTS orders;
+        DROP TABLE IF EXISTS products;
+        DROP TABLE IF EXISTS customers;
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, full_name TEXT NOT NULL, email TEXT, city TEXT);
+        CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT NOT NULL, category TEXT, price REAL, stock INTEGER);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id),
+                             product_id INTEGER REFERENCES products(id), quantity INTEGER, status TEXT,
+                             created_at TEXT);
+    """)
+    cities = ["تهران", "اصفهان", "شیراز", "مشهد", "تبریز"]
+    cur.executemany("INSERT INTO customers VALUES (?, ?, ?, ?)", [
+        (i, f"مشتری {i}", f"customer{i}@example.com", rng.choice(cities)) for i in range(1, n_customers + 1)])
+    cur.executemany("INSERT INTO products VALUES (?, ?, ?, ?, ?)", [
+        (i, f"محصول {i}", rng.choice(PRODUCT_CATEGORIES), round(rng.uniform(5, 900), 2), rng.randint(0, 100))
+        for i in range(1, n_products + 1)])
+    cur.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?)", [
+        (i, rng.randint(1, n_customers), rng.randint(1, n_products), rng.randint(1, 4), rng.choice(ORDER_STATUSES),
+         f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}") for i in range(1, n_orders + 1)])
+    conn.commit()
+    conn.close()
+    return f"sqlite:///{path}"
+
+
+# --- Learning platform (MongoDB stand-in) ------------------------------------------------------------------------
+
+def seed_learning_platform(db, n_users: int = 500, lessons_per_course: int = 8, seed: int = 7,
+                           extra_courses: int = 0) -> None:
+    """Fills `db.courses` and `db.users` with the learning_platform document shapes (`extra_courses` more courses
+    with generated titles, for large datasets). Works with pymongo or mongomock databases."""
+    rng = random.Random(seed)
+    db.courses.delete_many({})
+    db.users.delete_many({})
+    titles = COURSE_TITLES + [f"Course {i}: {rng.choice(COURSE_TITLES)} Part {i % 7 + 1}"
+                              for i in range(extra_courses)]
+    courses = [{
+        "title": title,
+        "instructor_name": f"Instructor {i}",
+        "description": f"An introduction to {title.lower()}.",
+        "lessons": [{"title": f"Lesson {j + 1}", "content": f"Content of lesson {j + 1} of {title}. " * 20}
+                    for j in range(lessons_per_course)],
+    } for i, title in enumerate(titles)]
+    course_ids = db.courses.insert_many(courses).inserted_ids
+    names = ["Alice Johnson", "Bob Smith"] + [f"User {i}" for i in range(n_users - 2)]
+    for start in range(0, len(names), 10000):  # in chunks, so that large datasets are not built in memory at once
+        db.users.insert_many([{
+            "full_name": name,
+            "email": f"{name.lower().replace(' ', '.')}@example.com",
+            "enrollments": [{"course_id": course_id, "progress": rng.randint(0, 100)}
+                            for course_id in rng.sample(course_ids, rng.randint(1, 3))],
+        } for name in names[start:start + 10000]])
+
+
+def create_mongomock_client(n_users: int = 500):
+    import mongomock
+    client = mongomock.MongoClient()
+    seed_learning_platform(client[config.MONGO_DB_NAME], n_users=n_users)
+    return client
+
+
+def install_standins(weather_url: Optional[str] = None, sqlite_uri: Optional[str] = None,
+                     mongo_client=None) -> None:
+    """Points the project configuration at the stand-ins. Must run before the agent modules are imported,
+    because they bind `MongoClient` at import time."""
+    if weather_url:
+        config.WEATHER_API_URL = weather_url
+        config.WEATHER_API_KEY = config.WEATHER_API_KEY or "offline-benchmark"
+    if sqlite_uri:
+        config.POSTGRES_URI = sqlite_uri
+        config.POSTGRES_ASYNC_URI = None
+    if mongo_client is not None:
+        config.MONGO_ASYNC_DRIVER = False
+        import pymongo
+        pymongo.MongoClient = lambda *args, **kwargs: mongo_client
+
+
+# --- Scripted LLM ------------------------------------------------------------------------------------------------
+
+_PERSON_PATTERN = re.compile(r"\b(?:Alice Johnson|Bob Smith|User \d+)\b")
+_CITY_PATTERN = re.compile(r"\b(?:in|at|for)\s+([A-Z][a-zA-Z]+(?:\s[A-Z][a-zA-Z]+)?)")
+
+
+def guess_route(question: str) -> str:
+    """A keyword oracle used when a benchmark does not provide the expected route of a question."""
+    text = question.lower()
+    if any(w in text for w in ("weather", "rain", "temperature", "hot", "cold", "wind", "umbrella", "jacket",
+                               "هوا", "دما", "باران")):
+        return "WeatherAPI"
+    if any(w in text for w in ("course", "lesson", "instructor", "enrolled", "progress", "student",
+                               "دوره", "درس", "مدرس")):
+        return "AILearningPlatformDB"
+    if any(w in text for w in ("product", "order", "customer", "price", "stock", "console", "headset", "mouse",
+                               "keyboard", "store", "محصول", "سفارش", "مشتری", "قیمت")):
+        return "GamingStoreDB"
+    return "end"
+
+
+def guess_city(question: str) -> str:
+    match = _CITY_PATTERN.search(question)
+    return match.group(1) if match else "Tehran"
+
+
+def _tool_names(kwargs: Dict) -> list:
+    names = []
+    for tool in kwargs.get("tools") or []:
+        if isinstance(tool, dict):
+            names.append(tool.get("function", {}).get("name") or tool.get("name"))
+        else:
+            names.append(getattr(tool, "name", None) or getattr(tool, "__name__", None))  # tools or schemas
+    return names
+
+
+def _question_of(messages) -> str:
+    # A question asked with its conversation context (`ConversationMemory.with_context`) comes last.
+    text = last_user_text(messages).removeprefix("Question: ")
+    return text.rsplit("Current question: ", 1)[-1].strip()
+
+
+def make_standin_responder(routes: Optional[Dict[str, str]] = None,
+                           plans: Optional[Dict[str, List[Tuple[str, str]]]] = None) -> Callable:
+    """Returns a responder for `ScriptedChatModel` that plays every LLM role in the project:
+
+    * the LangGraph router (answers with a route name, or a JSON plan for questions listed in `plans`),
+    * the tools router and the dispatcher in `main.py` and the OpenAI-tools specialists (one tool call, then a
+      final answer),
+    * the ReAct SQL agent (one `sql_db_query` action, then a final answer),
+    * the fan-out synthesizer (joins the specialist answers),
+    * the conversation summarizer (keeps the questions asked, up to 600 characters).
+
+    `routes` maps questions to expected routes; unknown questions fall back to `guess_route`. `plans` maps
+    multi-source questions to their (route, sub-question) steps."""
+    routes = routes or {}
+    plans = plans or {}
+
+    def route_of(question: str) -> str:
+        return routes.get(question) or guess_route(question)
+
+    def route_in_context(messages) -> str:
+        # A follow-up that names no topic of its own ("And in Paris?") goes where the previous question went.
+        route = route_of(_question_of(messages))
+        context = last_user_text(messages).rsplit("Current question: ", 1)
+        if route == "end" and len(context) == 2:
+            asked = [line for line in context[0].splitlines() if line.startswith("User: ")]
+            route = route_of(asked[-1].removeprefix("User: ")) if asked else route
+        return route
+
+    def respond(messages, kwargs):
+        tool_names = _tool_names(kwargs)
+        last = messages[-1] if messages else None
+
+        if tool_names:
+            if isinstance(last, ToolMessage):
+                return f"Based on the data: {str(last.content)[:300]}"
+            question = _question_of(messages)
+            if "get_current_weather" in tool_names:
+                name, args = "get_current_weather", {"city": guess_city(question)}
+            elif "user_enrollments" in tool_names and _PERSON_PATTERN.search(question):
+                name, args = "user_enrollments", {"user": _PERSON_PATTERN.search(question).group(0)}
+            elif "query_mongodb" in tool_names:
+                name, args = "query_mongodb", {"collection": "courses", "projection": {"_id": 0, "title": 1}}
+            elif "RouteDecision" in tool_names:
+                name, args = "RouteDecision", {"route": route_in_context(messages)}
+            else:
+                route = route_in_context(messages)
+                if route not in tool_names:
+                    return "I can only help with the gaming store, the learning platform and the weather."
+                name, args = route, {"__arg1": question}
+            return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{name}"}])
+
+        text = "\n".join(str(m.content) for m in messages)
+        if "Current summary:" in text and "New turns:" in text:
+            summary, turns = text.split("Current summary:", 1)[1].split("New turns:", 1)
+            asked = [line.removeprefix("User: ") for line in turns.splitlines() if line.startswith("User: ")]
+            summary = summary.strip()
+            return "; ".join(([summary] if summary != "(none)" else []) + asked)[-600:]
+        if "Specialist answers:" in text:
+            answers = text.split("Specialist answers:", 1)[1].strip().splitlines()
+            return "Combined answer: " + " | ".join(line.strip() for line in answers if not line.startswith("- ["))
+        if "sql_db_query" in text:
+            if text.count("Observation:") > 1:
+                return "Thought: I now know the final answer\nFinal Answer: The query returned the requested rows."
+            return ("Thought: I will query the products table directly.\nAction: sql_db_query\n"
+                    "Action Input: SELECT name, price FROM products ORDER BY price DESC LIMIT 3")
+
+        question = _question_of(messages)
+        if question in plans:
+            return json.dumps([{"route": route, "question": sub_question} for route, sub_question in plans[question]])
+        return route_in_context(messages)
+
+    return respond
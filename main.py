@@ -1,68 +1,29 @@
 from langchain_openai import ChatOpenAI
 from langchain.agents import create_openai_tools_agent, AgentExecutor
+from langchain_core.output_parsers import PydanticToolsParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import Runnable
 from langchain.tools import Tool
 
 import config
 
-from agents.mongo_agent import create_mongo_agent
-from agents.postgres_agent import create_postgres_agent
-from agents.weather_agent import create_weather_agent
+from agents.registry import AgentRegistry
+from agents.routing import ROUTE_DESCRIPTIONS, ROUTE_SEED_EXAMPLES, ROUTE_SUMMARIES, RouteDecision, render_routes
+from utils.answer_cache import create_answer_cache
+from utils.budget import BudgetCallbackHandler, BudgetExceeded, RequestBudget, invoke_agent, partial_answer
+from utils.fast_router import FastRouter, record_routing_decision
+from utils.memory import ConversationMemory, create_summary_chain
+from utils.rate_limit import get_rate_limiter
+from utils.tracing import with_tracing
 
 import logging
-from utils.logging_config import setup_logging
+from utils.logging_config import agent_executor_options, setup_logging
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
-def main():
-    logger.info("==================================")
-    logger.info("Starting new RAG agent session...")
-
-    logger.info("Initializing agents...")
-    llm = ChatOpenAI(model=config.MODEL_NAME, temperature=config.TEMPERATURE)
-
-    postgres_agent_executor = create_postgres_agent(llm)
-    mongo_agent_executor = create_mongo_agent(llm)
-    weather_agent_executor = create_weather_agent(llm)
-
-    super_agent_tools = [
-        Tool(
-            name="GamingStoreDB",
-            func=lambda q: postgres_agent_executor.invoke({"input": q}),
-            description=(
-                "This tool is designed to handle all user inquiries related to the gaming store. "
-                "It provides detailed information about the store's products, including popular gaming consoles such as PlayStation, "
-                "gaming accessories like mice, keyboards, and headsets, as well as customer-related data such as purchase history, "
-                "account information, order statuses, shipping details, and payment records. "
-                "Use this tool to answer questions about product availability, technical specifications, pricing, ongoing promotions, "
-                "customer orders, returns, cancellations, and support issues within the gaming store ecosystem."
-            )
-        ),
-        Tool(
-            name="AILearningPlatformDB",
-            func=lambda q: mongo_agent_executor.invoke({"input": q}),
-            description=(
-                "This tool specializes in providing comprehensive information about the AI learning platform. "
-                "It covers course details including titles, lesson contents, instructor information, course schedules, and enrollment options. "
-                "Additionally, it handles queries related to user profiles, course enrollments, progress tracking, certification statuses, "
-                "and feedback or ratings. Use this tool to answer questions about course availability, curriculum content, instructor expertise, "
-                "student progress, and administrative details within the AI education platform."
-            )
-        ),
-        Tool(
-            name="WeatherAPI",
-            func=lambda q: weather_agent_executor.invoke({"input": q}),
-            description=(
-                "This tool is dedicated to providing accurate and real-time weather information for any specified city worldwide. "
-                "It retrieves current weather conditions including temperature, humidity, wind speed, and descriptive weather states such as rain or sunshine. "
-                "Use this tool to obtain up-to-date weather forecasts, alerts, and climate-related data to assist users in planning their activities accordingly."
-            )
-        ),
-    ]
-
-    ROUTER_SYSTEM_MESSAGE = """
+ROUTER_SYSTEM_MESSAGE = """
     You are a specialized routing agent responsible for analyzing the user's input question and determining the most appropriate tool from the available set to handle the query.
 
     Your primary role is to act as a dispatcher — do not attempt to answer the question yourself. Instead, carefully interpret the user's intent and context to select the single best-suited tool that can provide an accurate and relevant response.
@@ -74,29 +35,190 @@ def main():
     - Avoid providing any direct answers or commentary yourself.
 
     Available tools:
-    - GamingStoreDB: Handles inquiries about the gaming store products, customers, orders, and related data.
-    - AILearningPlatformDB: Handles queries regarding AI courses, lessons, instructors, user enrollments, and progress.
-    - WeatherAPI: Provides real-time weather information for specified locations.
+{routes}
 
     Your goal is to optimize user satisfaction by effectively routing questions to the appropriate expert tool.
-    
+
     Do not try to force a tool to fit an irrelevant question.
     """
 
+DISPATCH_SYSTEM_MESSAGE = """
+    You are a routing agent. Decide which specialist should answer the user's question and call `RouteDecision`
+    with its name. Do not answer the question yourself.
+
+    Specialists:
+{routes}
+
+    Do not try to force a specialist to fit an irrelevant question: if none of them is relevant, choose 'end'.
+    """
+
+NO_ROUTE_ANSWER = "I can only answer questions about the gaming store, the AI learning platform and the weather."
+
+
+def build_router_agent(llm, registry: AgentRegistry) -> AgentExecutor:
+    """The tools-calling router agent: one tool per specialist, each delegating to the registry's agent."""
+    super_agent_tools = [
+        Tool(
+            name="GamingStoreDB",
+            func=lambda q: registry.get("GamingStoreDB").invoke({"input": q}),
+            description=ROUTE_SUMMARIES["GamingStoreDB"]
+        ),
+        Tool(
+            name="AILearningPlatformDB",
+            func=lambda q: registry.get("AILearningPlatformDB").invoke({"input": q}),
+            description=ROUTE_SUMMARIES["AILearningPlatformDB"]
+        ),
+        Tool(
+            name="WeatherAPI",
+            func=lambda q: registry.get("WeatherAPI").invoke({"input": q}),
+            description=ROUTE_SUMMARIES["WeatherAPI"]
+        ),
+    ]
+
     router_prompt = ChatPromptTemplate.from_messages([
         ("system", ROUTER_SYSTEM_MESSAGE),
         ("user", "{input}"),
         MessagesPlaceholder(variable_name="agent_scratchpad"),
-    ])
+    ]).partial(routes=render_routes())
     router_agent = create_openai_tools_agent(llm=llm, tools=super_agent_tools, prompt=router_prompt)
 
-    main_agent_executor = AgentExecutor(
+    return AgentExecutor(
         agent=router_agent,
         tools=super_agent_tools,
-        verbose=True,
-        handle_parsing_errors=True
+        handle_parsing_errors=True,
+        return_intermediate_steps=True,
+        max_iterations=config.ROUTER_AGENT_MAX_ITERATIONS,
+        **agent_executor_options()
     )
 
+
+def build_dispatcher(llm) -> Runnable:
+    """A single LLM call that returns the `RouteDecision` for a question. The tool call is forced rather than
+    using `with_structured_output`'s default JSON-schema mode, which gpt-3.5-turbo does not support."""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", DISPATCH_SYSTEM_MESSAGE),
+        ("user", "{input}"),
+    ]).partial(routes=render_routes())
+    return (prompt | llm.bind_tools([RouteDecision], tool_choice="RouteDecision")
+            | PydanticToolsParser(tools=[RouteDecision], first_tool_only=True))
+
+
+class RouterSession:
+    """Answers questions the way the interactive session does: answer cache first, then the fast router, and
+    the LLM router only for questions the fast router is not sure about.
+
+    The LLM router works in one of two modes:
+    * "agent": a tools-calling agent whose tools are the specialists; it makes one more LLM call after the
+      specialist has answered, to restate its answer,
+    * "dispatch": one structured-output call picks the specialist, whose answer is returned as it is.
+
+    With a `memory`, the questions are turns of one conversation: the router and the specialist get each question
+    with its context from the earlier turns, and only the first question goes through the answer cache."""
+
+    def __init__(self, llm, answer_cache=None, fast_router=None, mode: str = "dispatch",
+                 memory: ConversationMemory = None):
+        if mode not in ("agent", "dispatch"):
+            raise ValueError(f"Unknown router mode '{mode}'; expected 'agent' or 'dispatch'.")
+        # Specialists are built on first use, so a session that only asks about the weather never connects to the databases.
+        self.registry = AgentRegistry(lambda: llm)
+        self.mode = mode
+        self.router_agent = build_router_agent(llm, self.registry) if mode == "agent" else None
+        self.dispatcher = build_dispatcher(llm) if mode == "dispatch" else None
+        self.answer_cache = answer_cache
+        self.fast_router = fast_router
+        self.memory = memory
+        self.summarizer = create_summary_chain(llm) if memory is not None else None
+
+    def _dispatch(self, question: str, agent_input: str, budget: RequestBudget, run_config: dict) -> str:
+        decision = self.dispatcher.invoke({"input": agent_input},
+                                          config=BudgetCallbackHandler(budget).config(run_config))
+        route = decision.route if decision is not None else "end"
+        logger.info(f"Dispatcher routed the question to '{route}'.")
+        record_routing_decision(config.ROUTING_LOG_PATH, question, route)
+        return route
+
+    def answer(self, question: str, run_config: dict = None, budget: RequestBudget = None) -> dict:
+        """Returns the agent response for the question (a dict with at least `output`). The router and the
+        specialist share `budget` (by default the one configured in `config.py`); when it runs out, `output` is
+        a partial answer and `budget_exhausted` names the limit."""
+        run_config = with_tracing(run_config)
+        budget = budget or RequestBudget.from_config()
+        response, route = self._answer(question, budget, run_config)
+        if self.memory is not None:
+            self._remember(question, response.get("output"), route, budget, run_config)
+        return response
+
+    def _answer(self, question: str, budget: RequestBudget, run_config: dict):
+        # Returns the response and the route that answered it.
+        memory = self.memory if self.memory is not None else ConversationMemory()
+        follow_up = bool(memory)  # its answer depends on the conversation, so it is neither read from nor cached
+        cached = self.answer_cache.get(question) if self.answer_cache and not follow_up else None
+        if cached is not None:
+            logger.info(f"Answer cache hit (route '{cached.route}').")
+            return {"output": cached.answer}, cached.route
+
+        route = self.fast_router.route(question) if self.fast_router else None
+        if route is not None:
+            logger.info(f"Fast router dispatched directly to '{route}'.")
+        elif self.dispatcher is not None:
+            try:
+                route = self._dispatch(question, memory.with_context(question), budget, run_config)
+            except BudgetExceeded as e:
+                return {"output": partial_answer(e.limit), "budget_exhausted": e.limit}, None
+            if route not in self.registry:
+                return {"output": NO_ROUTE_ANSWER}, "end"
+
+        if route is not None:
+            response, exhausted = invoke_agent(self.registry.get(route),
+                                               {"input": memory.with_context(question, route)}, budget, run_config)
+        else:
+            response, exhausted = invoke_agent(self.router_agent, {"input": memory.with_context(question)}, budget,
+                                               run_config)
+            steps = response.get("intermediate_steps") or []
+            if steps:
+                route = steps[0][0].tool
+                record_routing_decision(config.ROUTING_LOG_PATH, question, route)
+        if exhausted:
+            logger.warning(f"Question stopped early by its budget: {budget.usage()}")
+            return {**response, "budget_exhausted": exhausted}, route
+        if self.answer_cache and route in self.registry and not follow_up:
+            self.answer_cache.put(question, response.get("output"), route)
+        return response, route
+
+    def _remember(self, question: str, answer: str, route: str, budget: RequestBudget, run_config: dict) -> None:
+        self.memory.add_turn(question, answer, route)
+        if not self.memory.needs_summary():
+            return
+        transcript, summary = self.memory.take_oldest(), None
+        if not budget.exhausted:  # otherwise the old turns are kept as they are (see `fold_in`)
+            try:
+                summary = self.summarizer.invoke(self.memory.summary_input(transcript),
+                                                 config=BudgetCallbackHandler(budget).config(run_config))
+            except BudgetExceeded:
+                pass
+        self.memory.fold_in(transcript, summary)
+
+
+def create_session(llm=None, mode: str = None) -> RouterSession:
+    """Builds a session from the configuration (`llm` replaces the OpenAI chat model, e.g. in benchmarks, and
+    `mode` the configured ROUTER_MODE). With MEMORY_ENABLED its questions are turns of one conversation."""
+    llm = llm or ChatOpenAI(model=config.MODEL_NAME, temperature=config.TEMPERATURE, rate_limiter=get_rate_limiter())
+    fast_router = None
+    if config.FAST_ROUTER_ENABLED:
+        fast_router = FastRouter.from_descriptions(ROUTE_DESCRIPTIONS, ROUTE_SEED_EXAMPLES,
+                                                   log_path=config.ROUTING_LOG_PATH,
+                                                   threshold=config.FAST_ROUTER_THRESHOLD)
+    memory = ConversationMemory.from_config() if config.MEMORY_ENABLED else None
+    return RouterSession(llm, create_answer_cache(config), fast_router, mode or config.ROUTER_MODE, memory)
+
+
+def main():
+    logger.info("==================================")
+    logger.info("Starting new RAG agent session...")
+
+    logger.info("Initializing agents...")
+    session = create_session()
+
     logger.info("Main router agent is ready!")
     while True:
         question = input("Ask your question: ... (type 'exit' to quit) : ")
@@ -107,7 +229,7 @@ def main():
 
         logger.info(f"Received user question: '{question}'")
         try:
-            response = main_agent_executor.invoke({"input": question})
+            response = session.answer(question)
             logger.info(f"Agent generated response successfully.")
 
             print("\nAgent Response:")
@@ -1,60 +1,79 @@
 import os
+import asyncio
 import logging
-from typing import TypedDict, Literal
+import threading
+import uuid
+from typing import Annotated, List, Optional, TypedDict
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
+from langgraph.types import Send
 
 import config
-from agents.mongo_agent import create_mongo_agent
-from agents.postgres_agent import create_postgres_agent
-from agents.weather_agent import create_weather_agent
+from agents.registry import AgentRegistry
+from agents.routing import ROUTE_DESCRIPTIONS, ROUTE_SEED_EXAMPLES, parse_route_plan, render_routes
+from utils.answer_cache import create_answer_cache
+from utils.budget import (LIMIT_DESCRIPTIONS, BudgetCallbackHandler, BudgetExceeded, RequestBudget, ainvoke_agent,
+                          budget_of, invoke_agent, partial_answer, with_budget)
+from utils.fast_router import FastRouter, record_routing_decision
 from utils.logging_config import setup_logging
+from utils.memory import ConversationMemory, create_checkpointer, create_summary_chain
+from utils.prompts import current_question
+from utils.rate_limit import get_rate_limiter
+from utils.speculation import Speculation, Speculator, detect_city
+from utils.tracing import traced_node, with_tracing
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
+def _collect_outcomes(left: Optional[List[dict]], right: Optional[List[dict]]) -> List[dict]:
+    # None clears the outcomes of the session's previous question (see `_new_question`).
+    if right is None:
+        return []
+    return (left or []) + right
+
+
 class GraphState(TypedDict):
     input: str
     agent_outcome: str
-    next_agent: Literal["PostgresAgent", "MongoAgent", "WeatherAgent", "end"]
-
-
-logger.info("Initializing specialist agents...")
-llm = ChatOpenAI(model=config.MODEL_NAME, temperature=config.TEMPERATURE)
-postgres_agent_executor = create_postgres_agent(llm)
-mongo_agent_executor = create_mongo_agent(llm)
-weather_agent_executor = create_weather_agent(llm)
-
-agent_executors = {
-    "GamingStoreDB": postgres_agent_executor,
-    "AILearningPlatformDB": mongo_agent_executor,
-    "WeatherAPI": weather_agent_executor,
-}
-logger.info("Specialist agents and tools are ready.")
+    next_agent: str
+    # One {"route", "question"} step per specialist the router chose; several steps run as parallel branches
+    # whose results are collected in `branch_outcomes` and merged by the synthesizer. `next_agent` is then the
+    # routes joined with "+" (e.g. "WeatherAPI+GamingStoreDB"); otherwise it is a single route name or "end".
+    plan: List[dict]
+    branch_outcomes: Annotated[List[dict], _collect_outcomes]
+    # The limit of the request's budget (passed in the run config, see `utils.budget.with_budget`) that stopped it
+    # early, if any.
+    budget_exhausted: Optional[str]
+    # The conversation so far (see `utils.memory.ConversationMemory`): recent turns and a summary of the older ones,
+    # carried from question to question by the checkpointer of `get_session_app`.
+    history: List[dict]
+    summary: str
+    # The id of a speculative specialist run (see `utils.speculation`) the router agreed with, for call_tool_node
+    # to use instead of running the specialist itself.
+    speculation: Optional[str]
 
 
-def router_node(state: GraphState):
-    logger.info("---ROUTER NODE---")
-
-    ROUTER_SYSTEM_MESSAGE = """
+ROUTER_SYSTEM_MESSAGE = """
     You are a specialized routing agent responsible for analyzing the user's input question and determining the most appropriate tool from the available set to handle the query.
 
     Your primary role is to act as a dispatcher — do not attempt to answer the question yourself. Instead, carefully interpret the user's intent and context to select the single best-suited tool that can provide an accurate and relevant response.
 
     Make sure to:
     - Understand the domain and capabilities of each tool.
-    - Choose only one tool per user query.
+    - Choose only one tool whenever a single tool can answer the whole query, and output just its name.
     - Forward the user's input as-is to the selected tool without modification.
     - Avoid providing any direct answers or commentary yourself.
 
+    Only if the question combines parts that need different tools, output a JSON list instead, with one object
+    per tool holding the part of the question that tool must answer, for example:
+    [{{"route": "WeatherAPI", "question": "What's the weather in Tehran?"}}, {{"route": "AILearningPlatformDB", "question": "Which course is Alice furthest along in?"}}]
+
     Available tools:
-    - GamingStoreDB: Handles inquiries about the gaming store products, customers, orders, and related data.
-    - AILearningPlatformDB: Handles queries regarding AI courses, lessons, instructors, user enrollments, and progress.
-    - WeatherAPI: Provides real-time weather information for specified locations.
+{routes}
 
     Your goal is to optimize user satisfaction by effectively routing questions to the appropriate expert tool.
 
@@ -62,62 +81,661 @@ def router_node(state: GraphState):
     If the question is not relevant to any of these tools, you must output 'end'.
     """
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system",ROUTER_SYSTEM_MESSAGE),
-        ("user", "Question: {input}")
-    ])
-    router_chain = prompt | llm | StrOutputParser()
-    next_agent_name = router_chain.invoke({"input": state["input"]})
-    logger.info(f"Router decided the next agent is: '{next_agent_name}'")
-    return {"next_agent": next_agent_name}
+ROUTER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", ROUTER_SYSTEM_MESSAGE),
+    ("user", "Question: {input}")
+]).partial(routes=render_routes())
+
+SYNTHESIZER_SYSTEM_MESSAGE = """
+    You combine the answers of several specialist agents into a single reply to the user's question.
+    Use only the information in the specialist answers and keep the reply concise.
+    If a specialist reported an error or could not answer its part, say so for that part instead of guessing.
+    """
+
+SYNTHESIZER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SYNTHESIZER_SYSTEM_MESSAGE),
+    ("user", "Question: {input}\n\nSpecialist answers:\n{answers}")
+])
+
+
+def _create_llm():
+    # Imported here so that importing this module does not pull in the OpenAI client.
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=config.MODEL_NAME, temperature=config.TEMPERATURE, rate_limiter=get_rate_limiter())
+
+
+# Nothing below is built at import time: the LLM and every specialist are created on first use and then
+# reused for the life of the process, as are the router chain, the fast router and the compiled graph.
+registry = AgentRegistry(_create_llm)
+
+_lazy_lock = threading.Lock()
+_router_chain = None
+_synthesizer_chain = None
+_summary_chain = None
+_fast_router = None
+_fast_router_loaded = False
+_answer_cache = None
+_answer_cache_loaded = False
+_speculator = None
+_app = None
+_session_app = None
+
+
+def set_llm(llm) -> None:
+    """Replaces the chat model used by the router and all specialists (e.g. with a stub for benchmarks).
+    Any agents and chains already built with the previous model are discarded."""
+    global _router_chain, _synthesizer_chain, _summary_chain
+    with _lazy_lock:
+        registry.reset(lambda: llm)
+        _router_chain = _synthesizer_chain = _summary_chain = None
+
+
+def get_router_chain():
+    global _router_chain
+    if _router_chain is None:
+        with _lazy_lock:
+            if _router_chain is None:
+                _router_chain = ROUTER_PROMPT | registry.llm | StrOutputParser()
+    return _router_chain
+
+
+def get_synthesizer_chain():
+    global _synthesizer_chain
+    if _synthesizer_chain is None:
+        with _lazy_lock:
+            if _synthesizer_chain is None:
+                _synthesizer_chain = SYNTHESIZER_PROMPT | registry.llm | StrOutputParser()
+    return _synthesizer_chain
+
+
+def get_summary_chain():
+    global _summary_chain
+    if _summary_chain is None:
+        with _lazy_lock:
+            if _summary_chain is None:
+                _summary_chain = create_summary_chain(registry.llm)
+    return _summary_chain
+
+
+def get_fast_router():
+    global _fast_router, _fast_router_loaded
+    if not _fast_router_loaded:
+        with _lazy_lock:
+            if not _fast_router_loaded:
+                if config.FAST_ROUTER_ENABLED:
+                    _fast_router = FastRouter.from_descriptions(ROUTE_DESCRIPTIONS, ROUTE_SEED_EXAMPLES,
+                                                                log_path=config.ROUTING_LOG_PATH,
+                                                                threshold=config.FAST_ROUTER_THRESHOLD)
+                _fast_router_loaded = True
+    return _fast_router
+
+
+def reset_fast_router() -> None:
+    """Drops the fast router, so that the next question builds it again from the current configuration."""
+    global _fast_router, _fast_router_loaded
+    with _lazy_lock:
+        _fast_router, _fast_router_loaded = None, False
+
+
+def get_answer_cache():
+    global _answer_cache, _answer_cache_loaded
+    if not _answer_cache_loaded:
+        with _lazy_lock:
+            if not _answer_cache_loaded:
+                _answer_cache = create_answer_cache(config)
+                _answer_cache_loaded = True
+    return _answer_cache
+
+
+def set_answer_cache(cache) -> None:
+    """Replaces the answer cache built from the configuration (None disables caching)."""
+    global _answer_cache, _answer_cache_loaded
+    with _lazy_lock:
+        _answer_cache, _answer_cache_loaded = cache, True
+
+
+def get_speculator() -> Speculator:
+    global _speculator
+    if _speculator is None:
+        with _lazy_lock:
+            if _speculator is None:
+                _speculator = Speculator(config.SPECULATION_MAX_IN_FLIGHT, config.SPECULATION_MAX_LLM_CALLS,
+                                         config.SPECULATION_MAX_TOKENS)
+    return _speculator
+
+
+def set_speculator(speculator: Speculator) -> None:
+    """Replaces the speculator built from the configuration (e.g. to start its statistics afresh)."""
+    global _speculator
+    with _lazy_lock:
+        _speculator = speculator
+
+
+def cached_answer(question: str):
+    """Returns a final-state dict for a cached answer to the question, or None on a cache miss."""
+    cache = get_answer_cache()
+    entry = cache.get(question) if cache is not None else None
+    if entry is None:
+        return None
+    logger.info(f"Answer cache hit for question: '{question}' (route '{entry.route}')")
+    return {"input": question, "next_agent": entry.route, "agent_outcome": entry.answer, "cached": True}
+
+
+def cache_answer(question: str, route: str, answer: str) -> None:
+    """Stores a freshly generated answer in the answer cache (error outcomes are never cached)."""
+    cache = get_answer_cache()
+    routes = route.split("+") if route else []
+    if cache is None or not routes or any(r not in registry for r in routes) or not answer \
+            or answer.startswith("Error"):
+        return
+    # A fan-out answer is only as fresh as its most short-lived part.
+    cache.put(question, answer, min(routes, key=lambda r: cache.route_ttls.get(r, 0)))
+
+
+def _fast_plan(question: str):
+    fast_router = get_fast_router()
+    if fast_router is None:
+        return None
+    plan = fast_router.plan(question)
+    if plan is None:
+        return None
+    logger.info(f"Fast router planned: {plan}")
+    return [{"route": route, "question": sub_question} for route, sub_question in plan]
+
+
+def _plan_state(plan: List[dict]) -> dict:
+    return {"next_agent": "+".join(step["route"] for step in plan), "plan": plan}
+
+
+def _llm_plan(question: str, output: str):
+    plan = parse_route_plan(output, question, registry.names)
+    logger.info(f"Router decided the next agent(s): {[step['route'] for step in plan] or output.strip()}")
+    if output.strip() == "end":
+        record_routing_decision(config.ROUTING_LOG_PATH, question, "end")
+    for step in plan:
+        record_routing_decision(config.ROUTING_LOG_PATH, step["question"], step["route"])
+    if not plan:
+        # Keeps an unknown route name visible, so that call_tool_node reports it.
+        return {"next_agent": output.strip(), "plan": []}
+    return _plan_state(plan)
+
+
+def _new_question() -> dict:
+    # In a session the state carries over from the previous question: clear what belonged to that question.
+    return {"plan": [], "branch_outcomes": None, "agent_outcome": None, "budget_exhausted": None,
+            "speculation": None}
+
+
+def _memory(state: GraphState) -> ConversationMemory:
+    return ConversationMemory.from_config(state.get("history"), state.get("summary"))
+
+
+def _out_of_budget(limit: str) -> dict:
+    return {**_new_question(), "next_agent": "end", "agent_outcome": partial_answer(limit),
+            "budget_exhausted": limit}
+
+
+def _speculation_target(state: GraphState):
+    """(route, agent input) of the specialist the fast router expects, when it is likely enough to start it (or
+    its prefetch) before the LLM router has decided; None otherwise."""
+    fast_router = get_fast_router()
+    if config.SPECULATION_MODE not in ("prefetch", "specialist") or fast_router is None:
+        return None
+    route, confidence = fast_router.predict(state["input"])
+    if route not in registry or confidence < config.SPECULATION_MIN_CONFIDENCE:
+        return None
+    return route, _memory(state).with_context(state["input"], route)
+
+
+def _speculative_config(route: str) -> dict:
+    # The speculative run is a trace of its own: its spans are not part of the request unless it is used.
+    return with_tracing({"run_name": f"speculative {route}", "metadata": {"speculative": True}})
+
+
+def _run_speculation(speculation: Speculation):
+    return invoke_agent(registry.get(speculation.route), {"input": speculation.agent_input}, speculation.budget,
+                        _speculative_config(speculation.route))
+
+
+async def _arun_speculation(speculation: Speculation):
+    agent = await registry.aget(speculation.route)
+    return await ainvoke_agent(agent, {"input": speculation.agent_input}, speculation.budget,
+                               _speculative_config(speculation.route))
+
+
+def _prefetch(speculation: Speculation) -> None:
+    # Building the agent connects to its database and loads its schema; the weather agent's city is fetched into
+    # the weather client's cache, where the agent's tool call finds it.
+    try:
+        registry.get(speculation.route)
+        city = detect_city(current_question(speculation.agent_input)) if speculation.route == "WeatherAPI" else None
+        if city:
+            from agents.weather_client import get_weather_client
+            get_weather_client().get(city)
+    except Exception as e:
+        logger.info(f"Prefetch for '{speculation.route}' failed: {e}")
+
+
+async def _aprefetch(speculation: Speculation) -> None:
+    try:
+        await registry.aget(speculation.route)
+        city = detect_city(current_question(speculation.agent_input)) if speculation.route == "WeatherAPI" else None
+        if city:
+            from agents.weather_client import get_weather_client
+            await get_weather_client().aget(city)
+    except Exception as e:
+        logger.info(f"Prefetch for '{speculation.route}' failed: {e}")
+
+
+def _speculate(state: GraphState, budget: RequestBudget) -> Optional[Speculation]:
+    target = _speculation_target(state)
+    if target is None:
+        return None
+    run = _run_speculation if config.SPECULATION_MODE == "specialist" else _prefetch
+    return get_speculator().start(config.SPECULATION_MODE, *target, budget, run)
+
+
+def _aspeculate(state: GraphState, budget: RequestBudget) -> Optional[Speculation]:
+    target = _speculation_target(state)
+    if target is None:
+        return None
+    run = _arun_speculation if config.SPECULATION_MODE == "specialist" else _aprefetch
+    return get_speculator().astart(config.SPECULATION_MODE, *target, budget, run)
+
+
+def _resolve_speculation(speculation: Optional[Speculation], update: Optional[dict]) -> Optional[str]:
+    # Only a single specialist can use the speculative run; a fan-out, 'end' or an error cancels it.
+    plan = (update or {}).get("plan") or []
+    return get_speculator().resolve(speculation, plan[0]["route"] if len(plan) == 1 else None)
+
+
+def _claim_speculation(state: GraphState, route: str, agent_input: str) -> Optional[Speculation]:
+    return get_speculator().claim(state.get("speculation"), route, agent_input) if state.get("speculation") else None
+
+
+def router_node(state: GraphState, config: RunnableConfig):
+    logger.info("---ROUTER NODE---")
+    budget = budget_of(config)
 
-def call_tool_node(state: GraphState):
+    plan = _fast_plan(state["input"])
+    if plan is not None:
+        return {**_new_question(), **_plan_state(plan)}
+
+    # The likely specialist gets a head start while the LLM router decides.
+    speculation, update = _speculate(state, budget), None
+    try:
+        output = get_router_chain().invoke({"input": _memory(state).with_context(state["input"])},
+                                           config=BudgetCallbackHandler(budget).config())
+        update = {**_new_question(), **_llm_plan(state["input"], output)}
+    except BudgetExceeded as e:
+        update = _out_of_budget(e.limit)
+    finally:
+        speculation_id = _resolve_speculation(speculation, update)
+    return {**update, "speculation": speculation_id}
+
+
+async def arouter_node(state: GraphState, config: RunnableConfig):
+    logger.info("---ROUTER NODE (async)---")
+    budget = budget_of(config)
+
+    plan = _fast_plan(state["input"])
+    if plan is not None:
+        return {**_new_question(), **_plan_state(plan)}
+
+    speculation, update = _aspeculate(state, budget), None
+    try:
+        output = await asyncio.wait_for(
+            get_router_chain().ainvoke({"input": _memory(state).with_context(state["input"])},
+                                       config=BudgetCallbackHandler(budget).config()),
+            timeout=budget.remaining_time())
+        update = {**_new_question(), **_llm_plan(state["input"], output)}
+    except asyncio.TimeoutError:
+        budget.mark_exhausted("deadline")
+        update = _out_of_budget("deadline")
+    except BudgetExceeded as e:
+        update = _out_of_budget(e.limit)
+    finally:
+        speculation_id = _resolve_speculation(speculation, update)
+    return {**update, "speculation": speculation_id}
+
+
+def call_tool_node(state: GraphState, config: RunnableConfig):
     logger.info(f"---CALLING AGENT: {state['next_agent']}---")
     agent_name = state["next_agent"]
-    selected_agent_executor = agent_executors.get(agent_name)
-    if selected_agent_executor is None:
+    if agent_name not in registry:
         error_message = f"Error: Agent '{agent_name}' not found."
         logger.error(error_message)
         return {"agent_outcome": error_message}
-    response = selected_agent_executor.invoke({"input": state["input"]})
+    agent_input = _memory(state).with_context(state["input"], agent_name)
+    budget = budget_of(config)
+    speculation = _claim_speculation(state, agent_name, agent_input)
+    result = get_speculator().result(speculation, budget) if speculation is not None else None
+    response, exhausted = result or invoke_agent(registry.get(agent_name), {"input": agent_input}, budget)
     agent_output = response.get("output", "Error: No output from agent.")
     logger.info(f"Agent '{agent_name}' produced output.")
-    return {"agent_outcome": agent_output}
+    return {"agent_outcome": agent_output, "budget_exhausted": exhausted}
+
+
+async def acall_tool_node(state: GraphState, config: RunnableConfig):
+    logger.info(f"---CALLING AGENT (async): {state['next_agent']}---")
+    agent_name = state["next_agent"]
+    if agent_name not in registry:
+        error_message = f"Error: Agent '{agent_name}' not found."
+        logger.error(error_message)
+        return {"agent_outcome": error_message}
+    agent_input = _memory(state).with_context(state["input"], agent_name)
+    budget = budget_of(config)
+    speculation = _claim_speculation(state, agent_name, agent_input)
+    result = await get_speculator().aresult(speculation, budget) if speculation is not None else None
+    if result is None:
+        result = await ainvoke_agent(await registry.aget(agent_name), {"input": agent_input}, budget)
+    response, exhausted = result
+    agent_output = response.get("output", "Error: No output from agent.")
+    logger.info(f"Agent '{agent_name}' produced output.")
+    return {"agent_outcome": agent_output, "budget_exhausted": exhausted}
+
+
+def run_branch(route: str, question: str, budget: RequestBudget, agent_input: str = None) -> dict:
+    """Runs one specialist on its sub-question (sent as `agent_input` when that adds conversation context);
+    failures become an error answer instead of failing the graph, and running out of budget a partial one."""
+    try:
+        response, exhausted = invoke_agent(registry.get(route), {"input": agent_input or question}, budget)
+        answer = response.get("output", "Error: No output from agent.")
+    except Exception as e:
+        logger.error(f"Agent '{route}' failed in a parallel branch: {e}", exc_info=True)
+        answer, exhausted = f"Error: {e}", None
+    return {"route": route, "question": question, "answer": answer, "budget_exhausted": exhausted}
+
+
+async def arun_branch(route: str, question: str, budget: RequestBudget, agent_input: str = None) -> dict:
+    try:
+        agent = await registry.aget(route)
+        response, exhausted = await ainvoke_agent(agent, {"input": agent_input or question}, budget)
+        answer = response.get("output", "Error: No output from agent.")
+    except Exception as e:
+        logger.error(f"Agent '{route}' failed in a parallel branch: {e}", exc_info=True)
+        answer, exhausted = f"Error: {e}", None
+    return {"route": route, "question": question, "answer": answer, "budget_exhausted": exhausted}
+
+
+def branch_node(step: dict, config: RunnableConfig):
+    logger.info(f"---CALLING AGENT (branch): {step['route']}---")
+    return {"branch_outcomes": [run_branch(step["route"], step["question"], budget_of(config), step.get("input"))]}
+
+
+async def abranch_node(step: dict, config: RunnableConfig):
+    logger.info(f"---CALLING AGENT (branch, async): {step['route']}---")
+    return {"branch_outcomes": [await arun_branch(step["route"], step["question"], budget_of(config),
+                                                  step.get("input"))]}
+
+
+def _format_answers(outcomes: List[dict]) -> str:
+    return "\n".join(f"- [{o['route']}] {o['question']}\n  {o['answer']}" for o in outcomes)
+
+
+def _synthesizer_input(question: str, outcomes: List[dict]) -> dict:
+    return {"input": question, "answers": _format_answers(outcomes)}
+
+
+def synthesize(question: str, outcomes: List[dict], run_config: RunnableConfig = None) -> str:
+    """Merges the branch answers into one reply to the original question."""
+    return get_synthesizer_chain().invoke(_synthesizer_input(question, outcomes), config=run_config)
+
+
+async def asynthesize(question: str, outcomes: List[dict], run_config: RunnableConfig = None) -> str:
+    return await get_synthesizer_chain().ainvoke(_synthesizer_input(question, outcomes), config=run_config)
+
+
+def _branch_limit(outcomes: List[dict]):
+    # A branch stopped by its own agent's step limit leaves the shared budget usable for the merge.
+    return next((o["budget_exhausted"] for o in outcomes if o.get("budget_exhausted")), None)
+
+
+def _unmerged_answers(limit: str, outcomes: List[dict]) -> dict:
+    # Out of budget: the branch answers as they are, without the synthesizer's LLM call.
+    return {"agent_outcome": f"Stopped early: the request reached its {LIMIT_DESCRIPTIONS.get(limit, limit)}. "
+                             f"The specialists answered:\n{_format_answers(outcomes)}",
+            "budget_exhausted": limit}
+
+
+def synthesizer_node(state: GraphState, config: RunnableConfig):
+    logger.info(f"---SYNTHESIZER: merging {len(state['branch_outcomes'])} answers---")
+    budget = budget_of(config)
+    if budget.exhausted:
+        return _unmerged_answers(budget.exhausted, state["branch_outcomes"])
+    try:
+        return {"agent_outcome": synthesize(state["input"], state["branch_outcomes"],
+                                            BudgetCallbackHandler(budget).config()),
+                "budget_exhausted": _branch_limit(state["branch_outcomes"])}
+    except BudgetExceeded as e:
+        return _unmerged_answers(e.limit, state["branch_outcomes"])
+
+
+async def asynthesizer_node(state: GraphState, config: RunnableConfig):
+    logger.info(f"---SYNTHESIZER (async): merging {len(state['branch_outcomes'])} answers---")
+    budget = budget_of(config)
+    if budget.exhausted:
+        return _unmerged_answers(budget.exhausted, state["branch_outcomes"])
+    try:
+        return {"agent_outcome": await asyncio.wait_for(
+            asynthesize(state["input"], state["branch_outcomes"], BudgetCallbackHandler(budget).config()),
+            timeout=budget.remaining_time()), "budget_exhausted": _branch_limit(state["branch_outcomes"])}
+    except asyncio.TimeoutError:
+        budget.mark_exhausted("deadline")
+        return _unmerged_answers("deadline", state["branch_outcomes"])
+    except BudgetExceeded as e:
+        return _unmerged_answers(e.limit, state["branch_outcomes"])
+
+
+def _add_turn(state: GraphState) -> ConversationMemory:
+    memory = _memory(state)
+    memory.add_turn(state["input"], state.get("agent_outcome"), state.get("next_agent"))
+    return memory
+
+
+def memory_node(state: GraphState, config: RunnableConfig):
+    logger.info("---MEMORY: recording the turn---")
+    memory = _add_turn(state)
+    if memory.needs_summary():
+        transcript, budget, summary = memory.take_oldest(), budget_of(config), None
+        if not budget.exhausted:  # otherwise the old turns are kept as they are (see `fold_in`)
+            try:
+                summary = get_summary_chain().invoke(memory.summary_input(transcript),
+                                                     config=BudgetCallbackHandler(budget).config())
+            except BudgetExceeded:
+                pass
+        memory.fold_in(transcript, summary)
+    return {"history": memory.history, "summary": memory.summary}
+
+
+async def amemory_node(state: GraphState, config: RunnableConfig):
+    logger.info("---MEMORY (async): recording the turn---")
+    memory = _add_turn(state)
+    if memory.needs_summary():
+        transcript, budget, summary = memory.take_oldest(), budget_of(config), None
+        if not budget.exhausted:
+            try:
+                summary = await asyncio.wait_for(
+                    get_summary_chain().ainvoke(memory.summary_input(transcript),
+                                                config=BudgetCallbackHandler(budget).config()),
+                    timeout=budget.remaining_time())
+            except (asyncio.TimeoutError, BudgetExceeded):
+                pass
+        memory.fold_in(transcript, summary)
+    return {"history": memory.history, "summary": memory.summary}
 
 
 def where_to_go(state: GraphState):
     next_agent_name = state.get("next_agent", "end")
     logger.info(f"---CONDITIONAL EDGE: Deciding based on '{next_agent_name}'---")
+    plan = state.get("plan") or []
+    if len(plan) > 1:
+        logger.info(f"Decision: Fan out to {len(plan)} agents in parallel.")
+        memory = _memory(state)
+        return [Send("branch", {**step, "input": memory.with_context(step["question"], step["route"])})
+                for step in plan]
     if next_agent_name == "end":
-        logger.info("Decision: End of graph.")
-        return END
+        logger.info("Decision: No agent to call.")
+        return "memory"
     else:
         logger.info(f"Decision: Route to call_tool_node for agent '{next_agent_name}'.")
         return "call_tool_node"
 
-workflow = StateGraph(GraphState)
 
-workflow.add_node("router", router_node)
-workflow.add_node("call_tool_node", call_tool_node)
-workflow.set_entry_point("router")
+def build_graph(checkpointer=None):
+    workflow = StateGraph(GraphState)
+
+    # Every node has a sync and an async implementation, so the same graph serves `invoke` and `ainvoke`;
+    # `traced_node` records a span for each execution.
+    workflow.add_node("router", traced_node(router_node, arouter_node))
+    workflow.add_node("call_tool_node", traced_node(call_tool_node, acall_tool_node))
+    workflow.add_node("branch", traced_node(branch_node, abranch_node))
+    workflow.add_node("synthesizer", traced_node(synthesizer_node, asynthesizer_node))
+    workflow.add_node("memory", traced_node(memory_node, amemory_node))
+    workflow.set_entry_point("router")
+
+    workflow.add_conditional_edges("router", where_to_go, ["call_tool_node", "branch", "memory"])
+
+    workflow.add_edge("call_tool_node", "memory")
+    # Fan-in: the synthesizer runs once, after every branch sent by `where_to_go` has finished.
+    workflow.add_edge("branch", "synthesizer")
+    workflow.add_edge("synthesizer", "memory")
+    # Every question ends by adding its turn to the conversation memory (kept only with a checkpointer).
+    workflow.add_edge("memory", END)
+    compiled = workflow.compile(checkpointer=checkpointer)
+    logger.info("LangGraph workflow has been compiled successfully.")
+    return compiled
+
+
+def get_app():
+    """Returns the compiled graph, compiling it on first use. Every run of it starts a new conversation."""
+    global _app
+    if _app is None:
+        with _lazy_lock:
+            if _app is None:
+                _app = build_graph()
+    return _app
+
+
+def get_session_app():
+    """Returns the graph compiled with the session checkpointer (SQLite at MEMORY_SQLITE_PATH), which keeps the
+    conversation memory of every run started with a `thread_id` (see `session_run`)."""
+    global _session_app
+    if _session_app is None:
+        with _lazy_lock:
+            if _session_app is None:
+                _session_app = build_graph(create_checkpointer(config.MEMORY_SQLITE_PATH))
+    return _session_app
+
+
+def session_run(run_config: dict = None, budget: RequestBudget = None, session_id: str = None):
+    """(graph, run config) for one question: the session graph on the session's thread when `session_id` is
+    given and MEMORY_ENABLED is set, the stateless graph otherwise. The run config carries tracing and `budget`."""
+    run_config = with_budget(with_tracing(run_config), budget)
+    if session_id is None or not config.MEMORY_ENABLED:
+        return get_app(), run_config
+    run_config["configurable"]["thread_id"] = str(session_id)
+    return get_session_app(), run_config
+
+
+def has_history(app, run_config: dict) -> bool:
+    return app.checkpointer is not None and bool(app.get_state(run_config).values.get("history"))
+
+
+async def ahas_history(app, run_config: dict) -> bool:
+    return app.checkpointer is not None and bool((await app.aget_state(run_config)).values.get("history"))
+
+
+def _cached_turn(cached: dict) -> dict:
+    memory = ConversationMemory.from_config()
+    memory.add_turn(cached["input"], cached["agent_outcome"], cached["next_agent"])
+    return {"input": cached["input"], "agent_outcome": cached["agent_outcome"], "next_agent": cached["next_agent"],
+            "history": memory.history}
+
+
+def remember_cached(app, run_config: dict, cached: dict) -> None:
+    """Records a cached answer to a session's first question as the first turn of its conversation."""
+    if app.checkpointer is not None:
+        app.update_state(run_config, _cached_turn(cached), as_node="memory")
+
+
+async def aremember_cached(app, run_config: dict, cached: dict) -> None:
+    if app.checkpointer is not None:
+        await app.aupdate_state(run_config, _cached_turn(cached), as_node="memory")
+
+
+def _finish_question(question: str, final_state: dict, budget: RequestBudget, follow_up: bool) -> dict:
+    if final_state.get("budget_exhausted"):
+        # Partial answers are returned, but never cached.
+        logger.warning(f"Question '{question}' stopped early by its budget: {budget.usage()}")
+    elif not follow_up:  # a follow-up's answer depends on the conversation before it
+        cache_answer(question, final_state.get("next_agent"), final_state.get("agent_outcome"))
+    # Leave out what `_new_question` cleared, as a run that is not part of a session would.
+    return {**{key: value for key, value in final_state.items() if value is not None}, "cached": False}
+
+
+def answer_question(question: str, run_config: dict = None, budget: RequestBudget = None,
+                    session_id: str = None) -> dict:
+    """Answers one question through the answer cache, running the graph only on a miss, within `budget`
+    (by default the one configured in `config.py`). With a `session_id` the question is a turn of that
+    conversation; follow-up questions bypass the answer cache. Returns the final graph state plus a `cached` flag."""
+    budget = budget or RequestBudget.from_config()
+    app, run_config = session_run(run_config, budget, session_id)
+    follow_up = has_history(app, run_config)
+    if not follow_up:
+        cached = cached_answer(question)
+        if cached is not None:
+            remember_cached(app, run_config, cached)
+            return cached
+    final_state = app.invoke({"input": question}, config=run_config)
+    return _finish_question(question, final_state, budget, follow_up)
+
+
+async def aanswer_question(question: str, run_config: dict = None, budget: RequestBudget = None,
+                           session_id: str = None) -> dict:
+    """Async variant of `answer_question`."""
+    budget = budget or RequestBudget.from_config()
+    app, run_config = session_run(run_config, budget, session_id)
+    follow_up = await ahas_history(app, run_config)
+    if not follow_up:
+        cached = cached_answer(question)
+        if cached is not None:
+            await aremember_cached(app, run_config, cached)
+            return cached
+    final_state = await app.ainvoke({"input": question}, config=run_config)
+    return _finish_question(question, final_state, budget, follow_up)
+
+
+async def aanswer_questions(questions: List[str], concurrency: int = None) -> List[str]:
+    """Runs the questions through the graph with `ainvoke`, at most `concurrency` at a time, and returns the
+    answers in input order. A failing question yields an error message instead of cancelling the others."""
+    semaphore = asyncio.Semaphore(concurrency or config.ASYNC_CONCURRENCY)
+
+    async def answer(question: str) -> str:
+        async with semaphore:
+            try:
+                final_state = await aanswer_question(question)
+                return final_state.get("agent_outcome", "No final answer was generated.")
+            except Exception as e:
+                logger.error(f"An error occurred during graph invocation: {e}", exc_info=True)
+                return f"An error occurred: {e}"
+
+    return await asyncio.gather(*(answer(question) for question in questions))
 
-workflow.add_conditional_edges(
-    "router",
-    where_to_go,
-    {
-        "call_tool_node": "call_tool_node",
-        END: END
-    }
-)
 
-workflow.add_edge("call_tool_node", END)
-app = workflow.compile()
-logger.info("LangGraph workflow has been compiled successfully.")
+def __getattr__(name):
+    # Keeps `from main_langgraph import app` working without compiling the graph at import time.
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
     logger.info("==================================")
     logger.info("Starting new LangGraph agent session...")
+    app = get_app()
+    # Questions of this REPL session are turns of one conversation.
+    session_id = uuid.uuid4().hex if config.MEMORY_ENABLED else None
 
     while True:
         question = input("\nAsk your question (or type 'exit' to quit): ")
@@ -133,7 +751,7 @@ if __name__ == "__main__":
 
         logger.info(f"Received user question: '{question}'")
         try:
-            final_state = app.invoke({"input": question})
+            final_state = answer_question(question, session_id=session_id)
             print("\n" + "="*30 + "\nAgent Response:\n" + "="*30)
             print(final_state.get("agent_outcome", "No final answer was generated."))
             print("="*30)
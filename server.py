@@ -0,0 +1,260 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+import config
+import main_langgraph
+from utils.budget import RequestBudget
+from utils.logging_config import bind_request_id
+from utils.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+
+class AskRequest(BaseModel):
+    question: str
+    timeout: Optional[float] = None
+    # Questions sent with the same session_id are turns of one conversation (see config.MEMORY_ENABLED).
+    session_id: Optional[str] = None
+
+
+# Nodes whose output is the final answer: the single specialist, or the synthesizer after a fan-out.
+_ANSWER_NODES = ("call_tool_node", "synthesizer")
+
+
+class _SpecialistTokens:
+    """Picks the answer tokens out of the model calls streamed by `call_tool_node`, where the specialist agent's
+    intermediate steps are model calls too. A tool-calling model's chunks are dropped from its first tool call on;
+    a ReAct model (one that stops at "Observation") is buffered until its "Final Answer:", and only the text after
+    that is streamed. Model calls made inside a tool (e.g. the SQL query checker) are skipped."""
+
+    FINAL_ANSWER = "Final Answer:"
+
+    def __init__(self):
+        self._tools = set()  # run ids of the tools running
+        self._react = {}  # ReAct model run id -> its output so far (None once past "Final Answer:")
+        self._skipped = set()  # model run ids whose output is not part of the answer
+
+    def feed(self, event: dict) -> str:
+        """The answer text carried by a `call_tool_node` event, if any."""
+        kind, run_id = event["event"], event["run_id"]
+        if kind == "on_tool_start":
+            self._tools.add(run_id)
+        elif kind in ("on_tool_end", "on_tool_error"):
+            self._tools.discard(run_id)
+        elif kind == "on_chat_model_start":
+            if self._tools.intersection(event.get("parent_ids", ())):
+                self._skipped.add(run_id)
+            elif any("Observation" in stop for stop in event.get("metadata", {}).get("ls_stop") or ()):
+                self._react[run_id] = ""
+        elif kind == "on_chat_model_end":
+            self._react.pop(run_id, None)
+            self._skipped.discard(run_id)
+        elif kind == "on_chat_model_stream" and run_id not in self._skipped:
+            chunk = event["data"]["chunk"]
+            if getattr(chunk, "tool_call_chunks", None):
+                self._skipped.add(run_id)
+                return ""
+            content = chunk.content if isinstance(chunk.content, str) else ""
+            if run_id not in self._react:
+                return content
+            buffered = self._react[run_id]
+            if buffered is None:  # past the marker, before the first word of the answer
+                text = content.lstrip()
+            else:
+                text = buffered + content
+                if self.FINAL_ANSWER not in text:
+                    self._react[run_id] = text
+                    return ""
+                text = text.split(self.FINAL_ANSWER, 1)[1].lstrip()
+            if text:
+                del self._react[run_id]  # from here on, the chunks are the answer
+            else:
+                self._react[run_id] = None
+            return text
+        return ""
+
+
+def _request_id(request: Request) -> str:
+    return request.headers.get("x-request-id") or uuid.uuid4().hex
+
+
+def _timeout_of(body: AskRequest) -> float:
+    if body.timeout is None:
+        return config.SERVER_REQUEST_TIMEOUT
+    return min(body.timeout, config.SERVER_REQUEST_TIMEOUT)
+
+
+def _budget_of(body: AskRequest) -> RequestBudget:
+    # Leave a tenth of the request timeout for returning the partial answer before the request itself times out.
+    return RequestBudget.from_config(timeout=0.9 * _timeout_of(body))
+
+
+def _sse(event_id: int, event: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _graph_events(question: str, request_id: str, budget: RequestBudget,
+                        session_id: Optional[str] = None) -> AsyncIterator[tuple]:
+    """Translates LangGraph's event stream into the (event, data) pairs exposed to clients: the router decision,
+    each tool call and result, each parallel branch's answer, the answer tokens as they are generated, and
+    finally the complete answer with the budget used."""
+    app, run_config = main_langgraph.session_run({"run_name": "ask", "metadata": {"request_id": request_id}},
+                                                 budget, session_id)
+    follow_up = await main_langgraph.ahas_history(app, run_config)
+    cached = None if follow_up else main_langgraph.cached_answer(question)
+    if cached is not None:
+        await main_langgraph.aremember_cached(app, run_config, cached)
+        yield "route", {"next_agent": cached["next_agent"], "cached": True}
+        yield "final", {"answer": cached["agent_outcome"], "cached": True}
+        return
+
+    route = outcome = None
+    specialist_tokens = _SpecialistTokens()
+    async for event in app.astream_events({"input": question}, config=run_config, version="v2"):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+        if node == "call_tool_node":
+            text = specialist_tokens.feed(event)
+            if text:
+                yield "token", {"text": text}
+        if kind == "on_chain_end" and event["name"] == "router":
+            route = event["data"]["output"].get("next_agent")
+            outcome = event["data"]["output"].get("agent_outcome")  # set when the budget ran out before routing
+            yield "route", {"next_agent": route, "plan": event["data"]["output"].get("plan") or []}
+        elif kind == "on_tool_start":
+            yield "tool_start", {"tool": event["name"], "input": event["data"].get("input")}
+        elif kind == "on_tool_end":
+            yield "tool_end", {"tool": event["name"], "output": str(event["data"].get("output"))[:2000]}
+        elif kind == "on_chain_end" and event["name"] == "branch":
+            for branch in event["data"]["output"].get("branch_outcomes", []):
+                yield "branch", branch
+        elif kind == "on_chat_model_stream" and node == "synthesizer":
+            content = event["data"]["chunk"].content
+            if content:
+                yield "token", {"text": content}
+        elif kind == "on_chain_end" and event["name"] in _ANSWER_NODES:
+            outcome = event["data"]["output"].get("agent_outcome")
+    if outcome is not None and not budget.exhausted and not follow_up:
+        main_langgraph.cache_answer(question, route, outcome)
+    yield "final", {"answer": outcome if outcome is not None else "No final answer was generated.",
+                    "budget": budget.usage()}
+
+
+async def _with_deadline(events: AsyncIterator[tuple], deadline: float) -> AsyncIterator[tuple]:
+    iterator = events.__aiter__()
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        try:
+            yield await asyncio.wait_for(iterator.__anext__(), timeout=remaining)
+        except StopAsyncIteration:
+            return
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Compile the graph and train the fast router before accepting traffic; specialists stay lazy.
+    main_langgraph.get_app()
+    if config.MEMORY_ENABLED:
+        main_langgraph.get_session_app()
+    main_langgraph.get_fast_router()
+    logger.info("Server is ready to accept questions.")
+    yield
+    logger.info("Server shutting down; in-flight requests have been drained.")
+
+
+api = FastAPI(title="Simple Agentic RAG", lifespan=lifespan)
+
+
+@api.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@api.get("/metrics/cache")
+async def cache_metrics():
+    cache = main_langgraph.get_answer_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+@api.get("/metrics")
+async def metrics():
+    """Span durations, tokens, cost and errors per node, LLM, tool and agent iteration, in Prometheus text format."""
+    tracer = get_tracer()
+    return PlainTextResponse(tracer.metrics.render() if tracer is not None else "",
+                             media_type="text/plain; version=0.0.4")
+
+
+@api.post("/ask")
+async def ask(body: AskRequest, request: Request):
+    request_id = _request_id(request)
+    bind_request_id(request_id)
+    logger.info(f"[{request_id}] Received question: '{body.question}'")
+    headers = {"X-Request-ID": request_id}
+    budget = _budget_of(body)
+    try:
+        final_state = await asyncio.wait_for(
+            main_langgraph.aanswer_question(body.question, run_config={"metadata": {"request_id": request_id}},
+                                            budget=budget, session_id=body.session_id),
+            timeout=_timeout_of(body))
+    except asyncio.TimeoutError:
+        logger.warning(f"[{request_id}] Request timed out.")
+        return JSONResponse({"request_id": request_id, "error": "timeout"}, status_code=504, headers=headers)
+    except Exception as e:
+        logger.error(f"[{request_id}] An error occurred during graph invocation: {e}", exc_info=True)
+        return JSONResponse({"request_id": request_id, "error": str(e)}, status_code=500, headers=headers)
+    return JSONResponse({
+        "request_id": request_id,
+        "route": final_state.get("next_agent"),
+        "answer": final_state.get("agent_outcome", "No final answer was generated."),
+        "cached": final_state.get("cached", False),
+        "budget": budget.usage(),
+    }, headers=headers)
+
+
+@api.post("/ask/stream")
+async def ask_stream(body: AskRequest, request: Request):
+    request_id = _request_id(request)
+    logger.info(f"[{request_id}] Received streaming question: '{body.question}'")
+    deadline = time.monotonic() + _timeout_of(body)
+    budget = _budget_of(body)
+
+    async def stream():
+        bind_request_id(request_id)  # the body is iterated in the response's own task
+        event_id = 0
+        yield _sse(event_id, "start", {"request_id": request_id})
+        try:
+            async for event, data in _with_deadline(_graph_events(body.question, request_id, budget, body.session_id), deadline):
+                event_id += 1
+                yield _sse(event_id, event, {"request_id": request_id, **data})
+        except asyncio.TimeoutError:
+            logger.warning(f"[{request_id}] Streaming request timed out.")
+            yield _sse(event_id + 1, "error", {"request_id": request_id, "error": "timeout"})
+        except Exception as e:
+            logger.error(f"[{request_id}] An error occurred during graph streaming: {e}", exc_info=True)
+            yield _sse(event_id + 1, "error", {"request_id": request_id, "error": str(e)})
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"X-Request-ID": request_id, "Cache-Control": "no-cache"})
+
+
+def run(host: str = None, port: int = None) -> None:
+    """Serves the API until SIGINT/SIGTERM. On shutdown uvicorn stops accepting connections and gives
+    in-flight requests up to SERVER_SHUTDOWN_GRACE seconds to finish."""
+    uvicorn.run(api, host=host or config.SERVER_HOST, port=port or config.SERVER_PORT,
+                timeout_graceful_shutdown=config.SERVER_SHUTDOWN_GRACE, log_config=None)
+
+
+if __name__ == "__main__":
+    run()
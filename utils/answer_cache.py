@@ -0,0 +1,229 @@
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from utils.shared_store import get_shared_store
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+# Arabic code points that are commonly typed in place of their Persian equivalents.
+_PERSIAN_CHARS = str.maketrans({"ي": "ی", "ى": "ی", "ك": "ک", "ة": "ه", "‌": " "})
+
+
+def normalize_question(text: str) -> str:
+    """Canonical form used as the cache key: NFKC, case-folded, Persian/Arabic letters unified,
+    punctuation dropped and whitespace collapsed. 'What's the weather in Paris?' and
+    'what s the weather in  paris' map to the same key."""
+    text = unicodedata.normalize("NFKC", text).translate(_PERSIAN_CHARS).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+@dataclass
+class CacheEntry:
+    question: str
+    answer: str
+    route: str
+    expires_at: float
+    embedding: Optional[List[float]] = None
+
+
+class AnswerCache:
+    """An LRU cache of final answers keyed on the normalized question.
+
+    Each entry expires after the TTL of the route that produced it (`route_ttls`); routes without a TTL are
+    never cached. When `embed` and `similarity_threshold` are given, a miss on the exact key falls back to the
+    most similar cached question whose cosine similarity reaches the threshold. With `sqlite_path` every entry is
+    also written to a SQLite file, so the cache survives restarts and is shared by processes on the same host. With
+    a `store` (`utils.shared_store`) every entry is also written there, and a local miss is looked up in it, so that
+    pre-fork workers reuse each other's answers."""
+
+    STORE_PREFIX = "answer:"  # of this cache's keys in the shared store
+
+    def __init__(self, route_ttls: Dict[str, float], max_entries: int = 1024, sqlite_path: Optional[str] = None,
+                 embed: Optional[Callable[[str], List[float]]] = None,
+                 similarity_threshold: Optional[float] = None, store=None):
+        self.route_ttls = dict(route_ttls)
+        self.store = store
+        self.max_entries = max_entries
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.metrics = {"hits": 0, "semantic_hits": 0, "shared_hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+                        "expirations": 0}
+        if sqlite_path:
+            os.makedirs(os.path.dirname(sqlite_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute("""CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY, question TEXT, answer TEXT, route TEXT,
+                expires_at REAL, embedding TEXT, last_access REAL)""")
+            self._db.commit()
+
+    @property
+    def _semantic(self) -> bool:
+        return self.embed is not None and self.similarity_threshold is not None
+
+    def get(self, question: str) -> Optional[CacheEntry]:
+        """Returns the cached entry for the question, or None on a miss (expired entries count as misses)."""
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            entry = self._lookup(key, now)
+            if entry is not None:
+                self.metrics["hits"] += 1
+                return entry
+        if self.store is not None:
+            entry = self._lookup_shared(key)
+            if entry is not None:
+                with self._lock:
+                    self._remember(key, entry)
+                    self.metrics["hits"] += 1
+                    self.metrics["shared_hits"] += 1
+                return entry
+        if self._semantic:
+            entry = self._lookup_similar(question, now)
+            if entry is not None:
+                with self._lock:
+                    self.metrics["hits"] += 1
+                    self.metrics["semantic_hits"] += 1
+                return entry
+        with self._lock:
+            self.metrics["misses"] += 1
+        return None
+
+    def put(self, question: str, answer: str, route: str) -> bool:
+        """Caches the answer if its route has a TTL. Returns whether it was stored."""
+        ttl = self.route_ttls.get(route)
+        if not ttl or not answer:
+            return False
+        embedding = self.embed(question) if self._semantic else None
+        entry = CacheEntry(question=question, answer=answer, route=route, expires_at=time.time() + ttl,
+                           embedding=embedding)
+        key = normalize_question(question)
+        with self._lock:
+            self._remember(key, entry)
+            self.metrics["stores"] += 1
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 (key, question, answer, route, entry.expires_at,
+                                  json.dumps(embedding) if embedding else None, time.time()))
+                self._db.execute("""DELETE FROM answers WHERE key NOT IN (
+                    SELECT key FROM answers ORDER BY last_access DESC LIMIT ?)""", (self.max_entries,))
+                self._db.commit()
+        if self.store is not None:
+            self.store.set(self.STORE_PREFIX + key, {"question": question, "answer": answer, "route": route,
+                                             "embedding": embedding}, ttl)
+        return True
+
+    def clear(self) -> None:
+        """Drops every cached answer: in this process, in the SQLite file and in the shared store, so that the
+        entries are not read back from there. Other processes keep the answers already in their own memory until
+        these expire or they clear their cache too."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers")
+                self._db.commit()
+        if self.store is not None:
+            self.store.delete_prefix(self.STORE_PREFIX)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.metrics["hits"] + self.metrics["misses"]
+            return {**self.metrics, "size": len(self._entries),
+                    "hit_rate": self.metrics["hits"] / lookups if lookups else 0.0}
+
+    def _lookup(self, key: str, now: float) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            entry = self._load(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._drop(key)
+            self.metrics["expirations"] += 1
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.metrics["evictions"] += 1
+
+    def _lookup_similar(self, question: str, now: float) -> Optional[CacheEntry]:
+        embedding = self.embed(question)
+        with self._lock:
+            candidates = [(k, e) for k, e in self._entries.items() if e.embedding and e.expires_at > now]
+        best_key, best_score = None, self.similarity_threshold
+        for key, entry in candidates:
+            score = _cosine(embedding, entry.embedding)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(best_key)
+            if entry is not None:
+                self._entries.move_to_end(best_key)
+        if entry is not None:
+            logger.info(f"Semantic cache hit ({best_score:.3f}): '{question}' ~ '{entry.question}'")
+        return entry
+
+    def _lookup_shared(self, key: str) -> Optional[CacheEntry]:
+        found = self.store.lookup(self.STORE_PREFIX + key)
+        if found is None:
+            return None
+        value, remaining = found
+        return CacheEntry(question=value["question"], answer=value["answer"], route=value["route"],
+                          expires_at=time.time() + remaining, embedding=value.get("embedding"))
+
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        row = self._db.execute("SELECT question, answer, route, expires_at, embedding FROM answers WHERE key = ?",
+                               (key,)).fetchone()
+        if row is None:
+            return None
+        self._db.execute("UPDATE answers SET last_access = ? WHERE key = ?", (time.time(), key))
+        self._db.commit()
+        return CacheEntry(question=row[0], answer=row[1], route=row[2], expires_at=row[3],
+                          embedding=json.loads(row[4]) if row[4] else None)
+
+    def _drop(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+            self._db.commit()
+
+
+def create_answer_cache(config) -> Optional[AnswerCache]:
+    """Builds the answer cache described by the project configuration, or None when it is disabled."""
+    if not config.ANSWER_CACHE_ENABLED:
+        return None
+    embed = None
+    if config.ANSWER_CACHE_SIMILARITY_THRESHOLD is not None:
+        from langchain_openai import OpenAIEmbeddings
+        embed = OpenAIEmbeddings(model=config.ANSWER_CACHE_EMBEDDING_MODEL).embed_query
+    return AnswerCache(route_ttls=config.ANSWER_CACHE_TTLS, max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+                       sqlite_path=config.ANSWER_CACHE_SQLITE_PATH, embed=embed,
+                       similarity_threshold=config.ANSWER_CACHE_SIMILARITY_THRESHOLD, store=get_shared_store())
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig, ensure_config
+from langchain_core.runnables.config import merge_configs
+
+import config
+from utils.tracing import chat_prompt_chars, estimate_tokens, token_usage
+
+logger = logging.getLogger(__name__)
+
+# How an AgentExecutor's answer starts when it reached `max_iterations` ("...due to max iterations." from
+# tools agents, "...due to iteration limit or time limit." from ReAct agents such as the SQL agent).
+_EXECUTOR_STOPPED = "Agent stopped due to"
+
+LIMIT_DESCRIPTIONS = {
+    "llm_calls": "LLM call limit",
+    "tool_calls": "tool call limit",
+    "tokens": "token limit",
+    "deadline": "time limit",
+    "iterations": "agent step limit",
+    "cancelled": "cancellation",
+}
+
+
+class BudgetExceeded(Exception):
+    """Raised (from a callback, before the call is made) when an LLM or tool call would exceed the budget."""
+
+    def __init__(self, limit: str):
+        super().__init__(f"Request budget exhausted: {LIMIT_DESCRIPTIONS.get(limit, limit)}")
+        self.limit = limit
+
+
+class RequestBudget:
+    """Limits on the LLM calls, tool calls, tokens and wall-clock time one request may use, shared by every
+    node, parallel branch and agent executor working on it (None means unlimited).
+
+    The counters are updated by `BudgetCallbackHandler`. The first limit reached is kept in `exhausted`, and from
+    then on every LLM or tool call of the request fails fast with `BudgetExceeded`."""
+
+    def __init__(self, max_llm_calls: Optional[int] = None, max_tool_calls: Optional[int] = None,
+                 max_tokens: Optional[int] = None, timeout: Optional[float] = None):
+        self.max_llm_calls = max_llm_calls
+        self.max_tool_calls = max_tool_calls
+        self.max_tokens = max_tokens
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout if timeout else None
+        self.llm_calls = 0
+        self.tool_calls = 0
+        self.tokens = 0
+        self.exhausted: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, timeout: Optional[float] = None) -> "RequestBudget":
+        """The default budget from `config.py`; `timeout` replaces BUDGET_TIMEOUT when it is shorter."""
+        if config.BUDGET_TIMEOUT and (timeout is None or config.BUDGET_TIMEOUT < timeout):
+            timeout = config.BUDGET_TIMEOUT
+        return cls(config.BUDGET_MAX_LLM_CALLS, config.BUDGET_MAX_TOOL_CALLS, config.BUDGET_MAX_TOKENS, timeout)
+
+    def remaining_time(self) -> Optional[float]:
+        return None if self.deadline is None else max(self.deadline - time.monotonic(), 0.0)
+
+    def _limit_reached(self, llm_call: bool = False, tool_call: bool = False) -> Optional[str]:
+        if self.exhausted:
+            return self.exhausted
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return "deadline"
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            return "tokens"
+        if llm_call and self.max_llm_calls is not None and self.llm_calls >= self.max_llm_calls:
+            return "llm_calls"
+        if tool_call and self.max_tool_calls is not None and self.tool_calls >= self.max_tool_calls:
+            return "tool_calls"
+        return None
+
+    def _charge(self, llm_call: bool = False, tool_call: bool = False) -> None:
+        with self._lock:
+            limit = self._limit_reached(llm_call, tool_call)
+            if limit is not None:
+                if self.exhausted is None:
+                    logger.warning(f"Request budget exhausted: {LIMIT_DESCRIPTIONS[limit]} ({self.usage()})")
+                self.exhausted = limit
+                raise BudgetExceeded(limit)
+            self.llm_calls += llm_call
+            self.tool_calls += tool_call
+
+    def check(self) -> None:
+        """Raises `BudgetExceeded` if a limit has been reached, without counting a call."""
+        self._charge()
+
+    def charge_llm_call(self) -> None:
+        self._charge(llm_call=True)
+
+    def charge_tool_call(self) -> None:
+        self._charge(tool_call=True)
+
+    def add_tokens(self, tokens: int) -> None:
+        with self._lock:
+            self.tokens += tokens
+
+    def absorb(self, other: "RequestBudget") -> None:
+        """Adds the calls and tokens spent within `other` (e.g. by speculative work the request used) to this one."""
+        with self._lock:
+            self.llm_calls += other.llm_calls
+            self.tool_calls += other.tool_calls
+            self.tokens += other.tokens
+
+    def mark_exhausted(self, limit: str) -> None:
+        with self._lock:
+            self.exhausted = self.exhausted or limit
+
+    def usage(self) -> Dict[str, Any]:
+        return {"llm_calls": self.llm_calls, "tool_calls": self.tool_calls, "tokens": self.tokens,
+                "elapsed_s": round(time.monotonic() - self.started, 3), "exhausted": self.exhausted}
+
+
+class BudgetCallbackHandler(BaseCallbackHandler):
+    """Charges every LLM and tool call made below the run it is attached to against a `RequestBudget`, and
+    stops the run by raising `BudgetExceeded` before a call that is over budget. It also keeps the tool results
+    it has seen, from which a partial answer is built when the run is stopped."""
+
+    run_inline = True
+    raise_error = True  # let BudgetExceeded out of the callback manager, so that it aborts the run
+
+    def __init__(self, budget: RequestBudget):
+        self.budget = budget
+        self.observations: List[Tuple[str, str]] = []
+        self._prompt_chars: Dict[Any, int] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.budget.charge_llm_call()
+        self._prompt_chars[run_id] = chat_prompt_chars(messages, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self.budget.charge_llm_call()
+        self._prompt_chars[run_id] = sum(len(p) for p in prompts)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt_tokens, completion_tokens = token_usage(response)
+        prompt_chars = self._prompt_chars.pop(run_id, 0)
+        if prompt_tokens is None:
+            text = "".join(g.text for gs in response.generations for g in gs)
+            prompt_tokens, completion_tokens = estimate_tokens(prompt_chars), estimate_tokens(len(text))
+        self.budget.add_tokens(prompt_tokens + completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._prompt_chars.pop(run_id, None)
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.budget.charge_tool_call()
+
+    def on_tool_end(self, output, **kwargs):
+        self.observations.append((kwargs.get("name") or "tool", str(output)))
+
+    def config(self, run_config: Optional[RunnableConfig] = None) -> RunnableConfig:
+        """`run_config` (by default the config of the runnable being executed in this context, so that tracing and
+        streaming callbacks are kept) with this handler added to its callbacks."""
+        return merge_configs(ensure_config(run_config), {"callbacks": [self]})
+
+
+def with_budget(run_config: Optional[dict] = None, budget: Optional[RequestBudget] = None) -> dict:
+    """Returns a copy of a graph run config carrying `budget` (by default the configured one) in its
+    `configurable` section, where every node and branch of the run finds it. (It is not part of the graph state
+    because checkpointers persist the state.)"""
+    run_config = dict(run_config or {})
+    run_config["configurable"] = {**(run_config.get("configurable") or {}),
+                                  "budget": budget or RequestBudget.from_config()}
+    return run_config
+
+
+def budget_of(run_config: Optional[RunnableConfig]) -> RequestBudget:
+    """The budget of a graph run (see `with_budget`). A node of a run started without one gets a budget of its own
+    from the configuration."""
+    budget = ((run_config or {}).get("configurable") or {}).get("budget")
+    return budget if budget is not None else RequestBudget.from_config()
+
+
+def partial_answer(limit: str, observations: List[Tuple[str, str]] = ()) -> str:
+    """The answer given when a run is stopped by its budget: the most recent tool result, if there is one."""
+    message = f"Stopped early: the request reached its {LIMIT_DESCRIPTIONS.get(limit, limit)}."
+    if not observations:
+        return f"{message} No result was found before stopping."
+    tool, output = observations[-1]
+    return f"{message} Partial result from {tool}:\n{output[:config.BUDGET_PARTIAL_ANSWER_CHARS]}"
+
+
+def _finish(response: dict, handler: BudgetCallbackHandler) -> Tuple[dict, Optional[str]]:
+    # Only this executor ran out of steps: the request's budget stays usable (e.g. for other branches).
+    if str(response.get("output", "")).startswith(_EXECUTOR_STOPPED):
+        return {**response, "output": partial_answer("iterations", handler.observations)}, "iterations"
+    return response, None
+
+
+def invoke_agent(agent, inputs: dict, budget: RequestBudget,
+                 run_config: Optional[RunnableConfig] = None) -> Tuple[dict, Optional[str]]:
+    """Runs an agent executor within the budget. Returns its response and None, or, when a limit (or the
+    executor's own `max_iterations`) stopped it, a response whose `output` is the best partial answer and the
+    name of the limit."""
+    handler = BudgetCallbackHandler(budget)
+    try:
+        budget.check()
+        return _finish(agent.invoke(inputs, config=handler.config(run_config)), handler)
+    except BudgetExceeded as e:
+        return {"output": partial_answer(e.limit, handler.observations)}, e.limit
+
+
+async def ainvoke_agent(agent, inputs: dict, budget: RequestBudget,
+                        run_config: Optional[RunnableConfig] = None) -> Tuple[dict, Optional[str]]:
+    """Async variant of `invoke_agent`, which also cancels the executor when the deadline passes mid-call."""
+    handler = BudgetCallbackHandler(budget)
+    try:
+        budget.check()
+        response = await asyncio.wait_for(agent.ainvoke(inputs, config=handler.config(run_config)),
+                                          timeout=budget.remaining_time())
+        return _finish(response, handler)
+    except asyncio.TimeoutError:
+        budget.mark_exhausted("deadline")
+        return {"output": partial_answer("deadline", handler.observations)}, "deadline"
+    except BudgetExceeded as e:
+        return {"output": partial_answer(e.limit, handler.observations)}, e.limit
@@ -0,0 +1,162 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "has", "have", "how",
+    "i", "if", "in", "is", "it", "its", "me", "my", "of", "on", "or", "such", "that", "the", "their", "this",
+    "to", "use", "what", "when", "where", "which", "who", "why", "will", "with", "within", "you", "your",
+    "از", "به", "در", "که", "را", "با", "این", "آن", "است", "و", "من",
+}
+
+# Where a question that spans several data sources is most likely to switch topic.
+_CLAUSE_BOUNDARY = re.compile(r"[?؟;!]|,?\s+(?:and|also|plus|then)\s+|\s+(?:و|همچنین)\s+", re.IGNORECASE)
+_LEADING_CONJUNCTION = re.compile(r"^(?:and|also|plus|then|و|همچنین)(?:\s|,)+", re.IGNORECASE)
+
+_log_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases the text and splits it into unicode word tokens, dropping stopwords.
+    Adjacent-word bigrams are added so short phrases like 'order status' carry more weight than their parts."""
+    words = [w for w in _TOKEN_PATTERN.findall(text.lower()) if w not in _STOPWORDS and not w.isdigit()]
+    bigrams = [f"{a}_{b}" for a, b in zip(words, words[1:])]
+    return words + bigrams
+
+
+def split_clauses(text: str) -> List[str]:
+    """Splits a question at sentence ends and conjunctions, dropping fragments with fewer than two words."""
+    clauses = [_LEADING_CONJUNCTION.sub("", clause.strip(" ,.")) for clause in _CLAUSE_BOUNDARY.split(text)]
+    return [clause for clause in clauses if len(_TOKEN_PATTERN.findall(clause)) >= 2]
+
+
+def load_routing_log(path: str) -> List[Tuple[str, str]]:
+    """Reads past (question, route) decisions from a JSON-lines routing log. Missing files and bad lines are skipped."""
+    examples = []
+    if not path or not os.path.exists(path):
+        return examples
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                examples.append((record["question"], record["route"]))
+            except (ValueError, KeyError, TypeError):
+                continue
+    return examples
+
+
+def record_routing_decision(path: str, question: str, route: str, source: str = "llm") -> None:
+    """Appends one routing decision to the JSON-lines routing log so future fast routers can learn from it."""
+    if not path:
+        return
+    record = json.dumps({"question": question, "route": route, "source": source}, ensure_ascii=False)
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with _log_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(record + "\n")
+    except OSError as e:
+        logger.warning(f"Could not write routing decision to {path}: {e}")
+
+
+class FastRouter:
+    """A local multinomial Naive Bayes classifier over question tokens.
+
+    It is trained on the route descriptions, a few seed questions and the logged decisions of the LLM router,
+    and only answers when its posterior for the best route is at or above `threshold`. Everything else is left
+    to the LLM router."""
+
+    def __init__(self, threshold: float = 0.9, min_known_tokens: int = 1, alpha: float = 1.0):
+        self.threshold = threshold
+        self.min_known_tokens = min_known_tokens
+        self.alpha = alpha
+        self.token_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.total_counts: Counter = Counter()
+        self.vocabulary = set()
+
+    @property
+    def labels(self) -> List[str]:
+        return sorted(self.token_counts)
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "FastRouter":
+        for text, label in examples:
+            tokens = tokenize(text)
+            self.token_counts[label].update(tokens)
+            self.total_counts[label] += len(tokens)
+            self.vocabulary.update(tokens)
+        return self
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Returns the posterior probability of every known route for the given question (uniform prior).
+        Returns an empty dict when too few of the question's tokens have been seen during training."""
+        tokens = [t for t in tokenize(text) if t in self.vocabulary]
+        if len(tokens) < self.min_known_tokens or not self.token_counts:
+            return {}
+
+        vocabulary_size = len(self.vocabulary)
+        log_likelihoods = {}
+        for label, counts in self.token_counts.items():
+            denominator = math.log(self.total_counts[label] + self.alpha * vocabulary_size)
+            log_likelihoods[label] = sum(math.log(counts[t] + self.alpha) - denominator for t in tokens)
+
+        best = max(log_likelihoods.values())
+        exps = {label: math.exp(value - best) for label, value in log_likelihoods.items()}
+        total = sum(exps.values())
+        return {label: value / total for label, value in exps.items()}
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """Returns the most probable route and its posterior, or (None, 0.0) if the question is out of vocabulary."""
+        scores = self.scores(text)
+        if not scores:
+            return None, 0.0
+        label = max(scores, key=scores.get)
+        return label, scores[label]
+
+    def route(self, text: str) -> Optional[str]:
+        """Returns the route only if the classifier is confident enough; otherwise None, meaning 'ask the LLM'."""
+        label, confidence = self.predict(text)
+        if label is not None and confidence >= self.threshold:
+            logger.info(f"Fast router picked '{label}' with confidence {confidence:.3f}.")
+            return label
+        logger.info(f"Fast router not confident (best '{label}' at {confidence:.3f}); deferring to LLM router.")
+        return None
+
+    def plan(self, text: str) -> Optional[List[Tuple[str, str]]]:
+        """Returns [(route, sub-question), ...] when the classifier is confident about the whole question, or
+        None to let the LLM router decide. A question whose clauses confidently belong to different routes is
+        split into one sub-question per route; if any of its clauses is not confident, the LLM decides, since
+        routing the whole question could drop the part the classifier did not recognize."""
+        clauses = split_clauses(text)
+        if len(clauses) > 1:
+            clause_routes = [(self.route(clause), clause) for clause in clauses]
+            if any(route is None for route, _ in clause_routes):
+                return None
+            if len({route for route, _ in clause_routes}) > 1:
+                grouped: Dict[str, List[str]] = defaultdict(list)
+                for route, clause in clause_routes:
+                    grouped[route].append(clause)
+                return [(route, " and ".join(parts)) for route, parts in grouped.items()]
+        route = self.route(text)
+        return [(route, text)] if route is not None else None
+
+    @classmethod
+    def from_descriptions(cls, descriptions: Dict[str, str], seed_examples: Optional[Dict[str, List[str]]] = None,
+                          log_path: Optional[str] = None, threshold: float = 0.9) -> "FastRouter":
+        """Builds a router from route descriptions, optional seed questions and an optional routing log. Only the
+        described routes are learned: logged decisions for anything else ("end", a route since removed) are
+        skipped, so the router never returns a route without a specialist."""
+        examples = [(text, label) for label, text in descriptions.items()]
+        for label, questions in (seed_examples or {}).items():
+            examples.extend((question, label) for question in questions if label in descriptions)
+        logged = [(question, label) for question, label in load_routing_log(log_path) if label in descriptions]
+        examples.extend(logged)
+        logger.info(f"Training fast router on {len(examples)} examples ({len(logged)} from the routing log).")
+        return cls(threshold=threshold).fit(examples)
@@ -1,24 +1,212 @@
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
+import zlib
 
+from langchain_core.callbacks import BaseCallbackHandler
+
+import config
+
+# Request ID of the question being answered in this context (set by the server, inherited by graph branches).
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is written as a JSON field.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+_mode = None  # the mode of the last setup_logging() call
+
+
+def bind_request_id(request_id):
+    """Tags every record logged in the current context (and the tasks it starts) with `request_id`; returns a
+    token for `request_id_var.reset`."""
+    return request_id_var.set(request_id)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Keeps every record above DEBUG and a `rate` fraction of DEBUG records. The decision is made per request
+    ID, so a sampled request keeps its whole agent trace; records without one are sampled individually."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        request_id = getattr(record, "request_id", None)
+        if request_id is None:
+            return random.random() < self.rate
+        return zlib.crc32(str(request_id).encode()) % 10000 < self.rate * 10000
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request ID, thread and any `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now (the args may change before the listener runs), but unlike the
+        # base class keep the record's other fields for the JSON formatter.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class AgentTraceLogger(BaseCallbackHandler):
+    """Writes each agent step (the tool chosen and its input, then the final answer) as a DEBUG record on the
+    `agents.trace` logger, in place of the executors' stdout printing (`verbose=True`)."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.logger = logging.getLogger("agents.trace")
+
+    def on_agent_action(self, action, **kwargs):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Agent action: {action.tool}", extra={"tool": action.tool,
+                                                                    "tool_input": action.tool_input})
+
+    def on_agent_finish(self, finish, **kwargs):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Agent finished", extra={"output": str(finish.return_values.get("output"))[:1000]})
+
+
+def agent_executor_options() -> dict:
+    """`verbose` and `callbacks` for the agent executors: stdout chain printing when AGENT_VERBOSE is set,
+    otherwise the steps go to the `agents.trace` logger at DEBUG level."""
+    if config.AGENT_VERBOSE:
+        return {"verbose": True}
+    return {"verbose": False, "callbacks": [AgentTraceLogger()]}
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()  # drains the queue before returning
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def _restart_listener() -> None:
+    # Only the thread that called fork() survives in the child: a listener started before it needs a new thread
+    # there, or the child's records would pile up in the queue. It also needs a new queue, since the parent's
+    # listener may have been waiting on the old one (whose lock state the child inherits) and the records still
+    # in it are the parent's to write.
+    global _listener
+    if _listener is not None:
+        log_queue = queue.SimpleQueue()
+        for handler in logging.getLogger().handlers:
+            if isinstance(handler, _QueueHandler):
+                handler.queue = log_queue
+        _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_listener)
+atexit.register(_stop_listener)
+
+
+def worker_log_path(slot: int) -> str:
+    """LOG_PATH for pre-fork worker `slot`: "app.log" becomes "app.worker0.log"."""
+    base, ext = os.path.splitext(config.LOG_PATH)
+    return f"{base}.worker{slot}{ext}"
+
+
+def use_worker_log(slot: int) -> None:
+    """In a pre-fork worker, moves the file logging configured by `setup_logging` (if any) to `worker_log_path`:
+    processes rotating or appending to one shared file would lose or interleave records."""
+    if _mode is not None:
+        setup_logging(_mode, worker_log_path(slot), announce=False)
+
+
+def setup_logging(mode: str = None, path: str = None, announce: bool = True):
+    """Configures the root logger to write to the console and to `path` (default LOG_PATH).
+
+    * "plain": the console and file handlers write synchronously from the logging thread.
+    * "async_json": the logging thread only enqueues the record; a background `QueueListener` writes JSON lines
+      to the console and to the file, rotated at LOG_MAX_BYTES. DEBUG records are sampled at
+      LOG_DEBUG_SAMPLE_RATE per request."""
+    global _listener, _mode
+    mode = _mode = mode or config.LOG_MODE
+    path = path or config.LOG_PATH
+    _stop_listener()
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(config.LOG_LEVEL)
+    for handler in root_logger.handlers:
+        handler.close()
+    root_logger.handlers = []
+
+    if mode == "async_json":
+        formatter = JsonFormatter()
+        handlers = [logging.handlers.RotatingFileHandler(path, maxBytes=config.LOG_MAX_BYTES,
+                                                         backupCount=config.LOG_BACKUP_COUNT, encoding="utf-8")]
+        if config.LOG_CONSOLE:
+            handlers.append(logging.StreamHandler(sys.stdout))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.addFilter(RequestIdFilter())
+        queue_handler.addFilter(DebugSampler(config.LOG_DEBUG_SAMPLE_RATE))
+        root_logger.addHandler(queue_handler)
+        # Agent traces are DEBUG records; let them through (to be sampled) without lowering the root level.
+        if config.LOG_DEBUG_SAMPLE_RATE > 0:
+            logging.getLogger("agents.trace").setLevel(logging.DEBUG)
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        if announce:
+            print(f"Logging configured to write JSON lines to {path} from a background thread")
+        return
 
-def setup_logging():
     log_formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
 
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-
-    root_logger.handlers = []
-
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(log_formatter)
     root_logger.addHandler(console_handler)
 
-    file_handler = logging.FileHandler("app.log", mode='a', encoding='utf-8')
+    file_handler = logging.FileHandler(path, mode='a', encoding='utf-8')
     file_handler.setFormatter(log_formatter)
     root_logger.addHandler(file_handler)
 
-    print("Logging configured to output to console and app.log")
+    if announce:
+        print(f"Logging configured to output to console and {path}")
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import sqlite3
+from typing import List, Optional
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langgraph.checkpoint.memory import InMemorySaver
+
+import config
+from utils.tracing import estimate_tokens
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:  # langgraph-checkpoint-sqlite is optional: without it sessions live in process memory.
+    SqliteSaver = None
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_MESSAGE = """
+    You maintain a running summary of a conversation between a user and an assistant that answers questions about
+    a gaming store, an AI learning platform and the weather.
+    Merge the new turns into the current summary. Keep the names, entities, numbers and results that later
+    questions may refer back to, and drop small talk and repetition.
+    Reply with the updated summary only, in at most {max_words} words.
+    """
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SUMMARY_SYSTEM_MESSAGE),
+    ("user", "Current summary:\n{summary}\n\nNew turns:\n{turns}")
+])
+
+
+def create_summary_chain(llm):
+    """prompt | llm that merges old turns into a conversation summary (inputs: `summary`, `turns`, `max_words`)."""
+    return SUMMARY_PROMPT | llm | StrOutputParser()
+
+
+def _turn_text(turn: dict) -> str:
+    return f"User: {turn['question']}\nAssistant: {turn['answer']}"
+
+
+class ConversationMemory:
+    """The memory of one conversation: the most recent turns verbatim, and a running summary of the older ones.
+
+    Each turn is a {"question", "answer", "route"} dict (answers are cut at `answer_chars`). Once the recent turns
+    exceed `recent_tokens`, the oldest are taken out (`take_oldest`) until the rest fit in half of that, and
+    merged into the summary (`fold_in`), so the summary is rewritten every few turns rather than on every one.
+    The summary itself is kept under `summary_tokens`. Token counts are estimated from the text, like the
+    tracer's."""
+
+    def __init__(self, history: Optional[List[dict]] = None, summary: str = "", recent_tokens: int = 800,
+                 summary_tokens: int = 300, context_turns: int = 3, answer_chars: int = 600):
+        self.history = list(history or [])
+        self.summary = summary or ""
+        self.recent_tokens = recent_tokens
+        self.summary_tokens = summary_tokens
+        self.context_turns = context_turns
+        self.answer_chars = answer_chars
+
+    @classmethod
+    def from_config(cls, history: Optional[List[dict]] = None, summary: str = "") -> "ConversationMemory":
+        return cls(history, summary, recent_tokens=config.MEMORY_RECENT_TOKENS,
+                   summary_tokens=config.MEMORY_SUMMARY_TOKENS, context_turns=config.MEMORY_CONTEXT_TURNS,
+                   answer_chars=config.MEMORY_ANSWER_CHARS)
+
+    def __bool__(self) -> bool:
+        return bool(self.history or self.summary)
+
+    def _tokens(self, turns: List[dict]) -> int:
+        return sum(estimate_tokens(len(_turn_text(turn))) for turn in turns)
+
+    def add_turn(self, question: str, answer: str, route: Optional[str] = None) -> None:
+        self.history.append({"question": question, "answer": str(answer or "")[:self.answer_chars],
+                             "route": route or "end"})
+
+    def needs_summary(self) -> bool:
+        return self._tokens(self.history) > self.recent_tokens
+
+    def take_oldest(self) -> str:
+        """Removes the oldest turns (never the latest one) until the rest fit in half of `recent_tokens`, and
+        returns their transcript for `fold_in`."""
+        old = []
+        while len(self.history) > 1 and self._tokens(self.history) > self.recent_tokens // 2:
+            old.append(self.history.pop(0))
+        return "\n".join(_turn_text(turn) for turn in old)
+
+    def summary_input(self, transcript: str) -> dict:
+        """The input of the summary chain (see `create_summary_chain`) that merges `transcript` into the summary."""
+        return {"summary": self.summary or "(none)", "turns": transcript, "max_words": self.summary_tokens * 3 // 4}
+
+    def fold_in(self, transcript: str, summary: Optional[str] = None) -> None:
+        """Replaces the summary with `summary`, the summarizer's merge of the current summary and `transcript`.
+        Without one (e.g. when the request is out of budget) the transcript is appended to the summary as it is,
+        and the oldest part of the summary is dropped."""
+        max_chars = self.summary_tokens * 4
+        if summary is None:
+            summary = f"{self.summary}\n{transcript}".strip()[-max_chars:]
+        self.summary = summary.strip()[:max_chars]
+        logger.info(f"Folded old turns into the conversation summary ({len(self.summary)} chars).")
+
+    def context(self, route: Optional[str] = None) -> str:
+        """The conversation context worth forwarding with a question for `route`: the summary, the previous turn
+        (which a follow-up usually refers to) and the most recent earlier turns answered by the same specialist,
+        at most `context_turns` in all."""
+        if not self:
+            return ""
+        turns = []
+        for i, turn in enumerate(reversed(self.history)):
+            if len(turns) >= self.context_turns:
+                break
+            if i == 0 or route is None or route in turn["route"].split("+"):
+                turns.append(turn)
+        parts = [f"Summary of the earlier conversation: {self.summary}"] if self.summary else []
+        parts += [_turn_text(turn) for turn in reversed(turns)]
+        return "\n".join(parts)
+
+    def with_context(self, question: str, route: Optional[str] = None) -> str:
+        """The question with its conversation context in front, or the question alone in a new conversation."""
+        context = self.context(route)
+        if not context:
+            return question
+        return f"Conversation so far:\n{context}\n\nCurrent question: {question}"
+
+
+if SqliteSaver is not None:
+    class ThreadedSqliteSaver(SqliteSaver):
+        """`SqliteSaver` (which only has blocking methods) with its async methods run in worker threads, so that
+        one checkpointer serves both `invoke` and `ainvoke` of the graph. Its connection is shared by the
+        threads behind the saver's own lock."""
+
+        async def aget_tuple(self, config):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None):
+            for item in await asyncio.to_thread(
+                    lambda: list(self.list(config, filter=filter, before=before, limit=limit))):
+                yield item
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id):
+            return await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def create_checkpointer(sqlite_path: Optional[str] = None):
+    """The checkpointer that keeps LangGraph sessions: a SQLite file at `sqlite_path`, or process memory."""
+    if sqlite_path and SqliteSaver is not None:
+        os.makedirs(os.path.dirname(sqlite_path) or ".", exist_ok=True)
+        return ThreadedSqliteSaver(sqlite3.connect(sqlite_path, check_same_thread=False))
+    if sqlite_path:
+        logger.warning("langgraph-checkpoint-sqlite is not installed; sessions are kept in process memory only.")
+    return InMemorySaver()
@@ -0,0 +1,90 @@
+import math
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableLambda
+
+from utils.fast_router import tokenize
+
+
+@dataclass(frozen=True)
+class Example:
+    """A few-shot example: the `question` it is found by, its rendered `text`, and the schema fragments it uses."""
+
+    question: str
+    text: str
+    fragments: Tuple[str, ...] = ()
+
+
+def _terms(text: str) -> set:
+    # `utils.fast_router.tokenize`, with a plural 's' dropped so that "courses" finds "course".
+    return {token[:-1] if token.endswith("s") and len(token) > 3 else token for token in tokenize(text)}
+
+
+class ExampleStore:
+    """Few-shot examples indexed by the terms of their questions. `select` scores every example sharing a term
+    with the question by the idf-weighted overlap and returns the best ones."""
+
+    def __init__(self, examples: Iterable[Example]):
+        self.examples = list(examples)
+        self._index: Dict[str, List[int]] = defaultdict(list)
+        for i, example in enumerate(self.examples):
+            for token in _terms(example.question):
+                self._index[token].append(i)
+        self._idf = {token: math.log(1 + len(self.examples) / len(ids)) for token, ids in self._index.items()}
+
+    def select(self, question: str, k: int) -> List[Example]:
+        """The `k` examples closest to the question, in store order (so that the same selection always renders
+        the same text); the first `k` examples when none shares a term with it."""
+        scores = Counter()
+        for token in _terms(question):
+            for i in self._index.get(token, ()):
+                scores[i] += self._idf[token]
+        best = sorted(scores, key=lambda i: (-scores[i], i))[:k] or range(min(k, len(self.examples)))
+        return [self.examples[i] for i in sorted(best)]
+
+
+def current_question(text: str) -> str:
+    # A question forwarded with its conversation context (`ConversationMemory.with_context`) ends with it.
+    return text.rsplit("Current question: ", 1)[-1]
+
+
+class PromptAssembler:
+    """Picks the question-specific part of an agent's prompt: the `k` most similar examples of the store, and the
+    schema fragments they use plus those whose `keywords` appear in the question (in the order of `fragments`).
+
+    The agent's prompt keeps its instructions in a fixed first system message, identical on every call, so that
+    provider prompt caching (a match on the longest common prefix of the request) covers them and the tool
+    definitions; the assembled `schema` and `examples` follow in a second one. With `enabled` False every
+    fragment and example is sent, which is the prompt as it was before selection."""
+
+    def __init__(self, fragments: Dict[str, str], examples: Sequence[Example],
+                 keywords: Optional[Dict[str, Sequence[str]]] = None, k: int = 2, enabled: bool = True):
+        self.fragments = fragments
+        self.store = ExampleStore(examples)
+        self.keywords = keywords or {}
+        self.k = k
+        self.enabled = enabled
+
+    def select(self, question: str) -> Tuple[List[str], List[Example]]:
+        """(fragment names, examples) for the question."""
+        if not self.enabled:
+            return list(self.fragments), self.store.examples
+        question = current_question(question)
+        examples = self.store.select(question, self.k)
+        lowered = question.lower()
+        names = {name for example in examples for name in example.fragments}
+        names |= {name for name, words in self.keywords.items() if any(word in lowered for word in words)}
+        return [name for name in self.fragments if name in names] or list(self.fragments), examples
+
+    def render(self, question: str) -> Dict[str, str]:
+        """The `schema` and `examples` prompt variables for the question."""
+        names, examples = self.select(question)
+        return {"schema": "\n\n".join(self.fragments[name] for name in names),
+                "examples": "\n\n".join(example.text for example in examples)}
+
+    def assign(self) -> RunnableLambda:
+        """A runnable that adds `schema` and `examples` for the `input` to its inputs; put it in front of an agent's
+        runnable (e.g. `create_openai_tools_agent`'s), so that every iteration gets the same text."""
+        return RunnableLambda(lambda inputs: {**inputs, **self.render(inputs["input"])})
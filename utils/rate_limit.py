@@ -0,0 +1,42 @@
+import logging
+import threading
+from typing import Optional
+
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
+logger = logging.getLogger(__name__)
+
+_rate_limiter: Optional[InMemoryRateLimiter] = None
+_rate_limiter_loaded = False
+_rate_limiter_lock = threading.Lock()
+
+
+def create_rate_limiter(requests_per_second: Optional[float], max_burst: float = 1) -> Optional[InMemoryRateLimiter]:
+    """A token bucket allowing `requests_per_second` LLM calls on average and `max_burst` at once (None: no limit)."""
+    if not requests_per_second:
+        return None
+    return InMemoryRateLimiter(requests_per_second=requests_per_second, check_every_n_seconds=0.01,
+                               max_bucket_size=max(max_burst, 1))
+
+
+def get_rate_limiter() -> Optional[InMemoryRateLimiter]:
+    """Returns the process-wide LLM rate limiter configured in `config.py`, shared by every chat model (and so by
+    every thread and coroutine of the process), or None when LLM calls are not rate-limited."""
+    global _rate_limiter, _rate_limiter_loaded
+    if not _rate_limiter_loaded:
+        with _rate_limiter_lock:
+            if not _rate_limiter_loaded:
+                import config
+                _rate_limiter = create_rate_limiter(config.LLM_REQUESTS_PER_SECOND, config.LLM_MAX_BURST)
+                if _rate_limiter is not None:
+                    logger.info(f"LLM calls are limited to {config.LLM_REQUESTS_PER_SECOND}/s.")
+                _rate_limiter_loaded = True
+    return _rate_limiter
+
+
+def set_rate_limiter(rate_limiter: Optional[InMemoryRateLimiter]) -> None:
+    """Replaces the rate limiter built from the configuration (None disables rate limiting). Chat models that are
+    already built keep the limiter they were built with."""
+    global _rate_limiter, _rate_limiter_loaded
+    with _rate_limiter_lock:
+        _rate_limiter, _rate_limiter_loaded = rate_limiter, True
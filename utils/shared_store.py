@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SharedStore:
+    """A key-value store of JSON values, each with its own TTL, shared by the processes of one host (e.g. the
+    pre-fork workers of `workers.py`) through a SQLite file in WAL mode.
+
+    A store created before `fork()` is safe to use in the workers: a child opens its own connection on first use.
+    The store backs caches: a failing read is a miss and a failing write is skipped, both logged."""
+
+    PRUNE_EVERY = 200  # writes between removals of expired keys
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writes = 0
+        self._db = None
+        self._reset()
+        ref = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: ref() is not None and ref()._reset())
+
+    def _reset(self) -> None:
+        # A SQLite connection must not be used across fork(), nor closed by the child (which could release the
+        # parent's file locks): the child keeps it aside, unused, and starts over with a lock of its own.
+        self._lock = threading.Lock()
+        self._inherited_db, self._db = self._db, None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+        return self._db
+
+    def lookup(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, seconds it has left) for a live key, or None."""
+        try:
+            with self._lock:
+                row = self._connection().execute("SELECT value, expires_at FROM entries WHERE key = ?",
+                                                 (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read '{key}' from the shared store: {e}")
+            return None
+        remaining = row[1] - time.time() if row is not None else 0
+        return (json.loads(row[0]), remaining) if remaining > 0 else None
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.lookup(key)
+        return entry[0] if entry is not None else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._connection()
+                db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                           (key, json.dumps(value, ensure_ascii=False), now + ttl))
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write '{key}' to the shared store: {e}")
+
+    def delete(self, key: str) -> None:
+        try:
+            with self._lock:
+                self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not delete '{key}' from the shared store: {e}")
+
+    def delete_prefix(self, prefix: str) -> None:
+        """Deletes every key that starts with `prefix`."""
+        try:
+            with self._lock:
+                self._connection().execute("DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not delete the '{prefix}' keys from the shared store: {e}")
+
+
+class RedisStore:
+    """`SharedStore` on a Redis server (or anything speaking its protocol), for workers on several hosts. Needs the
+    `redis` package; its connection pool reconnects after `fork()` by itself."""
+
+    def __init__(self, url: str):
+        import redis  # optional: only needed for redis:// store URLs
+        self.url = url
+        self._redis = redis.Redis.from_url(url)
+        self._errors = (redis.RedisError,)
+
+    def lookup(self, key: str) -> Optional[Tuple[Any, float]]:
+        try:
+            value, ttl_ms = self._redis.pipeline().get(key).pttl(key).execute()
+        except self._errors as e:
+            logger.warning(f"Could not read '{key}' from the shared store: {e}")
+            return None
+        return (json.loads(value), ttl_ms / 1000) if value is not None and ttl_ms > 0 else None
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.lookup(key)
+        return entry[0] if entry is not None else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        try:
+            self._redis.set(key, json.dumps(value, ensure_ascii=False), px=max(int(ttl * 1000), 1))
+        except self._errors as e:
+            logger.warning(f"Could not write '{key}' to the shared store: {e}")
+
+    def delete(self, key: str) -> None:
+        try:
+            self._redis.delete(key)
+        except self._errors as e:
+            logger.warning(f"Could not delete '{key}' from the shared store: {e}")
+
+    def delete_prefix(self, prefix: str, batch: int = 500) -> None:
+        """Deletes every key that starts with `prefix` (found with SCAN, so the server is never blocked)."""
+        pattern = re.sub(r"([*?\[\]\\])", r"\\\1", prefix) + "*"
+        try:
+            keys = []
+            for key in self._redis.scan_iter(match=pattern, count=batch):
+                keys.append(key)
+                if len(keys) >= batch:
+                    self._redis.delete(*keys)
+                    keys = []
+            if keys:
+                self._redis.delete(*keys)
+        except self._errors as e:
+            logger.warning(f"Could not delete the '{prefix}' keys from the shared store: {e}")
+
+
+def create_shared_store(url: Optional[str]):
+    """The store for `url`: "redis://..." (or "rediss://", "unix://") for a Redis server, "sqlite:///path" or a plain
+    path for a SQLite file; None for no shared store."""
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    return SharedStore(url[len("sqlite:///"):] if url.startswith("sqlite:///") else url)
+
+
+_store = None
+_store_loaded = False
+_store_lock = threading.Lock()
+
+
+def get_shared_store():
+    """Returns the process-wide shared store configured by SHARED_STORE_URL, or None when there is none."""
+    global _store, _store_loaded
+    if not _store_loaded:
+        with _store_lock:
+            if not _store_loaded:
+                import config
+                _store = create_shared_store(config.SHARED_STORE_URL)
+                _store_loaded = True
+    return _store
+
+
+def set_shared_store(store) -> None:
+    """Replaces the store built from the configuration (None keeps every cache in its own process)."""
+    global _store, _store_loaded
+    with _store_lock:
+        _store, _store_loaded = store, True
@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import logging
+import re
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from utils.budget import RequestBudget
+
+logger = logging.getLogger(__name__)
+
+# A capitalized place name after "in", "for" or "at": "weather in New York", "the forecast for Paris".
+_CITY_PATTERN = re.compile(r"\b(?:in|for|at)\s+([A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)*)")
+
+
+def detect_city(question: str) -> Optional[str]:
+    """A city named in the question, or None; good enough to warm the weather cache, not to answer."""
+    match = _CITY_PATTERN.search(question)
+    return match.group(1) if match else None
+
+
+class Speculation:
+    """Work started for a likely `route` before the router has decided: a whole specialist run on `agent_input`
+    (`kind` "specialist", whose result is the (response, exhausted) pair of `invoke_agent`) or a "prefetch" that
+    only warms caches. It runs within a `budget` of its own."""
+
+    def __init__(self, kind: str, route: str, agent_input: str, budget: RequestBudget):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.route = route
+        self.agent_input = agent_input
+        self.budget = budget
+        self.future = None  # a concurrent.futures.Future, or an asyncio.Task
+        self.status = "running"  # then "claimed" by the specialist's node, and finally "used" or "discarded"
+        self.accounted = False
+
+    def cancel(self) -> None:
+        # A thread cannot be interrupted: the budget stops it at its next LLM or tool call. A task (or a thread
+        # not started yet) stops right away.
+        self.budget.mark_exhausted("cancelled")
+        self.future.cancel()
+
+
+class Speculator:
+    """Runs speculative work next to the router and keeps count of what it saved and what it cost.
+
+    The cost ceiling is twofold: at most `max_in_flight` speculations run at once (the ones over it are not
+    started), and each one may make at most `max_llm_calls` LLM calls and spend `max_tokens` tokens before its
+    budget stops it. Work for a route the router did not choose is cancelled; what it had spent by then is
+    counted in `stats` as wasted."""
+
+    def __init__(self, max_in_flight: int = 4, max_llm_calls: Optional[int] = 3, max_tokens: Optional[int] = 6000):
+        self.max_in_flight = max_in_flight
+        self.max_llm_calls = max_llm_calls
+        self.max_tokens = max_tokens
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._running = 0
+        self._claimable: Dict[str, Speculation] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _admit(self, kind: str, route: str, agent_input: str,
+               request_budget: RequestBudget) -> Optional[Speculation]:
+        with self._lock:
+            if self._running >= self.max_in_flight:
+                self.stats["skipped"] += 1
+                return None
+            self._running += 1
+            self.stats[f"{kind}_started"] += 1
+        # Bounded by the speculative ceiling, and by the time left to the request it works for.
+        budget = RequestBudget(self.max_llm_calls, None, self.max_tokens, request_budget.remaining_time())
+        return Speculation(kind, route, agent_input, budget)
+
+    def start(self, kind: str, route: str, agent_input: str, request_budget: RequestBudget,
+              run: Callable[[Speculation], Any]) -> Optional[Speculation]:
+        """Runs `run(speculation)` in a worker thread, unless `max_in_flight` speculations are running already."""
+        speculation = self._admit(kind, route, agent_input, request_budget)
+        if speculation is None:
+            return None
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="speculation")
+        speculation.future = self._pool.submit(run, speculation)
+        speculation.future.add_done_callback(lambda _: self._finished(speculation))
+        logger.info(f"Speculating on '{route}' ({kind}).")
+        return speculation
+
+    def astart(self, kind: str, route: str, agent_input: str, request_budget: RequestBudget,
+               run: Callable[[Speculation], Awaitable[Any]]) -> Optional[Speculation]:
+        """Async variant of `start`: `run(speculation)` becomes a task of the running event loop."""
+        speculation = self._admit(kind, route, agent_input, request_budget)
+        if speculation is None:
+            return None
+        # A task inherits the context it is created in; created in an empty one, the speculative run does not
+        # attach itself to the router's callbacks and run tree.
+        speculation.future = contextvars.Context().run(asyncio.get_running_loop().create_task, run(speculation))
+        speculation.future.add_done_callback(lambda _: self._finished(speculation))
+        logger.info(f"Speculating on '{route}' ({kind}, async).")
+        return speculation
+
+    def resolve(self, speculation: Optional[Speculation], route: Optional[str]) -> Optional[str]:
+        """Called once the router has decided on `route` (None for anything but a single specialist). Returns the
+        id under which the specialist's node can `claim` the speculation, or None when it was of no use and
+        has been cancelled. Prefetches are left to finish: they only warm caches."""
+        if speculation is None:
+            return None
+        hit = speculation.route == route
+        if speculation.kind == "prefetch":
+            with self._lock:
+                self.stats["prefetch_hits" if hit else "prefetch_misses"] += 1
+            return None
+        if not hit:
+            logger.info(f"Cancelling the speculative '{speculation.route}' run: the router chose '{route}'.")
+            self._discard(speculation, "cancelled")
+            return None
+        with self._lock:
+            speculation.status = "claimed"
+            self._claimable[speculation.id] = speculation
+        return speculation.id
+
+    def claim(self, speculation_id: Optional[str], route: str, agent_input: str) -> Optional[Speculation]:
+        """The speculative run resolved under `speculation_id`, if it answers `agent_input` for `route`."""
+        with self._lock:
+            speculation = self._claimable.pop(speculation_id, None) if speculation_id else None
+        if speculation is None:
+            return None
+        if (speculation.route, speculation.agent_input) != (route, agent_input):
+            self._discard(speculation, "cancelled")
+            return None
+        return speculation
+
+    def result(self, speculation: Speculation, request_budget: RequestBudget) -> Optional[Tuple[dict, None]]:
+        """Waits for a claimed run and returns its (response, None), charged to `request_budget`; None when it
+        failed or its ceiling stopped it, in which case the specialist has to run as usual."""
+        try:
+            response, exhausted = speculation.future.result()
+        except Exception as e:
+            logger.warning(f"The speculative '{speculation.route}' run failed: {e}")
+            exhausted = "error"
+        return self._settle(speculation, request_budget, exhausted, response if not exhausted else None)
+
+    async def aresult(self, speculation: Speculation,
+                      request_budget: RequestBudget) -> Optional[Tuple[dict, None]]:
+        try:
+            response, exhausted = await speculation.future
+        except Exception as e:
+            logger.warning(f"The speculative '{speculation.route}' run failed: {e}")
+            exhausted = "error"
+        return self._settle(speculation, request_budget, exhausted, response if not exhausted else None)
+
+    def _settle(self, speculation: Speculation, request_budget: RequestBudget, exhausted: Optional[str],
+                response: Optional[dict]) -> Optional[Tuple[dict, None]]:
+        if exhausted:
+            logger.info(f"The speculative '{speculation.route}' run stopped early ({exhausted}); running it again.")
+            self._discard(speculation, "incomplete")
+            return None
+        request_budget.absorb(speculation.budget)
+        with self._lock:
+            speculation.status = "used"
+            self.stats["used"] += 1
+        self._account(speculation)
+        return response, None
+
+    def _discard(self, speculation: Speculation, reason: str) -> None:
+        speculation.cancel()
+        with self._lock:
+            speculation.status = "discarded"
+            self.stats[reason] += 1
+        self._account(speculation)
+
+    def _finished(self, speculation: Speculation) -> None:
+        with self._lock:
+            self._running -= 1
+        if not speculation.future.cancelled():
+            speculation.future.exception()  # retrieved, so that a discarded task's error is not reported again
+        self._account(speculation)
+
+    def _account(self, speculation: Speculation) -> None:
+        # Once a speculation has both finished and been used or discarded, its spending is final.
+        with self._lock:
+            if speculation.accounted or not speculation.future.done() or \
+                    speculation.status not in ("used", "discarded"):
+                return
+            speculation.accounted = True
+            prefix = "used" if speculation.status == "used" else "wasted"
+            self.stats[f"{prefix}_llm_calls"] += speculation.budget.llm_calls
+            self.stats[f"{prefix}_tool_calls"] += speculation.budget.tool_calls
+            self.stats[f"{prefix}_tokens"] += speculation.budget.tokens
+
+    def report(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
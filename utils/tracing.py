@@ -0,0 +1,522 @@
+import argparse
+import contextvars
+import json
+import logging
+import math
+import os
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the duration histogram buckets exposed on /metrics.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# (trace id, span id) of the tool call currently running in this context, so that spans recorded below the
+# LangChain layer (e.g. the weather HTTP call) are attached to it.
+_current_parent: contextvars.ContextVar[Optional[Tuple[str, str]]] = contextvars.ContextVar("trace_parent",
+                                                                                           default=None)
+
+
+def estimate_tokens(chars: int) -> int:
+    return chars // 4 + 1 if chars else 0
+
+
+def chat_prompt_chars(messages, kwargs: dict) -> int:
+    """Characters of a chat model call's prompt: its messages and the tool definitions sent with them (which count
+    as prompt tokens too, and are often the larger part of a specialist's prompt)."""
+    chars = sum(len(str(m.content)) for batch in messages for m in batch)
+    tools = (kwargs.get("invocation_params") or {}).get("tools") or []
+    # OpenAI models get the tool schemas; other models may be bound to the tool objects themselves.
+    tools = [tool if isinstance(tool, dict) else convert_to_openai_tool(tool) for tool in tools]
+    return chars + (len(json.dumps(tools, ensure_ascii=False, default=str)) if tools else 0)
+
+
+def cached_prompt_tokens(response) -> Optional[int]:
+    """Prompt tokens the provider served from its prompt cache for an `LLMResult`, or None if it did not say."""
+    details = ((response.llm_output or {}).get("token_usage") or {}).get("prompt_tokens_details") or {}
+    if details.get("cached_tokens") is not None:
+        return details["cached_tokens"]
+    cached = None
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            cache_read = (metadata.get("input_token_details") or {}).get("cache_read")
+            if cache_read is not None:
+                cached = (cached or 0) + cache_read
+    return cached
+
+
+def token_usage(response) -> Tuple[Optional[int], Optional[int]]:
+    """(prompt, completion) tokens reported by the provider for an `LLMResult`, or (None, None)."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage.get("prompt_tokens") is not None:
+        return usage["prompt_tokens"], usage.get("completion_tokens", 0)
+    prompt = completion = None
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                prompt = (prompt or 0) + metadata.get("input_tokens", 0)
+                completion = (completion or 0) + metadata.get("output_tokens", 0)
+    return prompt, completion
+
+
+class _Run:
+    __slots__ = ("kind", "name", "node", "trace_id", "parent_id", "start", "wall", "model", "prompt_chars",
+                 "usage", "step_start", "steps", "previous_parent")
+
+    def __init__(self, kind: str, name: str, node: Optional[str], trace_id: str, parent_id: Optional[str]):
+        self.kind = kind
+        self.name = name
+        self.node = node
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.wall = time.time()
+        self.model = None
+        self.prompt_chars = 0
+        self.usage = [0, 0, 0.0]  # prompt tokens, completion tokens, cost of every LLM call below this run
+        self.step_start = None  # set on agent executors once their first action is planned
+        self.steps = 0
+        self.previous_parent = None
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Turns LangChain callbacks into spans: one per LLM call (with token usage and cost), one per tool call,
+    one per agent iteration (planning plus the tool it chose) and one per top-level run.
+
+    Spans of the same request share a trace id: the `request_id` in the run metadata if there is one, otherwise
+    the id of the top-level run. Token usage is also added up along the run tree, so a graph node wrapped with
+    `traced_node` reports the tokens spent below it."""
+
+    run_inline = True  # called directly from async code instead of in a worker thread
+
+    def __init__(self, tracer: "Tracer"):
+        self.tracer = tracer
+        self._runs: Dict[UUID, _Run] = {}
+        self._lock = threading.Lock()
+
+    # -- run bookkeeping ---------------------------------------------------------------------------------
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], kind: str, name: str,
+               metadata: Optional[dict]) -> _Run:
+        metadata = metadata or {}
+        with self._lock:
+            parent = self._runs.get(parent_run_id) if parent_run_id else None
+            trace_id = parent.trace_id if parent else str(metadata.get("request_id") or run_id)
+            run = self._runs[run_id] = _Run(kind, name, metadata.get("langgraph_node"), trace_id,
+                                            str(parent_run_id) if parent_run_id else None)
+        return run
+
+    def _span(self, run: _Run, span_id: str, start: float, wall: float, **fields) -> dict:
+        return {"ts": wall, "trace_id": run.trace_id, "span_id": span_id, "parent_id": run.parent_id,
+                "kind": run.kind, "name": run.name, "node": run.node,
+                "duration_ms": (time.perf_counter() - start) * 1000, **fields}
+
+    def context_of(self, run_id: Optional[UUID]) -> Tuple[Optional[str], Optional[str], List[float]]:
+        """(trace id, parent span id, token usage so far) of a run that is still in progress."""
+        run = self._runs.get(run_id) if run_id else None
+        if run is None:
+            return None, None, [0, 0, 0.0]
+        return run.trace_id, run.parent_id, list(run.usage)
+
+    # -- chains: top-level runs and agent iterations -----------------------------------------------------
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        self._start(run_id, parent_run_id, "request" if parent_run_id is None else "chain", name, metadata)
+
+    def _close_orphans(self, run_id: UUID, error: BaseException) -> None:
+        # A handler that raises in a start callback (e.g. `BudgetCallbackHandler` refusing an LLM or tool call)
+        # aborts a run this handler has already opened, and no end or error callback follows for it: close the
+        # runs still open below a chain that failed.
+        with self._lock:
+            failed, orphans = {str(run_id)}, []
+            while True:
+                found = [(child_id, child) for child_id, child in self._runs.items() if child.parent_id in failed]
+                if not found:
+                    break
+                for child_id, child in found:
+                    del self._runs[child_id]
+                    failed.add(str(child_id))
+                    orphans.append((child_id, child))
+        for child_id, child in orphans:
+            if child.kind == "tool" and _current_parent.get() == (child.trace_id, str(child_id)):
+                _current_parent.set(child.previous_parent)
+            self.tracer.record(self._span(child, str(child_id), child.start, child.wall, error=repr(error)))
+
+    def _end_chain(self, run_id: UUID, error: Optional[BaseException] = None) -> None:
+        if error is not None:
+            self._close_orphans(run_id, error)
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None or run.kind != "request":
+            return
+        prompt_tokens, completion_tokens, cost = run.usage
+        self.tracer.record(self._span(run, str(run_id), run.start, run.wall, prompt_tokens=prompt_tokens,
+                                      completion_tokens=completion_tokens, cost_usd=cost,
+                                      error=repr(error) if error else None))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_chain(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end_chain(run_id, error)
+
+    def _end_step(self, executor_id: Optional[UUID]) -> None:
+        executor = self._runs.get(executor_id) if executor_id else None
+        if executor is None or executor.step_start is None:
+            return
+        start, wall = executor.step_start
+        executor.steps += 1
+        executor.step_start = (time.perf_counter(), time.time())
+        self.tracer.record({**self._span(executor, f"{executor_id}:{executor.steps}", start, wall),
+                            "kind": "agent_step", "parent_id": str(executor_id), "step": executor.steps})
+
+    def on_agent_action(self, action, *, run_id, **kwargs):
+        executor = self._runs.get(run_id)
+        if executor is not None and executor.step_start is None:
+            executor.step_start = (executor.start, executor.wall)
+
+    def on_agent_finish(self, finish, *, run_id, **kwargs):
+        executor = self._runs.get(run_id)
+        if executor is not None and executor.step_start is None:
+            executor.step_start = (executor.start, executor.wall)
+        self._end_step(run_id)
+
+    # -- LLM calls ---------------------------------------------------------------------------------------
+    def _start_llm(self, serialized, run_id, parent_run_id, metadata, kwargs, prompt_chars: int) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = (params.get("model_name") or params.get("model") or (metadata or {}).get("ls_model_name")
+                 or (serialized or {}).get("name") or "llm")
+        run = self._start(run_id, parent_run_id, "llm", model, metadata)
+        run.model = model
+        run.prompt_chars = prompt_chars
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self._start_llm(serialized, run_id, parent_run_id, metadata, kwargs, chat_prompt_chars(messages, kwargs))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self._start_llm(serialized, run_id, parent_run_id, metadata, kwargs, sum(len(p) for p in prompts))
+
+    def _end_llm(self, run_id: UUID, response=None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        text = "".join(g.text for gs in response.generations for g in gs) if response is not None else ""
+        prompt_tokens, completion_tokens = token_usage(response) if response is not None else (None, None)
+        cached_tokens = cached_prompt_tokens(response) if response is not None else None
+        estimated = prompt_tokens is None
+        if estimated:  # the provider did not report usage (e.g. a stub model): estimate from the text
+            prompt_tokens, completion_tokens = estimate_tokens(run.prompt_chars), estimate_tokens(len(text))
+        cost = self.tracer.cost(run.model, prompt_tokens, completion_tokens)
+        with self._lock:
+            parent_id = run.parent_id
+            while parent_id is not None:
+                parent = self._runs.get(UUID(parent_id))
+                if parent is None:
+                    break
+                parent.usage[0] += prompt_tokens
+                parent.usage[1] += completion_tokens
+                parent.usage[2] += cost
+                parent_id = parent.parent_id
+        self.tracer.record(self._span(run, str(run_id), run.start, run.wall, prompt_tokens=prompt_tokens,
+                                      completion_tokens=completion_tokens, tokens_estimated=estimated,
+                                      cached_prompt_tokens=cached_tokens, cost_usd=cost, result_size=len(text),
+                                      error=repr(error) if error else None))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end_llm(run_id, response)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end_llm(run_id, error=error)
+
+    # -- tool calls --------------------------------------------------------------------------------------
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        run = self._start(run_id, parent_run_id, "tool", name, metadata)
+        run.previous_parent = _current_parent.get()
+        _current_parent.set((run.trace_id, str(run_id)))
+
+    def _end_tool(self, run_id: UUID, parent_run_id: Optional[UUID], output: Any = None,
+                  error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        _current_parent.set(run.previous_parent)
+        self.tracer.record(self._span(run, str(run_id), run.start, run.wall,
+                                      result_size=len(str(output)) if output is not None else 0,
+                                      error=repr(error) if error else None))
+        self._end_step(parent_run_id)
+
+    def on_tool_end(self, output, *, run_id, parent_run_id=None, **kwargs):
+        self._end_tool(run_id, parent_run_id, output)
+
+    def on_tool_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._end_tool(run_id, parent_run_id, error=error)
+
+
+class _Metrics:
+    """Prometheus-style aggregates of the recorded spans, keyed by (kind, name)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], dict] = {}
+
+    def observe(self, span: dict) -> None:
+        seconds = span["duration_ms"] / 1000
+        with self._lock:
+            series = self._series.get((span["kind"], span["name"]))
+            if series is None:
+                series = self._series[(span["kind"], span["name"])] = {
+                    "buckets": [0] * len(DURATION_BUCKETS), "count": 0, "sum": 0.0, "prompt_tokens": 0,
+                    "completion_tokens": 0, "cost_usd": 0.0, "result_size": 0, "errors": 0}
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    series["buckets"][i] += 1
+            series["count"] += 1
+            series["sum"] += seconds
+            series["errors"] += 1 if span.get("error") else 0
+            if span["kind"] != "request":  # request spans repeat the tokens of the LLM calls below them
+                for field in ("prompt_tokens", "completion_tokens", "cost_usd", "result_size"):
+                    series[field] += span.get(field) or 0
+
+    def render(self) -> str:
+        with self._lock:
+            series = sorted(self._series.items())
+            series = [(key, {**values, "buckets": list(values["buckets"])}) for key, values in series]
+        lines = ["# HELP agent_span_duration_seconds Duration of traced graph nodes, LLM calls, tools and "
+                 "agent iterations.", "# TYPE agent_span_duration_seconds histogram"]
+        for (kind, name), values in series:
+            labels = f'kind="{_escape(kind)}",name="{_escape(name)}"'
+            for bound, count in zip(DURATION_BUCKETS, values["buckets"]):
+                lines.append(f'agent_span_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'agent_span_duration_seconds_bucket{{{labels},le="+Inf"}} {values["count"]}')
+            lines.append(f"agent_span_duration_seconds_sum{{{labels}}} {values['sum']:.6f}")
+            lines.append(f"agent_span_duration_seconds_count{{{labels}}} {values['count']}")
+        for metric, field, help_text in (
+                ("agent_span_prompt_tokens_total", "prompt_tokens", "Prompt tokens."),
+                ("agent_span_completion_tokens_total", "completion_tokens", "Completion tokens."),
+                ("agent_span_cost_usd_total", "cost_usd", "Estimated LLM cost in US dollars."),
+                ("agent_span_result_size_total", "result_size", "Characters returned."),
+                ("agent_span_errors_total", "errors", "Spans that ended with an error.")):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for (kind, name), values in series:
+                lines.append(f'{metric}{{kind="{_escape(kind)}",name="{_escape(name)}"}} {values[field]:g}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Tracer:
+    """Collects spans into Prometheus-style metrics and, if `path` is set, appends them to a JSON-lines file."""
+
+    def __init__(self, path: Optional[str] = None, prices: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.path = path
+        self.prices = prices or {}
+        self.metrics = _Metrics()
+        self.handler = TracingCallbackHandler(self)
+        self._file_lock = threading.Lock()
+        self._file = None
+
+    def cost(self, model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+        prompt_price, completion_price = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+    def record(self, span: dict) -> None:
+        self.metrics.observe(span)
+        if not self.path:
+            return
+        line = json.dumps(span, ensure_ascii=False, default=str) + "\n"
+        with self._file_lock:
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(line)
+                self._file.flush()
+            except OSError as e:
+                logger.warning(f"Could not write trace span to '{self.path}': {e}")
+
+    @contextmanager
+    def span(self, kind: str, name: str):
+        """Records a span around a block that LangChain does not see, under the tool call running in this context.
+        The block may set `result_size` on the yielded dict."""
+        trace_id, parent_id = _current_parent.get() or (None, None)
+        fields = {"result_size": 0}
+        start, wall, error = time.perf_counter(), time.time(), None
+        try:
+            yield fields
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            self.record({"ts": wall, "trace_id": trace_id, "span_id": uuid4().hex, "parent_id": parent_id,
+                         "kind": kind, "name": name, "node": None,
+                         "duration_ms": (time.perf_counter() - start) * 1000, **fields, "error": error})
+
+    def close(self) -> None:
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_tracer: Optional[Tracer] = None
+_tracer_loaded = False
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Returns the process-wide tracer configured in `config.py`, or None when tracing is disabled."""
+    global _tracer, _tracer_loaded
+    if not _tracer_loaded:
+        with _tracer_lock:
+            if not _tracer_loaded:
+                import config
+                if config.TRACING_ENABLED:
+                    _tracer = Tracer(config.TRACE_PATH, config.LLM_PRICES)
+                _tracer_loaded = True
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    """Replaces the tracer built from the configuration (None disables tracing)."""
+    global _tracer, _tracer_loaded
+    with _tracer_lock:
+        _tracer, _tracer_loaded = tracer, True
+
+
+def callbacks() -> list:
+    """The callback handlers to pass to a LangChain / LangGraph run (empty when tracing is disabled)."""
+    tracer = get_tracer()
+    return [tracer.handler] if tracer is not None else []
+
+
+def with_tracing(run_config: Optional[dict] = None) -> dict:
+    """Returns a copy of a run config with the tracing callback handler added to its callbacks. (Callbacks bound
+    with `with_config` would be replaced, not extended, by the ones `astream_events` passes to the graph.)"""
+    run_config = dict(run_config or {})
+    run_config["callbacks"] = list(run_config.get("callbacks") or []) + callbacks()
+    return run_config
+
+
+@contextmanager
+def span(kind: str, name: str):
+    tracer = get_tracer()
+    if tracer is None:
+        yield {}
+        return
+    with tracer.span(kind, name) as fields:
+        yield fields
+
+
+def _node_span(name: str, config: RunnableConfig, start: float, wall: float, result: Any,
+               error: Optional[BaseException]) -> None:
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    config = config or {}
+    run_id = getattr(config.get("callbacks"), "parent_run_id", None)
+    trace_id, parent_id, (prompt_tokens, completion_tokens, cost) = tracer.handler.context_of(run_id)
+    tracer.record({"ts": wall, "trace_id": trace_id, "span_id": str(run_id) if run_id else uuid4().hex,
+                   "parent_id": parent_id, "kind": "node", "name": name,
+                   "node": config.get("metadata", {}).get("langgraph_node", name),
+                   "duration_ms": (time.perf_counter() - start) * 1000, "prompt_tokens": prompt_tokens,
+                   "completion_tokens": completion_tokens, "cost_usd": cost,
+                   "result_size": len(json.dumps(result, ensure_ascii=False, default=str)) if result else 0,
+                   "error": repr(error) if error else None})
+
+
+def traced_node(func, afunc) -> RunnableLambda:
+    """Wraps a LangGraph node's sync and async implementations (called with the state and the run config) so
+    that every execution is recorded as a `node` span with its duration, the tokens spent below it and the size
+    of its state update."""
+    name = func.__name__
+
+    def run(state, config: RunnableConfig):
+        start, wall, result, error = time.perf_counter(), time.time(), None, None
+        try:
+            result = func(state, config)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _node_span(name, config, start, wall, result, error)
+
+    async def arun(state, config: RunnableConfig):
+        start, wall, result, error = time.perf_counter(), time.time(), None, None
+        try:
+            result = await afunc(state, config)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _node_span(name, config, start, wall, result, error)
+
+    # Keep the node function's name on the runnable (and in the event stream) rather than "run".
+    run.__name__, arun.__name__ = name, afunc.__name__
+    return RunnableLambda(run, afunc=arun)
+
+
+# -- trace file summary ------------------------------------------------------------------------------------
+def percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a sorted, non-empty list; `pct` is in [0, 100]."""
+    rank = max(0, math.ceil(pct * len(ordered) / 100) - 1)
+    return ordered[rank]
+
+
+def summarize_trace_file(path: str, by: str = "name", kind: Optional[str] = None) -> List[dict]:
+    """Reads a trace file and returns one row per (kind, name) - or (kind, node) - with the span count,
+    p50/p95/p99 and mean duration, average tokens and total cost."""
+    groups: Dict[Tuple[str, str], List[dict]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                span = json.loads(line)
+            except ValueError:
+                continue
+            if kind and span.get("kind") != kind:
+                continue
+            groups.setdefault((span.get("kind"), str(span.get(by))), []).append(span)
+    rows = []
+    for (span_kind, name), spans in groups.items():
+        durations = sorted(s["duration_ms"] for s in spans)
+        tokens = [(s.get("prompt_tokens") or 0) + (s.get("completion_tokens") or 0) for s in spans]
+        rows.append({"kind": span_kind, "name": name, "n": len(spans), "p50_ms": percentile(durations, 50),
+                     "p95_ms": percentile(durations, 95), "p99_ms": percentile(durations, 99),
+                     "mean_ms": statistics.fmean(durations), "tokens": statistics.fmean(tokens),
+                     "cost_usd": sum(s.get("cost_usd") or 0 for s in spans),
+                     "errors": sum(1 for s in spans if s.get("error"))})
+    return sorted(rows, key=lambda r: (r["kind"], -r["p50_ms"]))
+
+
+if __name__ == "__main__":
+    import config
+
+    parser = argparse.ArgumentParser(description="Summarizes span latencies per node, LLM and tool from a trace file.")
+    parser.add_argument("path", nargs="?", default=config.TRACE_PATH)
+    parser.add_argument("--by", choices=["name", "node"], default="name",
+                        help="Group spans by their own name or by the graph node they ran in.")
+    parser.add_argument("--kind", help="Only this span kind (request, node, llm, tool, agent_step, http).")
+    args = parser.parse_args()
+
+    print(f"{'kind':<11} {'name':<32} {'n':>6} {'p50':>10} {'p95':>10} {'p99':>10} {'mean':>10} "
+          f"{'tokens':>8} {'cost $':>9} {'errors':>6}")
+    for row in summarize_trace_file(args.path, args.by, args.kind):
+        print(f"{row['kind']:<11} {row['name'][:32]:<32} {row['n']:>6} {row['p50_ms']:8.1f}ms "
+              f"{row['p95_ms']:8.1f}ms {row['p99_ms']:8.1f}ms {row['mean_ms']:8.1f}ms {row['tokens']:8.0f} "
+              f"{row['cost_usd']:9.4f} {row['errors']:>6}")
@@ -0,0 +1,185 @@
+"""Pre-fork worker mode: builds the LangGraph app, the fast router and every specialist agent once, then forks
+worker processes that serve `server.py`'s API from one listening socket, so that each core answers questions with
+warm agents. The workers share their weather, answer and schema-catalog caches through the shared store
+(SHARED_STORE_URL, or WORKER_SHARED_STORE_URL). The supervisor (this process) restarts a worker that exits, and on
+SIGTERM or SIGINT stops them all, waiting up to SERVER_SHUTDOWN_GRACE seconds for in-flight requests.
+
+    python workers.py --workers 4 --port 8000
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import uvicorn
+
+import config
+import main_langgraph
+import server
+from utils.logging_config import use_worker_log
+from utils.rate_limit import create_rate_limiter, set_rate_limiter
+from utils.shared_store import create_shared_store, get_shared_store, set_shared_store
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up() -> None:
+    """Builds what every worker would otherwise build on its first questions. Connections opened here (databases,
+    the Mongo client) are not carried into the workers, which open their own. The answer cache and the session
+    graph keep a SQLite connection each, so the workers build those themselves."""
+    start = time.perf_counter()
+    main_langgraph.get_app()
+    main_langgraph.get_fast_router()
+    for name in main_langgraph.registry.names:
+        try:
+            main_langgraph.registry.get(name)
+        except Exception as e:
+            logger.warning(f"Could not build agent '{name}' before forking; each worker will try on first use: {e}")
+    logger.info(f"Built the graph and agents {main_langgraph.registry.built()} in {time.perf_counter() - start:.2f}s.")
+
+
+def listen(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """The socket every worker accepts connections from."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def serve(sock: socket.socket, slot: Optional[int] = None) -> None:
+    """Runs the API on `sock` in this process until SIGTERM/SIGINT (uvicorn's graceful shutdown). Worker `slot`
+    logs to a file of its own (`use_worker_log`); the supervisor keeps LOG_PATH."""
+    if slot is not None:
+        use_worker_log(slot)
+    uvicorn_config = uvicorn.Config(server.api, log_config=None,
+                                    timeout_graceful_shutdown=config.SERVER_SHUTDOWN_GRACE)
+    uvicorn.Server(uvicorn_config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Forks `workers` processes running `target(slot)` and keeps that many running: a worker that exits is
+    replaced after `restart_delay` seconds, unless more than `max_restarts` were needed within `restart_window`
+    seconds, in which case something is wrong with every worker and the supervisor stops. `stop()` (on SIGTERM
+    or SIGINT) forwards SIGTERM to the workers and kills those still running `grace` seconds later."""
+
+    def __init__(self, workers: int, target: Callable[[int], None], restart_delay: float = 1,
+                 max_restarts: int = 10, restart_window: float = 60, grace: float = 30):
+        self.workers = workers
+        self.target = target
+        self.restart_delay = restart_delay
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.grace = grace
+        self.children: Dict[int, int] = {}  # pid -> slot
+        self.restarts = 0
+        self.stopping = False
+        self._recent = deque()  # times of the restarts within `restart_window`
+
+    def spawn(self, slot: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                # The worker installs its own handlers; until then a signal should end it, not run the supervisor's.
+                for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGALRM):
+                    signal.signal(sig, signal.SIG_DFL)
+                self.target(slot)
+            except BaseException:
+                logger.exception(f"Worker {slot} failed.")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = slot
+        logger.info(f"Started worker {slot} (pid {pid}).")
+        return pid
+
+    def stop(self, *_) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"Stopping {len(self.children)} workers.")
+        for pid in list(self.children):
+            self._signal(pid, signal.SIGTERM)
+        signal.signal(signal.SIGALRM, self._kill)
+        signal.alarm(max(int(self.grace), 1))
+
+    def _kill(self, *_) -> None:
+        for pid, slot in list(self.children.items()):
+            logger.warning(f"Worker {slot} (pid {pid}) did not stop within {self.grace:g}s; killing it.")
+            self._signal(pid, signal.SIGKILL)
+
+    @staticmethod
+    def _signal(pid: int, sig: int) -> None:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _may_restart(self) -> bool:
+        now = time.monotonic()
+        while self._recent and self._recent[0] <= now - self.restart_window:
+            self._recent.popleft()
+        if len(self._recent) >= self.max_restarts:
+            return False
+        self._recent.append(now)
+        return True
+
+    def run(self) -> None:
+        """Starts the workers and supervises them until they have all stopped."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for slot in range(self.workers):
+            self.spawn(slot)
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            slot = self.children.pop(pid, None)
+            if slot is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if not self._may_restart():
+                logger.error(f"Worker {slot} (pid {pid}) exited with {code}, and {self.max_restarts} workers were "
+                             f"restarted within {self.restart_window:g}s; giving up.")
+                self.stop()
+                continue
+            logger.warning(f"Worker {slot} (pid {pid}) exited with {code}; restarting it.")
+            time.sleep(self.restart_delay)
+            if not self.stopping:
+                self.restarts += 1
+                self.spawn(slot)
+        signal.alarm(0)
+        logger.info("All workers have stopped.")
+
+
+def run(workers: Optional[int] = None, host: str = None, port: int = None) -> None:
+    """Builds the app, forks `workers` processes (default SERVER_WORKERS, or one per core) serving it on
+    `host:port`, and supervises them until SIGTERM/SIGINT."""
+    workers = workers or config.SERVER_WORKERS or os.cpu_count() or 1
+    if get_shared_store() is None:
+        set_shared_store(create_shared_store(config.WORKER_SHARED_STORE_URL))
+    if config.LLM_REQUESTS_PER_SECOND:
+        # Every worker has a limiter of its own: together they keep to the configured rate.
+        set_rate_limiter(create_rate_limiter(config.LLM_REQUESTS_PER_SECOND / workers, config.LLM_MAX_BURST))
+    warm_up()
+    sock = listen(host or config.SERVER_HOST, port or config.SERVER_PORT)
+    logger.info(f"Serving on {sock.getsockname()[0]}:{sock.getsockname()[1]} with {workers} workers.")
+    Supervisor(workers, lambda slot: serve(sock, slot), restart_delay=config.WORKER_RESTART_DELAY,
+               max_restarts=config.WORKER_MAX_RESTARTS, restart_window=config.WORKER_RESTART_WINDOW,
+               grace=config.SERVER_SHUTDOWN_GRACE).run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core).")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    args = parser.parse_args()
+    run(args.workers, args.host, args.port)